@@ -1,26 +1,75 @@
-from fastapi import FastAPI, UploadFile,File,Form,HTTPException, Request
-from fastapi.responses import JSONResponse , HTMLResponse
+from fastapi import FastAPI, UploadFile,File,Form,HTTPException, Request, BackgroundTasks
+from fastapi.responses import JSONResponse , HTMLResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import os
+import json
+import asyncio
+import shutil
+import uuid
+import tracemalloc
+from contextlib import asynccontextmanager, nullcontext
 from typing import List , Optional, Dict, Any
 from pathlib import Path
 
-from src.document_ingestion.data_ingestion import DocumentHandler,DocumentComparator,ChatIngestor
+from src.document_ingestion.data_ingestion import DocumentHandler,DocumentComparator,ChatIngestor,FaissManager
 from utils.document_ops import FastAPIFileAdapter,read_pdf_via_handler
 
 
 from langchain_community.vectorstores import FAISS
 from src.document_analyzer.data_analysis import DocumentAnalyzer
+from src.document_analyzer.batch_analysis import BatchDocumentAnalyzer
 from src.document_chat.retrieval import ConversationalRAG
+from src.document_chat.chat_memory import conversation_key, forget_session, get_chat_memory
 from src.document_compare.document_comparator import DocumentComparatorLLM
+from utils.config_loader import get_settings, SettingsWatcher
+from utils.llm_pool import close_llm_pool
+from utils.metrics import render_metrics, mark_worker_dead
+from utils.profiling import ProfilingMiddleware, PROFILE_ID_HEADER
+from utils.admission import AdmissionRejected, Reservation, estimate_cost, get_admission_controller
+from utils.session_janitor import SessionJanitor, session_lease
+from utils.fair_scheduler import BULK, INTERACTIVE, TenantMiddleware, work_scope
+from exception.custom_exception import DocumentPortalException
 
 FAISS_BASE = os.getenv("FAISS_BASE", "faiss_index")
 UPLOAD_BASE = os.getenv("UPLOAD_BASE", "data")
 FAISS_INDEX_NAME = os.getenv("FAISS_INDEX_NAME", "index") 
+CONFIG_HOT_RELOAD = os.getenv("CONFIG_HOT_RELOAD", "false").lower() == "true"
+CONFIG_RELOAD_INTERVAL = float(os.getenv("CONFIG_RELOAD_INTERVAL", "5"))
 
-app = FastAPI(title="Document Portal API" , version="0.1")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # build the shared settings once per worker; components read them via get_settings()
+    get_settings()
+    watcher = SettingsWatcher(interval=CONFIG_RELOAD_INTERVAL) if CONFIG_HOT_RELOAD else None
+    if watcher:
+        watcher.start()
+    # tracemalloc feeds the per-stage peak memory histogram (see utils/admission.py)
+    trace_memory = get_settings().admission.trace_stages and not tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.start()
+    janitor_cfg = get_settings().session_janitor
+    janitor_task = None
+    if janitor_cfg.enabled:
+        # evicting a session also drops its conversations from the chat memory store
+        janitor = SessionJanitor.from_settings(on_evict=forget_session)
+        janitor_task = asyncio.create_task(janitor.run_forever(janitor_cfg.interval_seconds))
+    try:
+        yield
+    finally:
+        if janitor_task:
+            janitor_task.cancel()
+        if watcher:
+            watcher.stop()
+        await close_llm_pool()
+        if trace_memory:
+            tracemalloc.stop()
+        mark_worker_dead()
+
+
+app = FastAPI(title="Document Portal API" , version="0.1", lifespan=lifespan)
 
 static_path = os.path.join(os.path.dirname(__file__), "..", "static")
 template_path = os.path.join(os.path.dirname(__file__), "..", "templates")
@@ -31,8 +80,11 @@ app.add_middleware(
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=[PROFILE_ID_HEADER],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(TenantMiddleware)
 
     
 
@@ -40,6 +92,17 @@ app.mount("/static", StaticFiles(directory=static_path), name="static")
 
 templates = Jinja2Templates(directory=template_path)
 
+
+async def _admit(endpoint: str, files: List[UploadFile]) -> Reservation:
+    """Reserve the estimated memory for processing ``files`` or answer 503/413."""
+    cost = await asyncio.to_thread(estimate_cost, [(f.filename, f.file) for f in files])
+    try:
+        return await get_admission_controller().acquire(cost.bytes, endpoint)
+    except AdmissionRejected as e:
+        headers = {"Retry-After": str(int(e.retry_after))} if e.retry_after else None
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+
+
 #---------displaying HTML page -----------------------------------
 
 @app.get("/", response_class=HTMLResponse)
@@ -50,40 +113,117 @@ async def serve_ui(request: Request):
 @app.get("/health")
 async def health_check() -> Dict[str, str]:
     return {"status": "ok" ,"service": "Document-Portal"}
+
+
+#-----------Prometheus metrics (aggregated across workers) -----------------------
+@app.get("/metrics")
+async def metrics() -> Response:
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
         
 # ----------------------Document Analysis------------------------------------------
 @app.post("/analyze/")
 async def analyze_document(file: UploadFile= File(...)) -> Any:
+    reservation = await _admit("analyze", [file])
     try:
         dh = DocumentHandler()
-        save_path = await dh.save_pdf(FastAPIFileAdapter(file))
-        text = read_pdf_via_handler(dh, save_path)
+        with session_lease(dh.session_path):
+            save_path = await dh.save_pdf(FastAPIFileAdapter(file))
+            text = await asyncio.to_thread(read_pdf_via_handler, dh, save_path)
         
-        analyzer = DocumentAnalyzer()
-        result=analyzer.analyze_document(text)
+        # blocking work runs off the event loop: it may wait for a fair-share slot
+        with work_scope(INTERACTIVE, dh.session_id):
+            result = await asyncio.to_thread(lambda: DocumentAnalyzer().analyze_document(text))
         return JSONResponse(content=result)
         
     except HTTPException as he:
         raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed - {str(e)}")
+    finally:
+        reservation.release()
     
     
+@app.post("/analyze/batch")
+async def analyze_documents_batch(files: List[UploadFile] = File(...)) -> Any:
+    """Analyze many PDFs concurrently; one NDJSON line per file in completion order, then a summary line."""
+    cfg = get_settings().batch_analyze
+    if len(files) > cfg.max_files:
+        raise HTTPException(status_code=413, detail=f"Too many files: {len(files)} > {cfg.max_files}")
+    # held until the stream ends: parsing and analysis happen while the response streams
+    reservation = await _admit("analyze_batch", files)
+    try:
+        dh = DocumentHandler()
+        paths: Dict[int, str] = {}
+        errors: List[Dict[str, Any]] = []
+        seen = set()
+        # save before streaming: upload handles are not guaranteed to outlive the handler
+        with session_lease(dh.session_path):
+            for i, f in enumerate(files):
+                name = os.path.basename(f.filename or "")
+                try:
+                    if name in seen:
+                        raise ValueError("Duplicate filename in batch.")
+                    seen.add(name)
+                    paths[i] = await dh.save_pdf(FastAPIFileAdapter(f))
+                except Exception as e:
+                    errors.append({"index": i, "filename": name, "status": "error",
+                                   "error": str(e).splitlines()[0] if str(e) else type(e).__name__})
+        batch = BatchDocumentAnalyzer(read_text=lambda path: read_pdf_via_handler(dh, path),
+                                      max_concurrency=cfg.max_concurrency, parse_workers=cfg.parse_workers,
+                                      tenant=dh.session_id)
+    except Exception as e:
+        reservation.release()
+        raise HTTPException(status_code=500, detail=f"Analysis failed - {str(e)}")
+
+    async def ndjson():
+        # the lease spans the whole stream so the janitor cannot evict files still being parsed
+        try:
+            with session_lease(dh.session_path):
+                async for record in batch.stream(paths, errors):
+                    yield json.dumps(record, default=str) + "\n"
+        finally:
+            reservation.release()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson",
+                             headers={"X-Session-Id": dh.session_id})
+
+
 # ---------------------Document Compare ----------------------------------------------------------------
 @app.post("/compare")
-async def compare_documents(reference: UploadFile = File(...) , actual :UploadFile = File(...)) -> Any:
+async def compare_documents(reference: UploadFile = File(...) , actual :UploadFile = File(...),
+                            mode: Optional[str] = Form(None)) -> Any:
+    reservation = await _admit("compare", [reference, actual])
     try:
+        mode = mode or get_settings().compare.mode
+        if mode not in ("full", "sectioned"):
+            raise HTTPException(status_code=400, detail="mode must be 'full' or 'sectioned'")
         dc = DocumentComparator()
-        ref_path , actpath = await dc.save_uploaded_fiels(FastAPIFileAdapter(reference),FastAPIFileAdapter(actual))
-        _ = ref_path , actpath
-        combined_text = dc.combine_documents()
-        comp = DocumentComparatorLLM()
-        df = comp.compare_documents(combined_text) 
+        with session_lease(dc.session_path):
+            ref_path , actpath = await dc.save_uploaded_fiels(FastAPIFileAdapter(reference),FastAPIFileAdapter(actual))
+            if mode == "sectioned":
+                ref_sections, act_sections = await asyncio.gather(asyncio.to_thread(dc.read_sections, ref_path),
+                                                                  asyncio.to_thread(dc.read_sections, actpath))
+            else:
+                combined_text = await asyncio.to_thread(dc.combine_documents)
+
+        def compare() -> Any:
+            comp = DocumentComparatorLLM()
+            if mode == "sectioned":
+                return comp.compare_sections(ref_sections, act_sections)
+            return comp.compare_documents(combined_text)
+
+        with work_scope(INTERACTIVE, dc.session_id):
+            df = await asyncio.to_thread(compare)
         
-        return {"rows": df.to_dict(orient="records"), "session_id": dc.session_id}
+        return {"rows": df.to_dict(orient="records"), "session_id": dc.session_id, "mode": mode}
         
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Comparison failed - {str(e)}")
+    finally:
+        reservation.release()
 
 #------------------------create Document Index ---------------------------------------------------------
 
@@ -91,15 +231,28 @@ async def compare_documents(reference: UploadFile = File(...) , actual :UploadFi
 async def chat_build_index( files: List[UploadFile] = File(...),
     session_id: Optional[str] = Form(None),
     use_session_dirs: bool = Form(True),
-    chunk_size: int = Form(1000),
-    chunk_overlap: int = Form(200),
+    chunk_size: Optional[int] = Form(None),
+    chunk_overlap: Optional[int] = Form(None),
     k: int = Form(5),
+    chunk_mode: Optional[str] = Form(None),
     ) -> Any:
+    # chunk_size/chunk_overlap count characters; token mode sizes chunks by the embedding model's tokens
+    warnings = []
+    if (chunk_size, chunk_overlap) != (None, None):
+        if chunk_mode is None:
+            chunk_mode = "char"  # clients that send character sizes keep getting character chunks
+        elif chunk_mode == "token":
+            warnings.append("chunk_size/chunk_overlap are ignored with chunk_mode=token; "
+                            "token mode uses chunking.chunk_tokens/overlap_tokens")
+    chunk_size = 1000 if chunk_size is None else chunk_size
+    chunk_overlap = 200 if chunk_overlap is None else chunk_overlap
+    reservation = await _admit("chat_index", files)
     try:
             wrapped = [FastAPIFileAdapter(f) for f in files]
             # this is my main class for storing a data into VDB
             # created a object of ChatIngestor
-            ci = ChatIngestor(
+            ci = await asyncio.to_thread(
+                ChatIngestor,
                 temp_base=UPLOAD_BASE,
                 faiss_base=FAISS_BASE,
                 use_session_dirs=use_session_dirs,
@@ -108,20 +261,117 @@ async def chat_build_index( files: List[UploadFile] = File(...),
             # NOTE: ensure your ChatIngestor saves with index_name="index" or FAISS_INDEX_NAME
             # e.g., if it calls FAISS.save_local(dir, index_name=FAISS_INDEX_NAME)
             # if your method name is actually build_retriever, fix it there as well
-            ci.built_retriever( wrapped, chunk_size=chunk_size, chunk_overlap=chunk_overlap, k=k)
+            # on a thread: queries keep being served (and get their fair share) while this indexes
+            with work_scope(BULK, ci.session_id):
+                await asyncio.to_thread(ci.built_retriever, wrapped, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                        k=k, chunk_mode=chunk_mode)
             
-            return {"session_id": ci.session_id, "k": k, "use_session_dirs": use_session_dirs}
+            return {"session_id": ci.session_id, "k": k, "use_session_dirs": use_session_dirs,
+                    "chunking": ci.last_chunk_stats.as_dict(), "dedup": ci.last_dedup_stats.as_dict(),
+                    "index": ci.last_index_update.as_dict(), "warnings": warnings}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Indexing failed - {str(e)}")
+    finally:
+        reservation.release()
     
     
+#------------------------documents in an index --------------------------------------------------
+
+def _index_dir(session_id: Optional[str], use_session_dirs: bool) -> str:
+    if use_session_dirs and not session_id:
+        raise HTTPException(status_code=400, detail="session_id is required when use_session_dirs=True")
+    index_dir = os.path.join(FAISS_BASE, session_id) if use_session_dirs else FAISS_BASE  # type: ignore
+    if not os.path.isdir(index_dir):
+        raise HTTPException(status_code=404, detail=f"FAISS index not found at: {index_dir}")
+    return index_dir
+
+
+@app.get("/chat/documents")
+async def chat_list_documents(session_id: Optional[str] = None, use_session_dirs: bool = True) -> Any:
+    index_dir = _index_dir(session_id, use_session_dirs)
+    try:
+        # loading the embeddings and reading the index would otherwise stall the event loop
+        fm = await asyncio.to_thread(FaissManager, Path(index_dir))
+        return {"session_id": session_id, "documents": await asyncio.to_thread(fm.documents)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Listing documents failed - {str(e)}")
+
+
+@app.post("/chat/documents/delete")
+async def chat_delete_document(document: str = Form(...),
+    session_id: Optional[str] = Form(None),
+    use_session_dirs: bool = Form(True),
+    compact: bool = Form(False),
+    ) -> Any:
+    """Remove one uploaded document's chunks from the index; ``compact`` also drops old versions now."""
+    index_dir = _index_dir(session_id, use_session_dirs)
+    try:
+        def delete():
+            fm = FaissManager(Path(index_dir))
+            if document not in fm.documents():
+                raise HTTPException(status_code=404, detail=f"Document not in index: {document}")
+            return fm.delete_document(document), fm.compact() if compact else []
+
+        with session_lease(index_dir) if use_session_dirs else nullcontext():
+            update, compacted = await asyncio.to_thread(delete)
+        return {"session_id": session_id, "document": document, "index": update.as_dict(), "compacted": compacted}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Deleting document failed - {str(e)}")
+
+
+#------------------------import precomputed embeddings ---------------------------------------------
+
+@app.post("/chat/import")
+async def chat_import_embeddings(embeddings: UploadFile = File(...),
+    chunks: UploadFile = File(...),
+    session_id: Optional[str] = Form(None),
+    use_session_dirs: bool = Form(True),
+    ) -> Any:
+    """Index chunks whose embeddings were computed upstream: a float32 ``.npy`` matrix plus a
+    JSONL file of ``{"text", "metadata"}`` rows in the same order."""
+    if Path(embeddings.filename or "").suffix.lower() != ".npy":
+        raise HTTPException(status_code=400, detail="embeddings must be a .npy file")
+    reservation = await _admit("chat_import", [embeddings, chunks])
+    try:
+        ci = await asyncio.to_thread(
+            ChatIngestor,
+            temp_base=UPLOAD_BASE,
+            faiss_base=FAISS_BASE,
+            use_session_dirs=use_session_dirs,
+            session_id=session_id or None,
+        )
+        with session_lease(ci.temp_dir) if use_session_dirs else nullcontext():
+            stem = uuid.uuid4().hex[:8]
+            embeddings_path, chunks_path = ci.temp_dir / f"{stem}.npy", ci.temp_dir / f"{stem}.jsonl"
+
+            def save():
+                for upload, out in ((embeddings, embeddings_path), (chunks, chunks_path)):
+                    with open(out, "wb") as f:
+                        shutil.copyfileobj(upload.file, f)  # streamed, the matrix is never held in memory
+
+            await asyncio.to_thread(save)
+            result = await asyncio.to_thread(ci.import_embeddings, embeddings_path, chunks_path)
+        return {"session_id": ci.session_id, "use_session_dirs": use_session_dirs, **result}
+    except DocumentPortalException as e:
+        raise HTTPException(status_code=400, detail=f"Import failed - {e.error_message}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Import failed - {str(e)}")
+    finally:
+        reservation.release()
+
+
 # --------------------Document Chat ---------------------------------------------------------------
     
 @app.post("/chat/query")
-async def chat_query( question: str = Form(...),
+async def chat_query( background_tasks: BackgroundTasks,
+    question: str = Form(...),
     session_id: Optional[str] = Form(None),
     use_session_dirs: bool = Form(True),
-    k: int = Form(5),
+    k: Optional[int] = Form(None),
+    use_memory: bool = Form(True),
+    conversation_id: Optional[str] = Form(None),
     ) -> Any:
     try:
         
@@ -132,23 +382,49 @@ async def chat_query( question: str = Form(...),
         if not os.path.isdir(index_dir):
             raise HTTPException(status_code=404, detail=f"FAISS index not found at: {index_dir}")
         
-         # Load retriever first using a static method or helper
-        retriever = ConversationalRAG.load_retriever_from_faiss(index_dir)
+        if k is None:
+            k = get_settings().retriever.top_k
+        if k < 1:
+            raise HTTPException(status_code=400, detail="k must be at least 1")
+        memory = get_chat_memory() if (use_memory and session_id) else None
+        # clients sharing an index each get their own history; a new id starts a new conversation
+        conversation_id = conversation_id or uuid.uuid4().hex
+        memory_key = conversation_key(session_id, conversation_id) if memory else None
 
-        # Now initialize ConversationalRAG with a valid retriever
-        rag = ConversationalRAG(session_id=session_id, retriever=retriever)
+        def answer():
+            # Load retriever first using a static method or helper
+            retriever = ConversationalRAG.load_retriever_from_faiss(index_dir, k=k)
 
-        # Invoke the RAG chain
-        response = rag.invoke(question, chat_history=[])
+            # Now initialize ConversationalRAG with a valid retriever
+            rag = ConversationalRAG(session_id=session_id, retriever=retriever)
+
+            # server-side history for this conversation: rolling summary + recent window
+            chat_history, memory_stats = memory.history(memory_key) if memory else ([], None)
+
+            # Invoke the RAG chain
+            return rag, memory_stats, rag.invoke(question, chat_history=chat_history)
+
+        # hold a lease so the session janitor never evicts an index while it is loaded
+        with session_lease(index_dir) if use_session_dirs else nullcontext(), work_scope(INTERACTIVE, session_id):
+            rag, memory_stats, response = await asyncio.to_thread(answer)
+
+        if memory:
+            await asyncio.to_thread(memory.append, memory_key, question, response)
+            background_tasks.add_task(memory.summarize_if_due, memory_key, rag.llm)
 
         return {
             "answer": response,
             "session_id": session_id,
+            "conversation_id": conversation_id if memory else None,
             "k": k,
-            "engine": "LCEL-RAG"
+            "engine": "LCEL-RAG",
+            "context": rag.last_context_stats.as_dict() if rag.last_context_stats else None,
+            "memory": memory_stats.as_dict() if memory_stats else None,
         }
 
 
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed - {str(e)}")
     
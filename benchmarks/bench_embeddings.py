@@ -0,0 +1,140 @@
+"""Compare embedding backends (PyTorch, ONNX Runtime, int8 ONNX) on CPU.
+
+    python -m benchmarks.bench_embeddings --texts 2000 --threads 4
+    python -m benchmarks.bench_embeddings --tiny-model /tmp/tiny-st   # offline: small random BERT
+    python -m benchmarks.bench_embeddings --backends torch --pool-workers 8 --threads 2
+
+Reports chunks/second per backend and how closely each backend's vectors agree with the
+PyTorch baseline: row-wise cosine similarity and overlap of top-10 nearest neighbours.
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.corpus import make_page
+from utils.config_loader import get_settings
+from utils.embedding_backend import BACKENDS
+from utils.model_loader import ModelLoader
+
+
+def make_texts(count: int, words: int = 120, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    return [make_page(rng, words) for _ in range(count)]
+
+
+def _topk(vectors: np.ndarray, queries: int, k: int) -> np.ndarray:
+    sims = vectors[:queries] @ vectors.T
+    return np.argsort(-sims, axis=1)[:, 1:k + 1]  # skip self
+
+
+def agreement(baseline: np.ndarray, other: np.ndarray, queries: int = 200, k: int = 10) -> Dict[str, float]:
+    b = baseline / np.linalg.norm(baseline, axis=1, keepdims=True)
+    o = other / np.linalg.norm(other, axis=1, keepdims=True)
+    cosine = (b * o).sum(axis=1)
+    queries = min(queries, len(b) - 1)
+    nb, no = _topk(b, queries, k), _topk(o, queries, k)
+    overlap = np.mean([len(set(x) & set(y)) / k for x, y in zip(nb, no)])
+    return {"cosine_mean": round(float(cosine.mean()), 5), "cosine_min": round(float(cosine.min()), 5),
+            f"top{k}_overlap": round(float(overlap), 4)}
+
+
+def run_backend(backend: str, texts: List[str], model: Optional[str], threads: Optional[int],
+                repeat: int) -> Dict[str, Any]:
+    settings = get_settings()
+    update: Dict[str, Any] = {"backend": backend, "threads": threads}
+    if model:
+        update["embedding_model_name"] = model
+    settings = settings.model_copy(update={"embedding_model": settings.embedding_model.model_copy(update=update)})
+
+    start = time.perf_counter()
+    embeddings = ModelLoader(settings).load_embeddings()
+    load_seconds = time.perf_counter() - start
+    embeddings.embed_documents(texts[:32])  # warm-up
+
+    runs, vectors = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        runs.append(time.perf_counter() - start)
+    best = min(runs)
+    return {"backend": backend, "load_seconds": round(load_seconds, 3), "seconds": round(best, 4),
+            "chunks_per_second": round(len(texts) / best, 1), "vectors": vectors}
+
+
+def run_pool(backend: str, texts: List[str], model: Optional[str], workers: int, threads: Optional[int],
+             repeat: int) -> Dict[str, Any]:
+    from utils.config_loader import EmbeddingSettings
+    from utils.embedding_pool import EmbeddingPool
+
+    cfg = get_settings().embedding_model
+    cfg = EmbeddingSettings(**{**cfg.model_dump(), "backend": backend, **({"embedding_model_name": model} if model else {})})
+    start = time.perf_counter()
+    pool = EmbeddingPool(cfg, workers, threads_per_worker=threads)
+    try:
+        pool.embed(texts[:workers * 32])  # warm-up: starts every worker and loads the model
+        load_seconds = time.perf_counter() - start
+        runs, vectors = [], None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            vectors = pool.embed(texts)
+            runs.append(time.perf_counter() - start)
+    finally:
+        pool.shutdown()
+    best = min(runs)
+    return {"backend": f"{backend} x{workers} processes", "load_seconds": round(load_seconds, 3),
+            "seconds": round(best, 4), "chunks_per_second": round(len(texts) / best, 1), "vectors": vectors}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--words", type=int, default=120, help="words per text (~chunk size)")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pool-workers", type=int, default=0,
+                        help="also run each backend through the multi-process embedding pool with N workers")
+    parser.add_argument("--model", default=None, help="model name or path (default: config.yaml)")
+    parser.add_argument("--tiny-model", default=None, metavar="DIR",
+                        help="build a small random BERT in DIR and benchmark it (no network needed)")
+    args = parser.parse_args()
+
+    model = args.model
+    if args.tiny_model:
+        from benchmarks.fakes import build_tiny_sentence_model
+
+        model = build_tiny_sentence_model(args.tiny_model)
+    texts = make_texts(args.texts, args.words)
+
+    results: List[Dict[str, Any]] = []
+    baseline: Optional[np.ndarray] = None
+    for backend in args.backends:
+        try:
+            result = run_backend(backend, texts, model, args.threads, args.repeat)
+        except Exception as e:  # e.g. onnxruntime / optimum not installed
+            results.append({"backend": backend, "error": f"{type(e).__name__}: {e}"})
+            continue
+        vectors = result.pop("vectors")
+        if backend == "torch":
+            baseline = vectors
+        elif baseline is not None:
+            result["agreement_vs_torch"] = agreement(baseline, vectors)
+        results.append(result)
+        if args.pool_workers:
+            pooled = run_pool(backend, texts, model, args.pool_workers, args.threads, args.repeat)
+            pooled["max_abs_diff_vs_single"] = float(np.abs(pooled.pop("vectors") - vectors).max())
+            results.append(pooled)
+
+    torch_rate = next((r["chunks_per_second"] for r in results if r["backend"] == "torch" and "error" not in r), None)
+    for r in results:
+        if torch_rate and "chunks_per_second" in r:
+            r["speedup_vs_torch"] = round(r["chunks_per_second"] / torch_rate, 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
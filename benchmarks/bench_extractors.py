@@ -0,0 +1,94 @@
+"""Compare text extractors for one format on the same synthetic corpus.
+
+    python -m benchmarks.bench_extractors --files 5 --pages 20
+    python -m benchmarks.bench_extractors --corpus ~/contracts --ext .pdf   # your own files
+
+Parses every file with each extractor registered for the extension (PyMuPDF and pypdf
+for PDFs), with the parse cache bypassed. Reports pages/second, MB/second, and how
+closely each extractor's words match the default extractor's (mean per-page Jaccard).
+"""
+import argparse
+import json
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.corpus import generate_corpus
+from utils.extractors import EXTRACTORS, extract
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def agreement(baseline: List[Dict[str, Any]], other: List[Dict[str, Any]]) -> float:
+    """Mean Jaccard similarity of the word sets of matching pages."""
+    scores = []
+    for a, b in zip(baseline, other):
+        wa, wb = _words(a["text"]), _words(b["text"])
+        scores.append(len(wa & wb) / len(wa | wb) if wa | wb else 1.0)
+    return round(sum(scores) / len(scores), 4) if scores else 0.0
+
+
+def run_extractor(name: str, paths: List[Path], repeat: int) -> Dict[str, Any]:
+    extractor = EXTRACTORS.get(name)
+    runs, pages = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages = [page for p in paths for page in extract(p, extractor, use_cache=False)["pages"]]
+        runs.append(time.perf_counter() - start)
+    best = min(runs)
+    mb = sum(p.stat().st_size for p in paths) / (1024 * 1024)
+    return {"extractor": name, "files": len(paths), "pages": len(pages), "seconds": round(best, 4),
+            "pages_per_second": round(len(pages) / best, 1), "mb_per_second": round(mb / best, 2),
+            "chars": sum(len(p["text"]) for p in pages), "page_texts": pages}
+
+
+def run(paths: List[Path], ext: str, extractors: Optional[List[str]] = None, repeat: int = 3) -> List[Dict[str, Any]]:
+    default = EXTRACTORS.for_path(Path(f"x{ext}")).name
+    names = extractors or [n for n in EXTRACTORS.names() if ext in EXTRACTORS.get(n).extensions]
+    names = sorted(names, key=lambda n: n != default)  # default first: it is the agreement baseline
+    results: List[Dict[str, Any]] = []
+    baseline = None
+    for name in names:
+        try:
+            result = run_extractor(name, paths, repeat)
+        except Exception as e:  # e.g. optional parser not installed
+            results.append({"extractor": name, "error": f"{type(e).__name__}: {e}"})
+            continue
+        texts = result.pop("page_texts")
+        if baseline is None:
+            baseline = texts
+        else:
+            result["word_agreement_vs_default"] = agreement(baseline, texts)
+        results.append(result)
+    rate = next((r["pages_per_second"] for r in results if r["extractor"] == default and "error" not in r), None)
+    for r in results:
+        if rate and "pages_per_second" in r:
+            r["speedup_vs_default"] = round(r["pages_per_second"] / rate, 2)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ext", default=".pdf")
+    parser.add_argument("--extractors", nargs="+", default=None, choices=EXTRACTORS.names())
+    parser.add_argument("--corpus", type=Path, default=None, help="directory of real files instead of synthetic ones")
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--words", type=int, default=300, help="words per page")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="docportal-extract-") as tmp:
+        if args.corpus:
+            paths = sorted(p for p in args.corpus.rglob(f"*{args.ext}") if p.is_file())
+        else:
+            paths = generate_corpus(Path(tmp), args.files, args.pages, args.words, types=(args.ext,))[args.ext]
+        print(json.dumps(run(paths, args.ext, args.extractors, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
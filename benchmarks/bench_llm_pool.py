@@ -0,0 +1,68 @@
+"""Compare per-request LLM clients against the pooled keep-alive clients.
+
+    python -m benchmarks.bench_llm_pool --calls 50 --latency 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from langchain_groq import ChatGroq
+
+from benchmarks.stub_llm_server import StubLLMServer
+from utils.config_loader import get_settings
+from utils.llm_pool import close_llm_pool
+from utils.model_loader import ModelLoader
+
+
+def _stub_settings(base_url: str):
+    settings = get_settings()
+    groq = settings.llm["groq"].model_copy(update={"base_url": base_url})
+    return settings.model_copy(update={"llm": {**settings.llm, "groq": groq}, "llm_provider": "groq"})
+
+
+def _run(label: str, calls: int, make_llm) -> dict:
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        make_llm().invoke("ping")
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "mode": label,
+        "calls": calls,
+        "mean_ms": round(1000 * sum(timings) / len(timings), 3),
+        "p95_ms": round(1000 * timings[int(0.95 * (len(timings) - 1))], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GROQ_API_KEY", "stub-key")
+    os.environ.setdefault("GEMINI_API_KEY", "stub-key")
+    results = []
+    with StubLLMServer(latency=args.latency) as server:
+        settings = _stub_settings(server.base_url)
+        groq = settings.llm["groq"]
+
+        opened = server.connections_opened
+        results.append(_run("per_request_client", args.calls, lambda: ChatGroq(
+            model=groq.model_name, api_key="stub-key", base_url=server.base_url,
+            temperature=groq.temperature, max_tokens=groq.max_tokens)))
+        results[-1]["connections_opened"] = server.connections_opened - opened
+
+        opened = server.connections_opened
+        results.append(_run("pooled_client", args.calls, lambda: ModelLoader(settings).load_client()))
+        results[-1]["connections_opened"] = server.connections_opened - opened
+        asyncio.run(close_llm_pool())
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare a benchmark result file against a stored baseline.
+
+    python -m benchmarks.compare bench_output.json benchmarks/baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25,
+                    min_seconds: float = 0.005) -> Dict[str, Any]:
+    """Flag stages whose median time grew by more than ``tolerance`` over the baseline.
+
+    Stages faster than ``min_seconds`` in both runs are reported but never flagged; at that
+    scale timer noise dominates.
+    """
+    rows, regressions = [], []
+    for stage, base in baseline.get("stages", {}).items():
+        cur = current.get("stages", {}).get(stage)
+        if cur is None:
+            rows.append({"stage": stage, "status": "missing"})
+            regressions.append(stage)
+            continue
+        ratio = cur["seconds"] / base["seconds"] if base["seconds"] else float("inf")
+        noisy = max(cur["seconds"], base["seconds"]) < min_seconds
+        if ratio > 1 + tolerance and not noisy:
+            status = "regression"
+            regressions.append(stage)
+        elif ratio < 1 - tolerance and not noisy:
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append({"stage": stage, "baseline_s": base["seconds"], "current_s": cur["seconds"],
+                     "ratio": round(ratio, 3), "status": status})
+    if current.get("meta", {}).get("files_per_type") != baseline.get("meta", {}).get("files_per_type"):
+        rows.append({"stage": "meta", "status": "warning: corpus size differs from baseline"})
+    return {"tolerance": tolerance, "rows": rows, "regressions": regressions}
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    for row in report["rows"]:
+        if "ratio" in row:
+            print(f"{row['stage']:<16} {row['baseline_s']:>10.4f}s -> {row['current_s']:>10.4f}s "
+                  f"x{row['ratio']:<6} {row['status']}")
+        else:
+            print(f"{row['stage']:<16} {row['status']}")
+    if report["regressions"]:
+        print(f"Regressions (> {report['tolerance']:.0%} slower): {', '.join(report['regressions'])}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare benchmark results against a baseline.")
+    parser.add_argument("current", type=Path)
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    report = compare_results(json.loads(args.current.read_text(encoding="utf-8")),
+                             json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+    print_report(report)
+    sys.exit(1 if report["regressions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Seeded generator for synthetic PDF / DOCX / TXT corpora.
+
+    python -m benchmarks.corpus --out /tmp/corpus --files 5 --pages 10
+"""
+import argparse
+import random
+import zipfile
+from pathlib import Path
+from typing import Dict, List
+from xml.sax.saxutils import escape
+
+import fitz  # PyMuPDF
+
+_VOCAB = (
+    "agreement invoice payment term party clause liability warranty delivery service customer vendor "
+    "amount total date schedule notice period renewal termination confidential obligation report "
+    "analysis revenue quarter growth policy compliance audit risk budget forecast contract section"
+).split()
+
+_BOILERPLATE = "This document is confidential and intended solely for the addressee. All rights reserved."
+
+
+def make_page(rng: random.Random, words: int) -> str:
+    sentences, remaining = [], words
+    while remaining > 0:
+        n = min(remaining, rng.randint(8, 20))
+        sentence = " ".join(rng.choice(_VOCAB) for _ in range(n))
+        sentences.append(sentence.capitalize() + ".")
+        remaining -= n
+    # repeated header/footer like real corpora
+    return f"{_BOILERPLATE}\n" + " ".join(sentences) + f"\n{_BOILERPLATE}"
+
+
+def write_pdf(path: Path, pages: List[str]) -> None:
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 545, 790), text, fontsize=9)
+    doc.save(str(path))
+    doc.close()
+
+
+def write_docx(path: Path, pages: List[str]) -> None:
+    """Minimal WordprocessingML package; enough for docx2txt and Word itself."""
+    body = "".join(
+        f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(line)}</w:t></w:r></w:p>"
+        for page in pages for line in page.splitlines()
+    )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/></Relationships>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", content_types)
+        zf.writestr("_rels/.rels", rels)
+        zf.writestr("word/document.xml", document)
+
+
+def write_txt(path: Path, pages: List[str]) -> None:
+    path.write_text("\n\n".join(pages), encoding="utf-8")
+
+
+_WRITERS = {".pdf": write_pdf, ".docx": write_docx, ".txt": write_txt}
+
+
+def generate_corpus(out_dir: Path, files_per_type: int = 3, pages: int = 5, words_per_page: int = 300,
+                    seed: int = 42, types=(".pdf", ".docx", ".txt")) -> Dict[str, List[Path]]:
+    """Write ``files_per_type`` documents of each type into ``out_dir``; same seed, same bytes of text."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    corpus: Dict[str, List[Path]] = {}
+    for ext in types:
+        for i in range(files_per_type):
+            path = out_dir / f"synthetic_{ext[1:]}_{i:03d}{ext}"
+            _WRITERS[ext](path, [make_page(rng, words_per_page) for _ in range(pages)])
+            corpus.setdefault(ext, []).append(path)
+    return corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic document corpus.")
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--files", type=int, default=3, help="files per type")
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--words", type=int, default=300, help="words per page")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    corpus = generate_corpus(args.out, args.files, args.pages, args.words, args.seed)
+    for ext, paths in corpus.items():
+        print(f"{ext}: {len(paths)} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Deterministic stand-ins for the embedding model and LLM so benchmarks measure our code, not providers."""
+import hashlib
+import re
+from itertools import cycle
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+_TOKEN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Bag-of-words feature hashing into a fixed-size, L2-normalized vector.
+
+    Identical text always maps to the identical vector and texts sharing words land
+    close together, so FAISS retrieval behaves sensibly without loading a model.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _bucket(self, token: str) -> int:
+        return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in _TOKEN.findall(text.lower()):
+                h = self._bucket(token)
+                matrix[row, h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        return matrix.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def stub_llm(responses: Optional[List[str]] = None) -> FakeListChatModel:
+    """Chat model that replays canned responses in order (and cycles)."""
+    return FakeListChatModel(responses=responses or ["Stub answer based on the retrieved context."])
+
+
+class StubModelLoader:
+    """Drop-in for ModelLoader that never touches API keys, the network or PyTorch."""
+
+    def __init__(self, dim: int = 384, responses: Optional[List[str]] = None):
+        self._embeddings = HashingEmbeddings(dim)
+        self._responses = cycle(responses or ["Stub answer based on the retrieved context."])
+        self.settings = None
+
+    def load_embeddings(self) -> HashingEmbeddings:
+        return self._embeddings
+
+    def load_llm(self, provider_key: Optional[str] = None) -> FakeListChatModel:
+        return stub_llm([next(self._responses)])
+
+
+def build_tiny_sentence_model(out_dir, vocab_words: Optional[List[str]] = None, hidden: int = 128,
+                              layers: int = 2, seed: int = 0) -> str:
+    """Save a small randomly initialised BERT sentence-transformer to ``out_dir``.
+
+    Real weights are not needed to compare inference backends (speed, and agreement between
+    backends running the same weights), so the embedding benchmark can run without network access.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+    from tokenizers import Tokenizer, normalizers, pre_tokenizers, processors
+    from tokenizers.models import WordPiece
+    from transformers import BertConfig, BertModel, PreTrainedTokenizerFast
+
+    from benchmarks.corpus import _VOCAB
+
+    words = sorted(set(vocab_words or _VOCAB))
+    vocab = {tok: i for i, tok in enumerate(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "."] + words)}
+    backend = Tokenizer(WordPiece(vocab=vocab, unk_token="[UNK]"))
+    backend.normalizer = normalizers.BertNormalizer(lowercase=True)
+    backend.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    backend.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", pair="[CLS] $A [SEP] $B [SEP]", special_tokens=[("[CLS]", 2), ("[SEP]", 3)])
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, unk_token="[UNK]", cls_token="[CLS]",
+                                        sep_token="[SEP]", pad_token="[PAD]", mask_token="[MASK]",
+                                        model_max_length=256)
+
+    torch.manual_seed(seed)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=hidden, num_hidden_layers=layers,
+                        num_attention_heads=max(1, hidden // 64), intermediate_size=hidden * 4,
+                        max_position_embeddings=256)
+    staging = Path(out_dir) / "_hf"
+    BertModel(config).save_pretrained(staging)
+    tokenizer.save_pretrained(staging)
+
+    transformer = models.Transformer(str(staging), max_seq_length=256)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension(), pooling_mode="mean")
+    SentenceTransformer(modules=[transformer, pooling, models.Normalize()], device="cpu").save(str(out_dir))
+    return str(out_dir)
@@ -0,0 +1,361 @@
+"""End-to-end HTTP load test: ``api.main:app`` under uvicorn against a local stub LLM provider.
+
+    python -m benchmarks.loadtest --workers 1 2 4 --concurrency 4 16 --duration 30
+    python -m benchmarks.loadtest --tiny-model /tmp/tiny-st --latency 0.3 --tokens-per-second 150
+    python -m benchmarks.loadtest --mix benchmarks/loadtest_mix.jsonl --output loadtest.json
+
+For each worker count the app runs as ``uvicorn --workers N`` in a scratch directory, pointed
+at the stub provider by a generated config (``CONFIG_PATH``). A few chat sessions are indexed
+and every endpoint is warmed up, then each concurrency level runs a closed loop of virtual
+users replaying the weighted request mix for ``--duration`` seconds. The report gives
+throughput, p50/p95/p99 latency and error rate per endpoint for every (workers, concurrency).
+
+Mix files are JSONL, one request type per line::
+
+    {"endpoint": "/chat/query", "weight": 6, "data": {"k": 5}}
+    {"endpoint": "/compare", "weight": 1, "pages": 3, "data": {"mode": "sectioned"}}
+
+``pages`` sizes the generated uploads and ``data`` is sent as extra form fields.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+import yaml
+
+from benchmarks.corpus import make_page, write_pdf
+from benchmarks.stub_llm_server import StubLLMServer
+from utils.config_loader import config_path
+
+ROOT = Path(__file__).resolve().parent.parent
+ENDPOINTS = ("/chat/query", "/chat/index", "/analyze/", "/compare")
+DEFAULT_MIX = Path(__file__).with_name("loadtest_mix.jsonl")
+
+QUESTIONS = [
+    "What is the notice period for termination?",
+    "Summarize the payment terms.",
+    "Which party is liable for delivery delays?",
+    "When does the agreement renew?",
+]
+
+_ANALYSIS_REPLY = json.dumps({
+    "Summary": ["Synthetic agreement between a customer and a vendor."], "Title": "Synthetic agreement",
+    "Author": "Unknown", "DateCreated": "2024-01-01", "LastModifiedDate": "2024-01-01", "Publisher": "Unknown",
+    "Language": "English", "Pagecount": 3, "Senttimetone": "Neutral"})
+_COMPARISON_REPLY = json.dumps({
+    "title": "Synthetic comparison", "similarities": ["Both documents are agreements."],
+    "differences": ["Page 1 wording changed."], "document1_summary": ["Original agreement."],
+    "document2_summary": ["Revised agreement."], "unique_information": {"document1": [], "document2": []}})
+
+Sample = Tuple[str, float, int]  # (endpoint, seconds, HTTP status; 0 = transport error)
+
+
+@dataclass
+class MixEntry:
+    endpoint: str
+    weight: float = 1.0
+    pages: int = 3
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+def load_mix(path: os.PathLike) -> List[MixEntry]:
+    mix = []
+    for lineno, line in enumerate(Path(path).read_text(encoding="utf-8").splitlines(), 1):
+        if not line.strip():
+            continue
+        entry = MixEntry(**json.loads(line))
+        if entry.endpoint not in ENDPOINTS:
+            raise ValueError(f"{path}:{lineno}: unsupported endpoint {entry.endpoint!r}, expected one of {ENDPOINTS}")
+        mix.append(entry)
+    if not mix:
+        raise ValueError(f"{path}: empty request mix")
+    return mix
+
+
+def portal_responder(payload: dict) -> str:
+    """Stub reply that each of the app's prompts can parse."""
+    messages = payload.get("messages", [])
+    text = " ".join(str(m.get("content", "")) for m in messages)
+    if "Analyze this document" in text:
+        return _ANALYSIS_REPLY
+    if "Compare these documents" in text:
+        return _COMPARISON_REPLY
+    if "standalone question" in text:  # question rewriting: hand the question back
+        return str(messages[-1].get("content", "")) if messages else ""
+    if "running summary" in text:
+        return "The user asked about the agreement's terms."
+    return "The agreement sets a 30 day notice period and monthly payment terms."
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(q * len(ordered) / 100))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples: List[Sample], seconds: float) -> Dict[str, Dict[str, Any]]:
+    by_endpoint: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample[0]].append(sample)
+        by_endpoint["all"].append(sample)
+    report = {}
+    for endpoint, rows in sorted(by_endpoint.items()):
+        latencies = sorted(r[1] for r in rows)
+        statuses: Dict[str, int] = defaultdict(int)
+        for r in rows:
+            statuses[str(r[2])] += 1
+        errors = sum(1 for r in rows if not 200 <= r[2] < 400)
+        report[endpoint] = {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / seconds, 2) if seconds else 0.0,
+            "p50_ms": round(1000 * percentile(latencies, 50), 1),
+            "p95_ms": round(1000 * percentile(latencies, 95), 1),
+            "p99_ms": round(1000 * percentile(latencies, 99), 1),
+            "error_rate": round(errors / len(rows), 4),
+            "statuses": dict(statuses),
+        }
+    return report
+
+
+class Payloads:
+    """Upload bodies generated once per page count, so the client stays cheap under load."""
+
+    def __init__(self, seed: int = 42, words_per_page: int = 250):
+        self._rng = random.Random(seed)
+        self.words_per_page = words_per_page
+        self._pdfs: Dict[Tuple[int, int], bytes] = {}
+        self._tmp = Path(tempfile.mkdtemp(prefix="loadtest-payloads-"))
+
+    def pdf(self, pages: int, variant: int = 0) -> bytes:
+        key = (pages, variant)
+        if key not in self._pdfs:
+            rng = random.Random(pages)
+            texts = [make_page(rng, self.words_per_page) for _ in range(pages)]
+            if variant:
+                texts[0] = make_page(random.Random(1000 + variant), self.words_per_page)
+            path = self._tmp / f"doc_{pages}_{variant}.pdf"
+            write_pdf(path, texts)
+            self._pdfs[key] = path.read_bytes()
+        return self._pdfs[key]
+
+    def request(self, entry: MixEntry, rng: random.Random, sessions: Sequence[str]) -> Dict[str, Any]:
+        """``files``/``data`` keyword arguments for one request of this mix entry."""
+        data = dict(entry.data)
+        if entry.endpoint == "/chat/query":
+            data.setdefault("question", rng.choice(QUESTIONS))
+            data.setdefault("session_id", rng.choice(sessions))
+            return {"data": data}
+        if entry.endpoint == "/chat/index":
+            return {"files": [("files", ("agreement.pdf", self.pdf(entry.pages), "application/pdf"))], "data": data}
+        if entry.endpoint == "/analyze/":
+            return {"files": {"file": ("agreement.pdf", self.pdf(entry.pages), "application/pdf")}, "data": data}
+        return {"files": {"reference": ("v1.pdf", self.pdf(entry.pages), "application/pdf"),
+                          "actual": ("v2.pdf", self.pdf(entry.pages, variant=1), "application/pdf")}, "data": data}
+
+
+def write_config(work: Path, stub_url: str, embedding_model: Optional[str]) -> Path:
+    """The repo config with every LLM call routed to the stub and provider limits lifted."""
+    cfg = yaml.safe_load(Path(config_path).read_text()) or {}
+    for provider in cfg.get("llm", {}).values():
+        provider.update({"base_url": stub_url, "rpm": 1_000_000, "tpm": 1_000_000_000})
+    cfg.setdefault("llm_gateway", {})["failover"] = ["groq"]  # the stub speaks the OpenAI/Groq API only
+    cfg.setdefault("session_janitor", {})["enabled"] = False
+    if embedding_model:
+        cfg.setdefault("embedding_model", {})["embedding_model_name"] = embedding_model
+    path = work / "config.yaml"
+    path.write_text(yaml.safe_dump(cfg, sort_keys=False))
+    return path
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class AppServer:
+    """``uvicorn api.main:app --workers N`` in a scratch directory (uploads, indexes, logs stay there)."""
+
+    def __init__(self, work: Path, config: Path, workers: int, startup_timeout: float = 120):
+        self.work = work
+        self.config = config
+        self.workers = workers
+        self.startup_timeout = startup_timeout
+        self.port = _free_port()
+        self.proc: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "AppServer":
+        env = {**os.environ, "CONFIG_PATH": str(self.config), "LLM_PROVIDER": "groq",
+               "GROQ_API_KEY": "stub-key", "GEMINI_API_KEY": "stub-key",
+               "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))}
+        self.log_file = open(self.work / f"uvicorn_{self.workers}w.log", "wb")
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--workers", str(self.workers), "--log-level", "warning"],
+            cwd=self.work, env=env, stdout=self.log_file, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {self.proc.returncode}, see {self.log_file.name}")
+            try:
+                if httpx.get(f"{self.base_url}/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.25)
+        self.__exit__()
+        raise TimeoutError(f"app did not become healthy within {self.startup_timeout}s")
+
+    def __exit__(self, *exc) -> None:
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self.log_file.close()
+
+
+async def _send(client: httpx.AsyncClient, entry: MixEntry, kwargs: Dict[str, Any]) -> Tuple[float, int, Any]:
+    start = time.perf_counter()
+    try:
+        response = await client.post(entry.endpoint, **kwargs)
+        status, body = response.status_code, response
+    except httpx.HTTPError:
+        status, body = 0, None
+    return time.perf_counter() - start, status, body
+
+
+async def seed_sessions(client: httpx.AsyncClient, payloads: Payloads, count: int, pages: int) -> List[str]:
+    """Index ``count`` chat sessions for ``/chat/query`` to hit."""
+    entry = MixEntry("/chat/index", pages=pages)
+    sessions = []
+    for _ in range(count):
+        _, status, response = await _send(client, entry, payloads.request(entry, random.Random(), []))
+        if status != 200:
+            detail = response.text[:300] if response is not None else "transport error"
+            raise RuntimeError(f"seeding /chat/index failed with {status}: {detail}")
+        sessions.append(response.json()["session_id"])
+    return sessions
+
+
+async def run_level(base_url: str, mix: List[MixEntry], payloads: Payloads, sessions: Sequence[str],
+                    concurrency: int, duration: float, timeout: float, seed: int = 0) -> Tuple[List[Sample], float]:
+    """Closed loop: ``concurrency`` virtual users each send the next request as soon as the last one returns."""
+    samples: List[Sample] = []
+    weights = [e.weight for e in mix]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+
+        async def user(uid: int) -> None:
+            rng = random.Random(seed * 1000 + uid)
+            while time.perf_counter() < deadline:
+                entry = rng.choices(mix, weights)[0]
+                seconds, status, _ = await _send(client, entry, payloads.request(entry, rng, sessions))
+                samples.append((entry.endpoint, seconds, status))
+
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+        return samples, time.perf_counter() - start
+
+
+async def _warm_up(base_url: str, mix: List[MixEntry], payloads: Payloads, sessions: Sequence[str],
+                   workers: int, timeout: float) -> List[str]:
+    """Send every mix entry to every worker (roughly) so model loading is not measured."""
+    sessions = list(sessions)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        if any(e.endpoint == "/chat/query" for e in mix) and not sessions:
+            sessions = await seed_sessions(client, payloads, max(2, workers), pages=3)
+        rng = random.Random(0)
+        await asyncio.gather(*(_send(client, entry, payloads.request(entry, rng, sessions))
+                               for entry in mix for _ in range(workers)))
+    return sessions
+
+
+def run(workers_list: Sequence[int], concurrency_list: Sequence[int], duration: float, mix: List[MixEntry],
+        stub: StubLLMServer, embedding_model: Optional[str], timeout: float = 120, sessions: int = 0,
+        work: Optional[Path] = None) -> List[Dict[str, Any]]:
+    work = Path(work or tempfile.mkdtemp(prefix="docportal-loadtest-"))
+    config = write_config(work, stub.base_url, embedding_model)
+    payloads = Payloads()
+    results = []
+    for workers in workers_list:
+        with AppServer(work, config, workers) as app:
+            seeded = asyncio.run(_warm_up(app.base_url, mix, payloads, [], max(workers, sessions), timeout))
+            for concurrency in concurrency_list:
+                llm_before = stub.requests_served
+                samples, seconds = asyncio.run(run_level(app.base_url, mix, payloads, seeded, concurrency,
+                                                         duration, timeout, seed=concurrency))
+                results.append({"workers": workers, "concurrency": concurrency, "seconds": round(seconds, 2),
+                                "llm_calls": stub.requests_served - llm_before,
+                                "endpoints": summarize(samples, seconds)})
+                overall = results[-1]["endpoints"].get("all", {})
+                print(f"workers={workers} concurrency={concurrency} rps={overall.get('throughput_rps')} "
+                      f"p95_ms={overall.get('p95_ms')} errors={overall.get('error_rate')}", file=sys.stderr)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="uvicorn worker counts to test")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per (workers, concurrency) level")
+    parser.add_argument("--mix", type=Path, default=DEFAULT_MIX, help="JSONL request mix")
+    parser.add_argument("--sessions", type=int, default=4, help="chat sessions indexed up front for /chat/query")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request client timeout (seconds)")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub LLM: fixed seconds per completion")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="stub LLM: generation speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub LLM: fraction of 503 replies")
+    parser.add_argument("--rpm-limit", type=int, default=None, help="stub LLM: 429 above this many requests/min")
+    parser.add_argument("--embedding-model", default=None, help="model name or path (default: config.yaml)")
+    parser.add_argument("--tiny-model", default=None, metavar="DIR",
+                        help="build a small random BERT in DIR and use it (no network needed)")
+    parser.add_argument("--work-dir", type=Path, default=None, help="scratch dir (default: a new temp dir)")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one INFO line per request otherwise
+
+    model = args.embedding_model
+    if args.tiny_model:
+        from benchmarks.fakes import build_tiny_sentence_model
+
+        model = build_tiny_sentence_model(args.tiny_model)
+    mix = load_mix(args.mix)
+    stub = StubLLMServer(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                         error_rate=args.error_rate, rpm_limit=args.rpm_limit, responder=portal_responder)
+    with stub:
+        results = run(args.workers, args.concurrency, args.duration, mix, stub, model, timeout=args.timeout,
+                      sessions=args.sessions, work=args.work_dir)
+    report = {"meta": {"mix": str(args.mix), "duration": args.duration, "stub_latency": args.latency,
+                       "stub_tokens_per_second": args.tokens_per_second, "embedding_model": model,
+                       "cpus": os.cpu_count()},
+              "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
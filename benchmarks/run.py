@@ -0,0 +1,147 @@
+"""Ingestion and query benchmark suite against deterministic fake models.
+
+    python -m benchmarks.run --files 3 --pages 5 --output bench_output.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json   # exit 1 on regression
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.compare import compare_results, print_report
+from benchmarks.corpus import generate_corpus
+from benchmarks.fakes import StubModelLoader, stub_llm
+from src.document_chat.retrieval import ConversationalRAG
+from src.document_ingestion.data_ingestion import ChatIngestor, FaissManager
+from utils.document_ops import load_documents
+from utils.parse_cache import ParsedDocumentCache, set_parse_cache
+
+QUERIES = [
+    "What is the payment term in the agreement?",
+    "Summarize the liability clause.",
+    "When does the renewal notice period start?",
+    "What does the audit report say about compliance risk?",
+]
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> Tuple[Any, List[float]]:
+    result, runs = None, []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+    return result, runs
+
+
+def _entry(runs: List[float], items: int, unit: str) -> Dict[str, Any]:
+    median = statistics.median(runs)
+    return {
+        "seconds": round(median, 6),
+        "min_seconds": round(min(runs), 6),
+        "runs": len(runs),
+        "items": items,
+        "unit": unit,
+        "items_per_second": round(items / median, 2) if median > 0 else None,
+    }
+
+
+def run_suite(files_per_type: int = 3, pages: int = 5, words_per_page: int = 300, repeat: int = 3,
+              seed: int = 42, chunk_size: int = 1000, chunk_overlap: int = 200,
+              chunk_mode: Optional[str] = None) -> Dict[str, Any]:
+    loader = StubModelLoader()
+    stages: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory(prefix="docportal-bench-") as tmp:
+        work = Path(tmp)
+        corpus = generate_corpus(work / "corpus", files_per_type, pages, words_per_page, seed)
+        paths = [p for group in corpus.values() for p in group]
+
+        runs = []
+        for i in range(repeat):  # cold: empty parse cache every run
+            set_parse_cache(ParsedDocumentCache(work / f"parse_cache_{i}"))
+            docs, r = _timed(lambda: load_documents(paths), 1)
+            runs += r
+        stages["load_documents"] = _entry(runs, len(docs), "documents")
+        docs, runs = _timed(lambda: load_documents(paths), repeat)  # warm: served from the last cache
+        stages["load_documents_cached"] = _entry(runs, len(docs), "documents")
+        set_parse_cache(None)
+
+        ingestor = ChatIngestor(temp_base=work / "data", faiss_base=work / "faiss", use_session_dirs=True,
+                                session_id="bench", model_loader=loader)  # type: ignore[arg-type]
+        chunks, runs = _timed(lambda: ingestor._split(docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                                      mode=chunk_mode), repeat)
+        stages["split"] = _entry(runs, len(chunks), "chunks")
+        chunking = ingestor.last_chunk_stats.as_dict()
+
+        half = max(1, len(chunks) // 2)
+        texts = [c.page_content for c in chunks]
+        metas = [c.metadata for c in chunks]
+        build_runs, add_runs, load_runs = [], [], []
+        for i in range(repeat):
+            fm = FaissManager(work / "faiss" / f"run_{i}", loader)  # type: ignore[arg-type]
+            _, r = _timed(lambda: fm.load_or_create(texts=texts[:half], metadatas=metas[:half]), 1)
+            build_runs += r
+            _, r = _timed(lambda: fm.add_documents(chunks[half:]), 1)
+            add_runs += r
+            _, r = _timed(lambda: FaissManager(fm.index_dir, loader).load_or_create(), 1)  # type: ignore[arg-type]
+            load_runs += r
+        stages["faiss_build"] = _entry(build_runs, half, "chunks")
+        stages["faiss_add"] = _entry(add_runs, len(chunks) - half, "chunks")
+        stages["faiss_load"] = _entry(load_runs, len(chunks), "chunks")
+
+        store = FaissManager(work / "faiss" / "run_0", loader).load_or_create()  # type: ignore[arg-type]
+        retriever = store.as_retriever(search_type="similarity", search_kwargs={"k": 5})
+        _, runs = _timed(lambda: [retriever.invoke(q) for q in QUERIES], repeat)
+        stages["retrieval"] = _entry(runs, len(QUERIES), "queries")
+
+        rag = ConversationalRAG(session_id="bench", retriever=retriever, llm=stub_llm())
+        _, runs = _timed(lambda: [rag.invoke(q, chat_history=[]) for q in QUERIES], repeat)
+        stages["rag_query"] = _entry(runs, len(QUERIES), "queries")
+
+    return {
+        "meta": {
+            "files_per_type": files_per_type,
+            "pages": pages,
+            "words_per_page": words_per_page,
+            "repeat": repeat,
+            "seed": seed,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "chunking": chunking,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "stages": stages,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=3, help="files per type")
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--words", type=int, default=300, help="words per page")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-mode", choices=["token", "char"], default=None, help="default: config chunking.mode")
+    parser.add_argument("--output", type=Path, default=Path("bench_output.json"))
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown ratio, e.g. 0.25 = 25%%")
+    args = parser.parse_args()
+
+    results = run_suite(args.files, args.pages, args.words, args.repeat, args.seed, chunk_mode=args.chunk_mode)
+    args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        report = compare_results(results, baseline, args.tolerance)
+        print_report(report)
+        sys.exit(1 if report["regressions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
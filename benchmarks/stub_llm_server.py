@@ -0,0 +1,176 @@
+"""Local OpenAI/Groq-compatible chat completions server for benchmarks and load tests.
+
+Run standalone with ``python -m benchmarks.stub_llm_server --port 8900`` and point the
+app at it through the ``base_url`` of a provider in config.yaml (or ``GROQ_API_BASE``).
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional, Tuple
+
+
+class StubLLMServer:
+    """Threaded HTTP/1.1 server answering ``POST .../chat/completions`` with a canned reply.
+
+    To emulate an overloaded provider, ``rpm_limit`` answers 429 with Retry-After once more
+    than that many requests arrive within ``rate_window`` seconds, and ``error_rate`` answers
+    that fraction of requests with ``error_status``. ``responder`` picks the reply from the
+    request payload (e.g. valid JSON for the analysis prompt, prose for chat).
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 reply: str = '{"answer": "stub"}', tokens_per_second: Optional[float] = None,
+                 rpm_limit: Optional[int] = None, rate_window: float = 60.0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int = 0,
+                 responder: Optional[Callable[[dict], str]] = None):
+        self.latency = latency
+        self.reply = reply
+        self.responder = responder
+        self.tokens_per_second = tokens_per_second
+        self.rpm_limit = rpm_limit
+        self.rate_window = rate_window
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._recent: deque = deque()
+        self.connections_opened = 0
+        self.requests_served = 0
+        self.requests_throttled = 0
+        self.requests_failed = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "StubLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def completion_delay(self, completion_tokens: int) -> float:
+        delay = self.latency
+        if self.tokens_per_second:
+            delay += completion_tokens / self.tokens_per_second
+        return delay
+
+    def rejection(self) -> Optional[Tuple[int, dict, dict]]:
+        """(status, body, headers) when this request should be throttled or failed, else None."""
+        with self._lock:
+            now = time.monotonic()
+            if self.rpm_limit is not None:
+                while self._recent and now - self._recent[0] >= self.rate_window:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rpm_limit:
+                    self.requests_throttled += 1
+                    wait = self._recent[0] + self.rate_window - now
+                    return 429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                           "code": "rate_limit_exceeded"}}, \
+                        {"Retry-After": str(math.ceil(wait)), "retry-after-ms": str(int(wait * 1000) + 1)}
+                self._recent.append(now)
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.requests_failed += 1
+                return self.error_status, {"error": {"message": "Service unavailable", "type": "internal_server_error"}}, {}
+        return None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections_opened += 1
+
+            def log_message(self, *args):  # keep benchmark output clean
+                pass
+
+            def _send_json(self, status: int, body: dict, headers: Optional[dict] = None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("chat/completions"):
+                    self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+                    return
+                rejected = server.rejection()
+                if rejected:
+                    self._send_json(*rejected)
+                    return
+                prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in payload.get("messages", []))
+                reply = server.responder(payload) if server.responder else server.reply
+                completion_tokens = max(1, len(reply) // 4)
+                time.sleep(server.completion_delay(completion_tokens))
+                with server._lock:
+                    server.requests_served += 1
+                self._send_json(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": payload.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": reply},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a stub OpenAI/Groq-compatible LLM server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="fixed seconds added to every response")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="simulated generation speed")
+    parser.add_argument("--reply", default='{"answer": "stub"}')
+    parser.add_argument("--rpm-limit", type=int, default=None, help="answer 429 above this many requests per minute")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+    server = StubLLMServer(args.host, args.port, args.latency, args.reply, args.tokens_per_second,
+                           rpm_limit=args.rpm_limit, error_rate=args.error_rate)
+    print(f"Stub LLM server listening on {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -25,4 +25,5 @@ class promptType(str, Enum):
     DOCUMENT_ANALYSIS = "document_analysis"
     DOCUMENT_COMPARISON = "document_comparison"
     CONTEXTULIZE_QUSTION = "contextulize_question"
-    CONTEXT_QA = "context_qa"
\ No newline at end of file
+    CONTEXT_QA = "context_qa"
+    CONVERSATION_SUMMARY = "conversation_summary"
\ No newline at end of file
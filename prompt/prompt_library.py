@@ -64,6 +64,15 @@ contextualize_question_prompt = ChatPromptTemplate.from_messages([
 ])
 
 
+# Prompt for folding old chat turns into the rolling conversation summary
+conversation_summary_prompt = ChatPromptTemplate.from_messages([
+    ("system", (
+        "You maintain a running summary of a conversation about a set of documents. Extend the current summary "
+        "with the new lines of conversation. Keep facts, names, numbers and open questions the user may refer back "
+        "to; drop pleasantries. Reply with the updated summary only, in at most {max_words} words."
+    )),
+    ("human", "Current summary:\n{summary}\n\nNew lines of conversation:\n{new_lines}\n\nUpdated summary:"),
+])
 
 
 # central dictionries to register prompt types
@@ -71,7 +80,8 @@ PROMPT_REGISTRY = {
     "document_analysis": document_analysis_prompt,
     "document_comparison": document_comparison_prompt,
     "contextulize_question" : contextualize_question_prompt,
-    "context_qa" : context_qa_prompt
+    "context_qa" : context_qa_prompt,
+    "conversation_summary": conversation_summary_prompt
 }
 
 
@@ -0,0 +1,74 @@
+import asyncio
+import sys
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from exception.custom_exception_archive import DocumentPortalException
+from logger.custom_logger import CustomLogger
+from src.document_analyzer.data_analysis import DocumentAnalyzer
+from utils.fair_scheduler import BULK, work_scope
+from utils.metrics import track_stage
+
+
+class BatchDocumentAnalyzer:
+    """Analyze many documents with one shared DocumentAnalyzer (and LLM client).
+
+    Parsing runs on up to ``parse_workers`` threads and LLM analysis on up to
+    ``max_concurrency`` threads; results are yielded as each file finishes, not in
+    upload order, so the caller can stream them. LLM calls are scheduled as ``bulk``
+    work of ``tenant`` (see utils.fair_scheduler), behind interactive requests.
+    """
+
+    def __init__(self, read_text: Callable[[str], str], analyzer: Optional[DocumentAnalyzer] = None,
+                 max_concurrency: int = 8, parse_workers: int = 4, tenant: Optional[str] = None):
+        self.log = CustomLogger().get_logger(__name__)
+        try:
+            self.read_text = read_text
+            self.analyzer = analyzer or DocumentAnalyzer()
+            self.max_concurrency = max_concurrency
+            self.parse_workers = parse_workers
+            self.tenant = tenant
+        except Exception as e:
+            self.log.error("Error initializing BatchDocumentAnalyzer:", error=str(e))
+            raise DocumentPortalException("Error initializing BatchDocumentAnalyzer:", sys)
+
+    async def _analyze_one(self, index: int, path: str, parse_sem: asyncio.Semaphore,
+                           llm_sem: asyncio.Semaphore) -> Dict[str, Any]:
+        record: Dict[str, Any] = {"index": index, "filename": Path(path).name}
+        try:
+            async with parse_sem:
+                text = await asyncio.to_thread(self.read_text, path)
+            async with llm_sem:
+                with track_stage("batch_analyzer", "analyze"), work_scope(BULK, self.tenant):
+                    result = await asyncio.to_thread(self.analyzer.analyze_document, text)
+            record.update(status="ok", result=result)
+        except Exception as e:
+            self.log.error("Batch analysis failed for file", filename=record["filename"], error=str(e))
+            record.update(status="error", error=str(e).splitlines()[0] if str(e) else type(e).__name__)
+        return record
+
+    async def stream(self, paths: Dict[int, str], errors: Optional[List[Dict[str, Any]]] = None
+                     ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield one record per file as soon as it completes, then a summary record.
+
+        ``paths`` maps the upload index to the saved file; ``errors`` are records for uploads
+        that were rejected before parsing and are emitted first.
+        """
+        errors = errors or []
+        for record in errors:
+            yield record
+        parse_sem = asyncio.Semaphore(self.parse_workers)
+        llm_sem = asyncio.Semaphore(self.max_concurrency)
+        tasks = [asyncio.create_task(self._analyze_one(i, p, parse_sem, llm_sem)) for i, p in paths.items()]
+        failed = len(errors)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                record = await next_done
+                failed += record["status"] != "ok"
+                yield record
+        finally:
+            for t in tasks:  # no-op when finished; stops queued work if the client went away
+                t.cancel()
+        total = len(paths) + len(errors)
+        self.log.info("Batch analysis completed", files=total, failed=failed)
+        yield {"summary": {"files": total, "succeeded": total - failed, "failed": failed}}
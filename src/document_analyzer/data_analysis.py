@@ -8,6 +8,8 @@ from model.models import *
 from utils.model_loader import ModelLoader
 from exception.custom_exception_archive import DocumentPortalException
 from logger.custom_logger import CustomLogger
+from utils.metrics import track_stage, LLMMetricsCallback
+from utils.structured_output import LocalRepairOutputParser
 
 
 
@@ -26,6 +28,9 @@ class DocumentAnalyzer:
             
             self.parser = JsonOutputParser(pydantic_object= Metadata)
             self.fixing_parser = OutputFixingParser.from_llm(parser = self.parser, llm =self.llm)
+            # repairs fences/trailing commas/truncation locally; the LLM fixer only runs when that fails
+            self.output_parser = LocalRepairOutputParser(pydantic_object=Metadata, fallback=self.fixing_parser,
+                                                         component="document_analyzer")
             
             self.prompt = PROMPT_REGISTRY["document_analysis"]
             
@@ -43,13 +48,14 @@ class DocumentAnalyzer:
         self.log.info("Analyzing document...")
          
         try:
-            chain = self.prompt | self.llm | self.fixing_parser
+            chain = self.prompt | self.llm | self.output_parser
             self.log.info("Meta data analysis chain intilized.")
             
-            response = chain.invoke({
-                "format_instructions": self.parser.get_format_instructions(),
-                "document_text": document_text
-            })
+            with track_stage("document_analyzer", "analyze"):
+                response = chain.invoke({
+                    "format_instructions": self.parser.get_format_instructions(),
+                    "document_text": document_text
+                }, config={"callbacks": [LLMMetricsCallback("document_analyzer")]})
             
             self.log.info("Meta data analysis completed successfully.", keys = list(response.keys()))
             return response
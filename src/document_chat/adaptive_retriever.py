@@ -0,0 +1,68 @@
+"""Adaptive-k retrieval: up to ``k`` chunks, cut where relevance runs out.
+
+FAISS returns the ``k`` nearest chunks no matter how relevant they are, so an easy question
+still sends ``k`` chunks to the LLM. :class:`AdaptiveKRetriever` fetches ``k`` (the request's
+``k`` or ``retriever.top_k``) and keeps the leading run of hits that
+
+* score at least ``min_score``, and
+* do not fall more than ``max_drop`` (relative) below the previous hit,
+
+always keeping ``min_k``. The score is stored in ``metadata["score"]`` (higher is better:
+cosine similarity for the unit-length vectors sentence-transformers models produce),
+which the context assembler uses to rank spans.
+"""
+from typing import List, Optional, Sequence
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from utils.config_loader import RetrieverSettings, get_settings
+from utils.metrics import record_retrieval
+
+
+def adaptive_cutoff(scores: Sequence[float], min_k: int = 1, min_score: Optional[float] = None,
+                    max_drop: Optional[float] = None) -> int:
+    """How many of the best-first ``scores`` to keep."""
+    keep = min(len(scores), max(min_k, 0))
+    for i in range(keep, len(scores)):
+        if min_score is not None and scores[i] < min_score:
+            break
+        prev = scores[i - 1] if i else None
+        if max_drop is not None and prev is not None and prev > 0 and (prev - scores[i]) / prev > max_drop:
+            break
+        keep = i + 1
+    return keep
+
+
+class AdaptiveKRetriever(BaseRetriever):
+    vectorstore: FAISS
+    k: int = 10
+    min_k: int = 1
+    min_score: Optional[float] = None
+    max_drop: Optional[float] = None
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        hits = self.vectorstore.similarity_search_with_score(query, k=self.k)
+        # IndexFlatL2 returns squared L2 distance; for unit vectors cosine = 1 - d / 2
+        scored = [(doc, 1.0 - float(distance) / 2.0) for doc, distance in hits]
+        keep = adaptive_cutoff([s for _, s in scored], self.min_k, self.min_score, self.max_drop)
+        record_retrieval("adaptive", fetched=len(scored), kept=keep)
+        # copies: the hits are the docstore's own objects
+        return [Document(page_content=doc.page_content, metadata={**doc.metadata, "score": round(score, 4)})
+                for doc, score in scored[:keep]]
+
+
+def build_retriever(vectorstore: FAISS, k: Optional[int] = None,
+                    cfg: Optional[RetrieverSettings] = None) -> BaseRetriever:
+    """Retriever for ``vectorstore`` per ``retriever`` settings; ``k`` overrides ``top_k`` as the maximum."""
+    cfg = cfg or get_settings().retriever
+    k = cfg.top_k if k is None else k
+    if k < 1:
+        raise ValueError(f"k must be at least 1, got {k}")
+    if cfg.mode == "adaptive":
+        return AdaptiveKRetriever(vectorstore=vectorstore, k=k, min_k=min(cfg.min_k, k),
+                                  min_score=cfg.min_score, max_drop=cfg.max_drop)
+    return vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": k})
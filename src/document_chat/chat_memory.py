@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+
+from logger.custom_logger import CustomLogger
+from model.models import promptType
+from prompt.prompt_library import PROMPT_REGISTRY
+from utils.config_loader import get_settings
+from utils.llm_gateway import estimate_tokens
+from utils.fair_scheduler import BULK, work_scope
+from utils.metrics import track_stage
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_turns (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    covered_seq INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class MemoryStats:
+    window_turns: int = 0
+    summarized_turns: int = 0
+    has_summary: bool = False
+    history_tokens: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    """Trim text to roughly ``max_tokens`` (same ~4 chars/token estimate as the LLM gateway)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max_tokens * 4].rstrip() + " ..."
+
+
+def conversation_key(session_id: str, conversation_id: str) -> str:
+    """Memory key of one conversation over a session's index; several clients may share the index."""
+    return f"{session_id}/{conversation_id}"
+
+
+class SQLiteChatMemory:
+    """Per-conversation chat memory: the last ``window_turns`` turns verbatim plus a rolling summary.
+
+    Rows are keyed by :func:`conversation_key` (stored in the ``session_id`` column), so
+    ``clear_session`` drops every conversation of an index session when it is evicted.
+
+    Turns that slide out of the window are folded into the summary by the LLM in batches of
+    ``summarize_every`` turns and then deleted, so both the stored rows and the history sent
+    with each prompt stay bounded however long a conversation runs. SQLite (WAL mode) makes
+    the store safe to share between uvicorn workers.
+    """
+
+    def __init__(self, db_path: os.PathLike, window_turns: int = 6, summarize_every: int = 2,
+                 max_summary_tokens: int = 400, max_message_tokens: int = 500):
+        self.log = CustomLogger().get_logger(__name__)
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.window_turns = window_turns
+        self.summarize_every = summarize_every
+        self.max_summary_tokens = max_summary_tokens
+        self.max_message_tokens = max_message_tokens
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _load(self, conn: sqlite3.Connection, session_id: str) -> Tuple[str, int, List[Tuple[int, str, str]]]:
+        row = conn.execute("SELECT summary, covered_seq FROM chat_summaries WHERE session_id = ?",
+                           (session_id,)).fetchone()
+        summary, covered = row if row else ("", 0)
+        turns = conn.execute("SELECT seq, question, answer FROM chat_turns WHERE session_id = ? AND seq > ? "
+                             "ORDER BY seq", (session_id, covered)).fetchall()
+        return summary, covered, turns
+
+    def history(self, session_id: str) -> Tuple[List[BaseMessage], MemoryStats]:
+        """Messages to pass as ``chat_history``: the summary (if any), then the recent window."""
+        with self._connect() as conn:
+            summary, covered, turns = self._load(conn, session_id)
+        window = turns[-self.window_turns:] if self.window_turns else []
+        messages: List[BaseMessage] = []
+        if summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+        for _, question, answer in window:
+            messages.append(HumanMessage(content=_clip(question, self.max_message_tokens)))
+            messages.append(AIMessage(content=_clip(answer, self.max_message_tokens)))
+        stats = MemoryStats(window_turns=len(window), summarized_turns=covered, has_summary=bool(summary),
+                            history_tokens=sum(estimate_tokens(m.content) for m in messages))
+        return messages, stats
+
+    def append(self, session_id: str, question: str, answer: str) -> None:
+        """Store one turn; call ``summarize_if_due`` afterwards (off the request path) to fold old turns."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # folded turns are deleted, so continue after the summary's high-water mark too
+            seq = conn.execute("SELECT MAX(COALESCE((SELECT MAX(seq) FROM chat_turns WHERE session_id = ?), 0), "
+                               "COALESCE((SELECT covered_seq FROM chat_summaries WHERE session_id = ?), 0)) + 1",
+                               (session_id, session_id)).fetchone()[0]
+            conn.execute("INSERT INTO chat_turns (session_id, seq, question, answer, created) VALUES (?, ?, ?, ?, ?)",
+                         (session_id, seq, question, answer, time.time()))
+            conn.execute("COMMIT")
+
+    def summarize_if_due(self, session_id: str, summarizer) -> bool:
+        """Fold turns that left the window into the rolling summary once a batch is due."""
+        with self._connect() as conn:
+            summary, covered, turns = self._load(conn, session_id)
+        overflow = turns[:-self.window_turns] if self.window_turns else turns
+        if len(overflow) < self.summarize_every:
+            return False
+
+        new_lines = "\n".join(f"User: {_clip(q, self.max_message_tokens)}\nAssistant: {_clip(a, self.max_message_tokens)}"
+                              for _, q, a in overflow)
+        chain = PROMPT_REGISTRY[promptType.CONVERSATION_SUMMARY.value] | summarizer | StrOutputParser()
+        try:
+            # background housekeeping: queued behind the session's (and others') live queries
+            with track_stage("chat_memory", "summarize"), work_scope(BULK, session_id):
+                updated = chain.invoke({"summary": summary or "(none)", "new_lines": new_lines,
+                                        "max_words": max(self.max_summary_tokens * 3 // 4, 50)})
+        except Exception as e:  # keep the turns; the next query retries the fold
+            self.log.error("Conversation summary update failed", session_id=session_id, error=str(e))
+            return False
+        updated = _clip(updated.strip(), self.max_summary_tokens)
+        last_seq = overflow[-1][0]
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT covered_seq FROM chat_summaries WHERE session_id = ?", (session_id,)).fetchone()
+            if (row[0] if row else 0) != covered:  # another worker folded these turns meanwhile
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute("INSERT INTO chat_summaries (session_id, summary, covered_seq, updated) VALUES (?, ?, ?, ?) "
+                         "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, "
+                         "covered_seq = excluded.covered_seq, updated = excluded.updated",
+                         (session_id, updated, last_seq, time.time()))
+            conn.execute("DELETE FROM chat_turns WHERE session_id = ? AND seq <= ?", (session_id, last_seq))
+            conn.execute("COMMIT")
+        self.log.info("Conversation summary updated", session_id=session_id, folded_turns=len(overflow),
+                      summary_tokens=estimate_tokens(updated))
+        return True
+
+    def clear(self, session_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chat_turns WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM chat_summaries WHERE session_id = ?", (session_id,))
+
+    def clear_session(self, session_id: str) -> int:
+        """Delete every conversation over index session ``session_id``; returns the turns removed."""
+        prefix = conversation_key(session_id, "")
+        # substr, not LIKE: session ids may contain the "_" and "%" wildcards
+        match = "(session_id = ? OR substr(session_id, 1, ?) = ?)"
+        args = (session_id, len(prefix), prefix)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = conn.execute(f"DELETE FROM chat_turns WHERE {match}", args).rowcount
+            conn.execute(f"DELETE FROM chat_summaries WHERE {match}", args)
+            conn.execute("COMMIT")
+        return removed
+
+
+_memory: Optional[SQLiteChatMemory] = None
+_memory_lock = threading.Lock()
+
+
+def get_chat_memory() -> Optional[SQLiteChatMemory]:
+    """Process-wide store, or None when ``chat_memory.enabled`` is false."""
+    global _memory
+    cfg = get_settings().chat_memory
+    if not cfg.enabled:
+        return None
+    if _memory is None:
+        with _memory_lock:
+            if _memory is None:
+                _memory = SQLiteChatMemory(cfg.db_path, window_turns=cfg.window_turns,
+                                           summarize_every=cfg.summarize_every,
+                                           max_summary_tokens=cfg.max_summary_tokens,
+                                           max_message_tokens=cfg.max_message_tokens)
+    return _memory
+
+
+def forget_session(session_id: str) -> None:
+    """Session janitor hook: drop the chat memory of an evicted session."""
+    memory = get_chat_memory()
+    if memory is not None:
+        memory.clear_session(session_id)
@@ -0,0 +1,154 @@
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from utils.llm_gateway import estimate_tokens
+
+_MIN_TEXT_OVERLAP = 20  # chars; shorter shared edges are coincidence, not chunk overlap
+_MAX_GAP = 2  # chars of (stripped) whitespace between chunks that still count as adjacent
+
+
+@dataclass
+class ContextStats:
+    retrieved_chunks: int = 0
+    spans: int = 0
+    merged_chunks: int = 0
+    duplicate_chunks: int = 0
+    retrieved_tokens: int = 0  # what joining every retrieved chunk would have cost
+    context_tokens: int = 0
+    tokens_saved: int = 0
+    truncated_spans: int = 0
+    dropped_spans: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class _Span:
+    source: Tuple[Any, Any]
+    text: str
+    rank: float
+    start: Optional[int] = None
+
+    @property
+    def end(self) -> Optional[int]:
+        return None if self.start is None else self.start + len(self.text)
+
+
+def _text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of ``left`` that is a prefix of ``right`` (0 if too short)."""
+    probe = right[:_MIN_TEXT_OVERLAP]
+    if len(probe) < _MIN_TEXT_OVERLAP:
+        return 0
+    pos = left.find(probe)
+    while pos != -1:
+        tail = left[pos:]
+        if right.startswith(tail):
+            return len(tail)
+        pos = left.find(probe, pos + 1)
+    return 0
+
+
+class ContextAssembler:
+    """Turn retrieved chunks into a compact, token-budgeted context string.
+
+    Chunks from the same source (file and page) that overlap or touch are stitched into one
+    span, using ``start_index`` metadata when present and shared text edges otherwise.
+    Exact and contained duplicates are dropped. Spans are then packed best-first (retriever
+    order, or ``metadata["score"]`` when set) until ``max_tokens`` is reached; the span that
+    crosses the budget is cut at a sentence boundary if enough of it fits.
+    """
+
+    def __init__(self, max_tokens: int = 3000, min_fragment_tokens: int = 64,
+                 count_tokens: Callable[[str], int] = estimate_tokens, separator: str = "\n\n"):
+        self.max_tokens = max_tokens
+        self.min_fragment_tokens = min_fragment_tokens
+        self.count_tokens = count_tokens
+        self.separator = separator
+
+    @staticmethod
+    def _rank(doc: Document, position: int) -> float:
+        score = doc.metadata.get("score")
+        return -float(score) if score is not None else float(position)
+
+    def _merge(self, docs: List[Document], stats: ContextStats) -> List[_Span]:
+        by_source: Dict[Tuple[Any, Any], List[_Span]] = {}
+        for position, doc in enumerate(docs):
+            source = (doc.metadata.get("source"), doc.metadata.get("page"))
+            start = doc.metadata.get("start_index")
+            by_source.setdefault(source, []).append(
+                _Span(source, doc.page_content, self._rank(doc, position), start if isinstance(start, int) else None))
+
+        spans: List[_Span] = []
+        for group in by_source.values():
+            merged: List[_Span] = []
+            for span in sorted((s for s in group if s.start is not None), key=lambda s: s.start):
+                last = merged[-1] if merged else None
+                if last is None or span.start > last.end + _MAX_GAP:
+                    merged.append(span)
+                    continue
+                if span.end <= last.end:
+                    stats.duplicate_chunks += 1
+                else:
+                    overlap = last.end - span.start
+                    last.text += span.text[overlap:] if overlap >= 0 else " " + span.text
+                    stats.merged_chunks += 1
+                last.rank = min(last.rank, span.rank)
+
+            for span in (s for s in group if s.start is None):
+                for other in merged:
+                    if span.text in other.text:
+                        stats.duplicate_chunks += 1
+                    elif other.start is None and (n := _text_overlap(other.text, span.text)):
+                        other.text += span.text[n:]
+                        stats.merged_chunks += 1
+                    elif other.start is None and (n := _text_overlap(span.text, other.text)):
+                        other.text = span.text + other.text[n:]
+                        stats.merged_chunks += 1
+                    else:
+                        continue
+                    other.rank = min(other.rank, span.rank)
+                    break
+                else:
+                    merged.append(span)
+            spans.extend(merged)
+        return spans
+
+    def _truncate(self, text: str, budget: int) -> Optional[str]:
+        if budget < self.min_fragment_tokens:
+            return None
+        cut = text
+        while cut and self.count_tokens(cut) > budget:
+            cut = cut[:int(len(cut) * budget / max(self.count_tokens(cut), 1) * 0.95)]
+        sentence_end = max(cut.rfind(". "), cut.rfind(".\n"), cut.rfind("\n\n"))
+        if sentence_end > len(cut) // 2:
+            cut = cut[:sentence_end + 1]
+        return cut.rstrip() or None
+
+    def assemble(self, docs: List[Document]) -> Tuple[str, ContextStats]:
+        stats = ContextStats(retrieved_chunks=len(docs))
+        stats.retrieved_tokens = self.count_tokens(self.separator.join(d.page_content for d in docs)) if docs else 0
+
+        spans = sorted(self._merge(docs, stats), key=lambda s: s.rank)
+        stats.spans = len(spans)
+        parts: List[str] = []
+        used = 0
+        sep_tokens = self.count_tokens(self.separator)
+        for span in spans:
+            remaining = self.max_tokens - used - (sep_tokens if parts else 0)
+            cost = self.count_tokens(span.text)
+            text = span.text if cost <= remaining else self._truncate(span.text, remaining)
+            if not text:
+                stats.dropped_spans += 1
+                continue
+            if text is not span.text:
+                stats.truncated_spans += 1
+            used += self.count_tokens(text) + (sep_tokens if parts else 0)
+            parts.append(text)
+
+        context = self.separator.join(parts)
+        stats.context_tokens = self.count_tokens(context) if parts else 0
+        stats.tokens_saved = max(0, stats.retrieved_tokens - stats.context_tokens)
+        return context, stats
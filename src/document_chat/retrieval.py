@@ -12,13 +12,19 @@ from logger.custom_logger import CustomLogger
 from exception.custom_exception_archive import DocumentPortalException
 from utils.model_loader import  ModelLoader
 from prompt.prompt_library import PROMPT_REGISTRY
+from utils.config_loader import get_settings
+from utils.metrics import track_stage, LLMMetricsCallback, record_context_tokens
+from utils.index_store import VersionedIndexStore
+from src.document_chat.context_assembler import ContextAssembler, ContextStats
+from src.document_chat.adaptive_retriever import build_retriever
+from utils.fair_scheduler import INTERACTIVE, fair_slot
 from model.models import *
 
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage,BaseMessage
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_community.vectorstores import FAISS
 
 
@@ -27,13 +33,13 @@ class ConversationalRAG:
     
 
     
-    def __init__(self, session_id:str , retriever =None):
+    def __init__(self, session_id:str , retriever =None, llm=None):
         
         try:
             self.log = CustomLogger().get_logger(__name__)
             self.session_id = session_id or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
             #self.retriever = retriever
-            self.llm = self._load_llm()
+            self.llm = llm or self._load_llm()
             self.contextuliaze_prompt = PROMPT_REGISTRY[promptType.CONTEXTULIZE_QUSTION.value]
             self.qa_prompt = PROMPT_REGISTRY[promptType.CONTEXT_QA.value]
             
@@ -41,6 +47,10 @@ class ConversationalRAG:
                 raise ValueError("Retriever cannot be None for ConversationalRAG.")
             
             self.retriever = retriever
+            context_cfg = get_settings().rag_context
+            self.assembler = ContextAssembler(max_tokens=context_cfg.max_tokens,
+                                              min_fragment_tokens=context_cfg.min_fragment_tokens) if context_cfg.enabled else None
+            self.last_context_stats: Optional[ContextStats] = None
             self._build_lcel_chain()
             self.log.info("ConversationalRAG initialized successfully." , session_id=self.session_id)
             
@@ -49,20 +59,34 @@ class ConversationalRAG:
             raise DocumentPortalException("Failed to initialize ConversationalRAG", sys)
         
     @staticmethod
-    def load_retriever_from_faiss(index_path:str)->BaseRetriever:
+    def load_retriever_from_faiss(index_path:str, k: Optional[int] = None)->BaseRetriever:
         
-        """Load a FAISS vector store from disk and convert to a retriever """
+        """Load a FAISS vector store from disk and convert to a retriever returning at most
+        ``k`` chunks (default ``retriever.top_k``; adaptive mode may return fewer)."""
         log = CustomLogger().get_logger(__name__)
         try:
             model_loader = ModelLoader().load_embeddings()
             if not os.path.exists(index_path):
                 raise FileNotFoundError(f"FAISS index not found at path: {index_path}")
-            
-            vectorstore=FAISS.load_local(folder_path=index_path, 
-                                         embeddings=model_loader,
-                                         allow_dangerous_deserialization=True)
-            retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 5})
-            log.info("Retriever loaded from FAISS index successfully.", index_path=index_path)
+            # resolve the published snapshot once; a concurrent write publishes a new version instead
+            store = VersionedIndexStore.from_settings(index_path)
+            for attempt in range(2):
+                version, snapshot = store.current()
+                if snapshot is None:
+                    raise FileNotFoundError(f"FAISS index not found at path: {index_path}")
+                try:
+                    with track_stage("conversational_rag", "index_load"):
+                        vectorstore=FAISS.load_local(folder_path=str(snapshot), 
+                                                     embeddings=model_loader,
+                                                     allow_dangerous_deserialization=True)
+                    break
+                except (FileNotFoundError, RuntimeError):
+                    # the version was compacted away while loading; the next CURRENT is complete
+                    if attempt or store.current()[0] == version:
+                        raise
+            retriever = build_retriever(vectorstore, k=k)
+            log.info("Retriever loaded from FAISS index successfully.", index_path=index_path, version=version,
+                     k=k or get_settings().retriever.top_k)
             
             
             return retriever
@@ -89,7 +113,8 @@ class ConversationalRAG:
             self.log.info("Processing question",question=payload["question"],history_length=len(chat_history))
             
              # Invoke chain
-            answer = self.chain.invoke(payload)
+            with track_stage("conversational_rag", "query"):
+                answer = self.chain.invoke(payload, config={"callbacks": [LLMMetricsCallback("conversational_rag")]})
             
             if not answer:
                 self.log.warning("No answer generated by the Conversational RAG chain.")
@@ -115,10 +140,26 @@ class ConversationalRAG:
             self.log.error("Error loading LLM:", error=str(e))
             raise DocumentPortalException("Failed to load LLM",sys)
     
+    def _retrieve(self, question: str):
+        """Run the retriever, timing retrieval separately from the LLM calls."""
+        with track_stage("conversational_rag", "retrieve"), fair_slot("embedding", cost=1, priority=INTERACTIVE):
+            return self.retriever.invoke(question)
+    
     @staticmethod
     def _format_docs(docs):
         """Format retrieved documents for prompt input."""
         return "\n\n".join(d.page_content for d in docs)
+    
+    def _assemble_context(self, docs) -> str:
+        """Merge, dedupe and token-budget the retrieved chunks; stats kept in ``self.last_context_stats``."""
+        if self.assembler is None:
+            return self._format_docs(docs)
+        with track_stage("conversational_rag", "assemble_context"):
+            context, stats = self.assembler.assemble(docs)
+        self.last_context_stats = stats
+        record_context_tokens("conversational_rag", stats.retrieved_tokens, stats.context_tokens)
+        self.log.info("Context assembled", session_id=self.session_id, **stats.as_dict())
+        return context
        
     
     def _build_lcel_chain(self):
@@ -141,8 +182,8 @@ class ConversationalRAG:
             # Retrieval chain with formatted docs
             retrieve_and_format = (
                 itemgetter("question")  # Get question string
-                | self.retriever  # Get relevant docs
-                | self._format_docs  # Format docs into string
+                | RunnableLambda(self._retrieve)  # Get relevant docs
+                | RunnableLambda(self._assemble_context)  # Merge, dedupe and budget into one string
             )
             
             # Final QA chain combining context and question
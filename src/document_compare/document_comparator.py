@@ -8,7 +8,13 @@ from logger.custom_logger import CustomLogger
 from exception.custom_exception_archive import DocumentPortalException
 from model.models import *
 from prompt.prompt_library import PROMPT_REGISTRY
+from utils.config_loader import get_settings
 from utils.model_loader import ModelLoader
+from utils.metrics import track_stage, LLMMetricsCallback
+from utils.structured_output import LocalRepairOutputParser
+from utils.fair_scheduler import INTERACTIVE, fair_slot
+from src.document_compare.section_alignment import Section, SectionPair, align_sections, cosine_matrix
+import numpy as np
 from langchain_core.output_parsers import JsonOutputParser
 from langchain.output_parsers import OutputFixingParser
 
@@ -17,6 +23,7 @@ from pydantic import BaseModel, Field
 import json
 from langchain.output_parsers import PydanticOutputParser
 from langchain_core.runnables import RunnablePassthrough
+from langchain_core.exceptions import OutputParserException
 
 class DocumentComparison(BaseModel):
     """Model for document comparison results"""
@@ -37,12 +44,16 @@ class DocumentComparison(BaseModel):
 
 class DocumentComparatorLLM:
     
-    def __init__(self):
+    def __init__(self, llm=None, model_loader=None):
         load_dotenv()
         self.log = CustomLogger().get_logger(__name__)
-        self.loader = ModelLoader()
-        self.llm = self.loader.load_llm()
+        self.loader = model_loader or ModelLoader()
+        self.llm = llm or self.loader.load_llm()
         self.output_parser = PydanticOutputParser(pydantic_object=DocumentComparison)
+        # local JSON repair first; an LLM round trip only for replies it cannot recover
+        self.repair_parser = LocalRepairOutputParser(
+            pydantic_object=DocumentComparison, as_dict=False, component="document_comparator_llm",
+            fallback=OutputFixingParser.from_llm(parser=self.output_parser, llm=self.llm))
         self.prompt = PROMPT_REGISTRY.get("document_comparison")
         
         if self.prompt is None:
@@ -63,32 +74,108 @@ class DocumentComparatorLLM:
             
             # Get raw response from LLM
             messages = self.prompt.format_messages(**inputs)
-            raw_response = self.llm.invoke(messages)
-            
-            # Try to parse the response
-            try:
-                # First try to parse as JSON
-                json_str = raw_response.content
-                json_obj = json.loads(json_str)
-                
-                # Then parse into Pydantic model
-                comparison_result = DocumentComparison.model_validate(json_obj)
-                
-                self.log.info("Successfully parsed comparison result")
-                return self._format_response(comparison_result)
-                
-            except json.JSONDecodeError as e:
-                self.log.error(f"Failed to parse LLM response as JSON: {str(e)}")
-                self.log.error(f"Raw response: {raw_response.content}")
-                raise
-            except Exception as e:
-                self.log.error(f"Failed to parse comparison result: {str(e)}")
-                raise
+            with track_stage("document_comparator_llm", "compare"):
+                raw_response = self.llm.invoke(messages, config={"callbacks": [LLMMetricsCallback("document_comparator_llm")]})
+            
+            comparison_result = self._parse_comparison(raw_response.content)
+            self.log.info("Successfully parsed comparison result")
+            return self._format_response(comparison_result)
             
         except Exception as e:
             self.log.error(f"Error while comparing documents: {str(e)}")
             raise DocumentPortalException("An error occurred while comparing the documents", sys)
     
+    def _parse_comparison(self, content: str) -> DocumentComparison:
+        """Parse one raw LLM reply into the comparison schema"""
+        try:
+            return self.repair_parser.parse(content)
+            
+        except OutputParserException as e:
+            self.log.error(f"Failed to parse LLM response as JSON: {str(e)}")
+            self.log.error(f"Raw response: {content}")
+            raise
+        except Exception as e:
+            self.log.error(f"Failed to parse comparison result: {str(e)}")
+            raise
+    
+    def compare_sections(self, reference: List[Section], actual: List[Section]) -> pd.DataFrame:
+        """Compare two documents section by section.
+        
+        Sections are aligned by cosine similarity of their embeddings, every aligned pair is
+        compared in its own (concurrent) LLM call, and the per-pair results are merged into a
+        single DocumentComparison so the output rows match compare_documents.
+        """
+        try:
+            if not reference or not actual:
+                raise ValueError("Both documents need at least one section of text to compare")
+            cfg = get_settings().compare
+            
+            with track_stage("document_comparator_llm", "align"):
+                embeddings = self.loader.load_embeddings()
+                texts = [s.text for s in reference + actual]
+                with fair_slot("embedding", cost=len(texts), priority=INTERACTIVE):
+                    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+                similarity = cosine_matrix(vectors[:len(reference)], vectors[len(reference):])
+                pairs = align_sections(reference, actual, similarity, threshold=cfg.align_threshold)
+            matched = [p for p in pairs if p.reference and p.actual]
+            self.log.info("Sections aligned", reference_sections=len(reference), actual_sections=len(actual),
+                          matched=len(matched))
+            
+            format_instructions = self.output_parser.get_format_instructions()
+            batch = [self.prompt.format_messages(combined_documents=self._pair_text(p),
+                                                 format_instructions=format_instructions) for p in matched]
+            with track_stage("document_comparator_llm", "compare_sections"):
+                responses = self.llm.batch(batch, config={"max_concurrency": cfg.max_concurrency,
+                                                          "callbacks": [LLMMetricsCallback("document_comparator_llm")]},
+                                           return_exceptions=True)
+            
+            results: List[tuple] = []
+            for pair, response in zip(matched, responses):
+                try:
+                    if isinstance(response, Exception):
+                        raise response
+                    results.append((pair, self._parse_comparison(response.content)))
+                except Exception as e:
+                    self.log.error("Section comparison failed", section=pair.reference.title, error=str(e))
+            if matched and not results:
+                raise RuntimeError("Every section comparison failed")
+            
+            return self._format_response(self._merge_sections(pairs, results))
+        
+        except Exception as e:
+            self.log.error(f"Error while comparing document sections: {str(e)}")
+            raise DocumentPortalException("An error occurred while comparing the document sections", sys)
+    
+    @staticmethod
+    def _pair_text(pair: SectionPair) -> str:
+        return "\n\n".join(f"Document: {s.doc} - section {s.label}\n{s.text}" for s in (pair.reference, pair.actual))
+    
+    @staticmethod
+    def _merge_sections(pairs: List[SectionPair], results: List[tuple]) -> DocumentComparison:
+        """Fold per-pair results into one DocumentComparison, tagging every item with its section"""
+        ref_doc = next(p.reference.doc for p in pairs if p.reference)
+        act_doc = next(p.actual.doc for p in pairs if p.actual)
+        merged = DocumentComparison(title=f"Section-by-section comparison: {ref_doc} vs {act_doc}",
+                                    similarities=[], differences=[], document1_summary=[],
+                                    document2_summary=[], unique_information={})
+        
+        for pair, result in results:
+            tag = f"[{pair.reference.title}]"
+            merged.similarities.extend(f"{tag} {item}" for item in result.similarities)
+            merged.differences.extend(f"{tag} {item}" for item in result.differences)
+            merged.document1_summary.extend(f"{tag} {item}" for item in result.document1_summary)
+            merged.document2_summary.extend(f"{tag} {item}" for item in result.document2_summary)
+            for doc, items in result.unique_information.items():
+                merged.unique_information.setdefault(doc, []).extend(f"{tag} {item}" for item in items)
+        
+        # sections without a counterpart are differences the LLM never saw
+        for pair in pairs:
+            if pair.reference is None:
+                merged.unique_information.setdefault(act_doc, []).append(f"Section {pair.actual.label} has no counterpart in {ref_doc}")
+            elif pair.actual is None:
+                merged.unique_information.setdefault(ref_doc, []).append(f"Section {pair.reference.label} has no counterpart in {act_doc}")
+        return merged
+    
     def _format_response(self, comparison_result: DocumentComparison) -> pd.DataFrame:
         """Format the comparison result into a DataFrame"""
         try:
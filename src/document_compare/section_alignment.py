@@ -0,0 +1,151 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# numbered headings ("2. Term", "3.1 Scope"), keyword headings ("Article 4", "Section 7 - Fees"), short ALL-CAPS lines
+_HEADING = re.compile(
+    r"^\s*(?:(?i:section|article|chapter|clause|part|schedule|annex|appendix)\s+[\w.]+\b.*"
+    r"|\d+(?:\.\d+)*\.?\s+[A-Z].{0,80}"
+    r"|[A-Z][A-Z0-9 ,&/()'-]{2,60})\s*$",
+)
+
+
+@dataclass
+class Section:
+    doc: str
+    index: int
+    title: str
+    text: str
+    pages: List[int] = field(default_factory=list)
+
+    @property
+    def label(self) -> str:
+        first, last = (self.pages[0] + 1, self.pages[-1] + 1) if self.pages else (0, 0)
+        span = f"p.{first}" if first == last else f"pp.{first}-{last}"
+        return f"{self.title} ({span})"
+
+
+@dataclass
+class SectionPair:
+    reference: Optional[Section]
+    actual: Optional[Section]
+    score: float = 0.0
+
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip()
+    if not stripped or len(stripped) > 90 or stripped.endswith((",", ";")):
+        return False
+    if stripped.endswith(".") and len(stripped.split()) > 6:  # a sentence, not a heading
+        return False
+    if stripped.isupper() and len(stripped.split()) > 10:
+        return False
+    return bool(_HEADING.match(stripped))
+
+
+def segment_sections(doc: str, pages: Sequence[Dict], min_chars: int = 400, max_chars: int = 6000) -> List[Section]:
+    """Split parsed pages (``{"page": n, "text": ...}``) into heading-delimited sections.
+
+    Sections shorter than ``min_chars`` are merged into their predecessor and sections
+    longer than ``max_chars`` are split on paragraph boundaries, so each one fits
+    comfortably in a single LLM call.
+    """
+    raw: List[Tuple[str, List[str], List[int]]] = []
+    title, lines, section_pages = "Preamble", [], []
+    for page in pages:
+        for line in page["text"].splitlines():
+            if _is_heading(line):
+                if any(x.strip() for x in lines):
+                    raw.append((title, lines, section_pages))
+                    lines, section_pages = [], []
+                title = line.strip()
+            lines.append(line)
+            if not section_pages or section_pages[-1] != page["page"]:
+                section_pages.append(page["page"])
+    raw.append((title, lines, section_pages))
+
+    merged: List[Tuple[str, str, List[int]]] = []
+    for title, lines, section_pages in raw:
+        text = "\n".join(lines).strip()
+        if not text:
+            continue
+        if merged and len(text) < min_chars:
+            prev_title, prev_text, prev_pages = merged[-1]
+            merged[-1] = (prev_title, f"{prev_text}\n{text}", sorted(set(prev_pages + section_pages)))
+        else:
+            merged.append((title, text, section_pages))
+
+    sections: List[Section] = []
+    for title, text, section_pages in merged:
+        parts = _split_long(text, max_chars)
+        for n, part in enumerate(parts, 1):
+            part_title = title if len(parts) == 1 else f"{title} [{n}/{len(parts)}]"
+            sections.append(Section(doc=doc, index=len(sections), title=part_title, text=part, pages=section_pages))
+    return sections
+
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+    parts, current = [], ""
+    for para in re.split(r"\n\s*\n", text):
+        while len(para) > max_chars:  # a single oversized paragraph: hard cut
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(para[:max_chars])
+            para = para[max_chars:]
+        if current and len(current) + len(para) + 2 > max_chars:
+            parts.append(current)
+            current = para
+        else:
+            current = f"{current}\n\n{para}" if current else para
+    if current:
+        parts.append(current)
+    return parts
+
+
+def cosine_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise cosine similarity between the rows of ``a`` (m x d) and ``b`` (n x d)."""
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return a @ b.T
+
+
+def align_sections(reference: List[Section], actual: List[Section], similarity: np.ndarray,
+                   threshold: float = 0.5) -> List[SectionPair]:
+    """One-to-one alignment by descending similarity; unmatched sections pair with ``None``.
+
+    Pairs are returned in reference order, with sections that exist only in the actual
+    document placed after the reference section that precedes them.
+    """
+    m, n = similarity.shape
+    order = np.argsort(similarity, axis=None)[::-1]
+    ref_match: Dict[int, Tuple[int, float]] = {}
+    act_taken = set()
+    for flat in order:
+        i, j = divmod(int(flat), n)
+        score = float(similarity[i, j])
+        if score < threshold or len(ref_match) == min(m, n):
+            break
+        if i in ref_match or j in act_taken:
+            continue
+        ref_match[i] = (j, score)
+        act_taken.add(j)
+
+    pairs: List[SectionPair] = []
+    unmatched_actual = [j for j in range(n) if j not in act_taken]
+    for i in range(m):
+        if i in ref_match:
+            j, score = ref_match[i]
+            while unmatched_actual and unmatched_actual[0] < j:
+                pairs.append(SectionPair(None, actual[unmatched_actual.pop(0)]))
+            pairs.append(SectionPair(reference[i], actual[j], score))
+        else:
+            pairs.append(SectionPair(reference[i], None))
+    pairs.extend(SectionPair(None, actual[j]) for j in unmatched_actual)
+    return pairs
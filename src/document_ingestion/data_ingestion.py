@@ -5,92 +5,401 @@ import uuid
 import json
 import hashlib
 import shutil
+import time
+from dataclasses import asdict, dataclass
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple, Union,Iterable
+import numpy as np
 import pandas as pd
 
+import faiss
 import fitz  # PyMuPDF
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyMuPDFLoader ,PyPDFLoader,Docx2txtLoader,TextLoader
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 
 from utils.model_loader import ModelLoader
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
+from utils.metrics import track_stage, record_bytes, record_pages, record_embedding, record_cache, record_dedup
+from utils.config_loader import get_settings
+from src.document_compare.section_alignment import Section, segment_sections
+from utils.chunking import TokenAwareSplitter, ChunkingStats, get_tokenizer, model_max_seq_length
+from utils.dedup import MinHashDeduplicator, DedupStats
+from utils.session_janitor import touch_session, session_lease, last_access
+from utils.parse_cache import parse_pdf
+from utils.index_store import VersionedIndexStore
+from utils.embedding_pool import as_float32_matrix, discard_embedding_pool, embedding_dimension, get_embedding_pool
 
 from utils.file_io import generate_session_id,save_uploaded_files
 from utils.document_ops import load_documents, concat_for_analysis, concat_for_comparison
 import utils.document_ops as doc_ops
 
 
-SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
+from src.document_chat.adaptive_retriever import build_retriever
+from utils.fair_scheduler import BULK, fair_slot
+
+@dataclass
+class IndexUpdate:
+    added: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    documents: int = 0
+    version: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
 
 class FaissManager:
-  
-    
+    """FAISS index for one session, stored as versioned snapshots (see utils.index_store).
+
+    Every write reloads the latest published snapshot under the index's writer lock, adds
+    only the chunks that snapshot does not have yet, and publishes a new version, so
+    concurrent ``/chat/index`` calls from several workers never lose each other's chunks
+    and readers never see a half-written index.
+    """
+
+    COMMIT_ATTEMPTS = 3  # rounds of re-embedding chunks concurrent writers deleted before giving up
+
     def __init__(self ,index_dir :Path , model_loader: Optional[ModelLoader] = None):
         self.log = CustomLogger().get_logger(__name__)
 
         self.index_dir = index_dir
         self.index_dir.mkdir(parents=True, exist_ok=True)
-        
-        self.metapath = self.index_dir / "ingested_meta.json"
+        self.store = VersionedIndexStore.from_settings(self.index_dir)
+
         self._meta : Dict[str , Any] = {"rows":{}}
-        
-        if self.metapath.exists():
-            try:
-                self._meta = json.load(self.metapath.read_text(encoding='utf-8')) or {"rows":{}} # load it if already there
-            except Exception:
-                self._meta ={"rows":{}}
-                
+        self._version: Optional[str] = None  # snapshot that vector_store/_meta were loaded from
+        _, snapshot = self.store.current()
+        if snapshot is not None:
+            self._meta = self._read_metadata(snapshot)
+
         self.model_loader = model_loader or ModelLoader()
         self.embedding_model = self.model_loader.load_embeddings()
         self.vector_store: Optional[FAISS] = None
 
     def _exists(self)->bool:
-        return (self.index_dir / "index.faiss").exists() and (self.index_dir / "index.pkl").exists()
+        return self.store.current()[1] is not None
     
     @staticmethod
     def _fingerprint(txt:str , md: Dict[str, Any])->str:
         
-        src = md.get("source") or md.get("file_path")
+        # "document" (the uploaded file name) survives re-uploads; "source" is the saved path
+        src = md.get("document") or md.get("source") or md.get("file_path")
         rid =md.get("row_id")
         
+        digest = FaissManager._content_digest(txt)
         if src is not None:
-            return f"{src}::{'' if rid is None else rid}"
-        return hashlib.sha256(txt.encode('utf-8')).hexdigest()
+            # chunks without a row id (PDF/DOCX splits) are told apart by content
+            return f"{src}::{digest if rid is None else rid}"
+        return digest
         
-    
-    def _save_metadata(self):
+    @staticmethod
+    def _content_digest(txt: str) -> str:
+        return hashlib.sha256(txt.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _read_metadata(snapshot: Path) -> Dict[str, Any]:
+        try:
+            meta = json.loads((snapshot / "ingested_meta.json").read_text(encoding='utf-8')) or {"rows":{}}
+        except Exception:
+            return {"rows":{}}
+        if "documents" not in meta:
+            # written before chunks were tracked per document: uploads were keyed by their random
+            # saved path, so a re-upload can only be matched by content ("legacy": digest -> key)
+            meta["documents"] = {}
+            meta["legacy"] = {key.rpartition("::")[2]: key for key in meta.get("rows", {})
+                              if len(key.rpartition("::")[2]) == 64}
+        return meta
+
+    def _save_metadata(self, target: Path):
         
         """ persisting your metadata to disk — specifically to the file ingested_meta.json"""
         
-        self.metapath.write_text(json.dumps(self._meta, ensure_ascii=False,indent=2), encoding='utf-8')
-    
+        (target / "ingested_meta.json").write_text(json.dumps(self._meta, ensure_ascii=False,indent=2), encoding='utf-8')
+
+    def _load_snapshot(self) -> bool:
+        """Load the published snapshot unless it is the one already in memory; False when there is none."""
+        version, snapshot = self.store.current()
+        if snapshot is None:
+            self.vector_store, self._meta, self._version = None, {"rows":{}}, None
+            return False
+        if version != self._version or self.vector_store is None:
+            with track_stage("faiss_manager", "index_load"):
+                self.vector_store = FAISS.load_local(str(snapshot), embeddings=self.embedding_model,
+                                                     allow_dangerous_deserialization=True)
+            self._meta = self._read_metadata(snapshot)
+            self._version = version
+        return True
+
+    def _embedding_pool(self, chunks: int):
+        """The worker pool, only when it would run the same model as ``self.embedding_model``."""
+        settings = self.model_loader.settings or get_settings()
+        if getattr(self.embedding_model, "model_name", None) != settings.embedding_model.embedding_model_name:
+            return None  # e.g. a stub embedder in benchmarks
+        return get_embedding_pool(chunks, settings)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as a float32 matrix, recording embedding time separately from FAISS build/write time.
+
+        Calls of at least ``embedding_pool.min_chunks`` texts are sharded across the
+        multi-process embedding pool; smaller ones (and a crashed pool) stay in-process.
+        """
+        start = time.perf_counter()
+        vectors = None
+        # embedded in batches, each holding a fair-share slot, so other tenants' work interleaves
+        batch = max(1, get_settings().fair_share.embedding_batch)
+        with track_stage("faiss_manager", "embed"):
+            pool = self._embedding_pool(len(texts))
+            if pool is not None:
+                try:
+                    vectors = self._embed_batches(texts, batch * pool.workers, pool.embed)
+                    self.log.info("Embedded chunks in worker pool", chunks=len(texts), workers=pool.workers)
+                except Exception as e:
+                    self.log.error("Embedding pool failed; embedding in-process", error=str(e))
+                    discard_embedding_pool(pool)
+            if vectors is None:
+                vectors = self._embed_batches(
+                    texts, batch, lambda part: as_float32_matrix(self.embedding_model.embed_documents(part)))
+        record_embedding("faiss_manager", len(texts), time.perf_counter() - start)
+        return vectors
+
+    @staticmethod
+    def _embed_batches(texts: List[str], batch: int, embed) -> np.ndarray:
+        parts = []
+        for i in range(0, len(texts), batch):
+            with fair_slot("embedding", cost=len(texts[i:i + batch]), priority=BULK):
+                parts.append(embed(texts[i:i + batch]))
+        return parts[0] if len(parts) == 1 else np.vstack(parts)
+
+    def _pending(self, texts: List[str], metadatas: List[dict]) -> Tuple[List[int], List[str]]:
+        """Indices and fingerprints of the chunks not in the loaded snapshot (first occurrence wins)."""
+        keep: List[int] = []
+        keys: List[str] = []
+        seen = set(self._meta["rows"])
+        legacy = self._meta.get("legacy") or {}
+        for i, (txt, md) in enumerate(zip(texts, metadatas)):
+            key = self._fingerprint(txt, md or {})
+            if key in seen or (legacy and self._content_digest(txt) in legacy):
+                continue
+            seen.add(key)
+            keep.append(i)
+            keys.append(key)
+        return keep, keys
+
+    def _adopt_legacy(self, replace: Dict[str, Dict[str, Document]]) -> int:
+        """Re-key legacy chunks (see ``_read_metadata``) whose content a re-uploaded document still has.
+
+        The chunk keeps its vector and becomes that document's, so the upload adds no duplicate
+        and later re-uploads and deletes manage it like any other chunk.
+        """
+        legacy = self._meta.get("legacy")
+        if not legacy or not replace or self.vector_store is None:
+            return 0
+        docstore = self.vector_store.docstore._dict
+        ids = {self._content_digest(doc.page_content): doc_id for doc_id, doc in docstore.items()}
+        rows, documents = self._meta["rows"], self._meta["documents"]
+        adopted = 0
+        for name, wanted in replace.items():
+            for key, doc in wanted.items():
+                digest = self._content_digest(doc.page_content)
+                if key in rows or digest not in legacy or digest not in ids:
+                    continue
+                rows.pop(legacy.pop(digest), None)
+                rows[key] = True
+                documents.setdefault(name, {"chunks": {}})["chunks"][key] = ids[digest]
+                docstore[ids[digest]].metadata["document"] = name
+                adopted += 1
+        if not legacy:
+            del self._meta["legacy"]
+        return adopted
+
+    def _commit(self, keys: List[str], texts: List[str], metadatas: List[dict], matrix: Optional[np.ndarray],
+                replace: Optional[Dict[str, Dict[str, Document]]] = None) -> IndexUpdate:
+        """Publish a new version with the given chunks added; row ``i`` of ``matrix`` embeds ``texts[i]``.
+
+        ``replace`` maps a document name to the complete set of chunks (by fingerprint) it
+        should have afterwards; its other chunks are deleted from FAISS and the docstore.
+        Runs under the writer lock against the latest snapshot, so chunks another writer
+        added since they were embedded are skipped. Unchanged chunks another writer deleted
+        meanwhile are embedded after releasing the lock and the commit is retried.
+        """
+        replace = replace or {}
+        lost: List[Tuple[str, Document]] = []
+        for _ in range(self.COMMIT_ATTEMPTS):
+            if lost:  # embedded outside the writer lock so other writers are not held up by it
+                keys = keys + [key for key, _ in lost]
+                texts = texts + [doc.page_content for _, doc in lost]
+                metadatas = metadatas + [doc.metadata for _, doc in lost]
+                extra = self._embed([doc.page_content for _, doc in lost])
+                matrix = extra if matrix is None or not len(matrix) else np.concatenate([matrix, extra])
+            try:
+                with self.store.writer() as write:
+                    self._load_snapshot()
+                    adopted = self._adopt_legacy(replace)
+                    rows = self._meta["rows"]
+                    documents = self._meta.setdefault("documents", {})
+
+                    # a chunk we skipped as unchanged may have been deleted by a concurrent writer since
+                    provided = set(keys)
+                    lost = [(key, doc) for wanted in replace.values() for key, doc in wanted.items()
+                            if key not in rows and key not in provided]
+                    if lost:
+                        self._version = None  # drop in-memory changes; nothing is published this round
+                        continue
+
+                    stale = [(name, key, doc_id) for name, wanted in replace.items()
+                             for key, doc_id in documents.get(name, {}).get("chunks", {}).items() if key not in wanted]
+                    fresh = [i for i, key in enumerate(keys) if key not in rows]
+                    if not fresh and not stale and not adopted:
+                        return IndexUpdate(version=self._version)
+
+                    if stale:
+                        with track_stage("faiss_manager", "index_delete"):
+                            self.vector_store.delete([doc_id for _, _, doc_id in stale])
+                        for name, key, _ in stale:
+                            rows.pop(key, None)
+                            documents[name]["chunks"].pop(key, None)
+                    if fresh:
+                        if len(fresh) < len(keys):
+                            matrix = np.ascontiguousarray(matrix[fresh])  # reads only the kept rows of a memmap
+                        dim = matrix.shape[1]
+                        with track_stage("faiss_manager", "index_add"):
+                            if self.vector_store is None:
+                                self.vector_store = FAISS(embedding_function=self.embedding_model,
+                                                          index=faiss.IndexFlatL2(dim),
+                                                          docstore=InMemoryDocstore(), index_to_docstore_id={})
+                            if self.vector_store.index.d != dim:
+                                raise DocumentPortalException(f"Existing index has dimension "
+                                                              f"{self.vector_store.index.d}, embeddings have {dim}", sys)
+                            offset = self.vector_store.index.ntotal
+                            ids = [str(uuid.uuid4()) for _ in fresh]
+                            self.vector_store.index.add(matrix)
+                            self.vector_store.docstore.add({doc_id: Document(page_content=texts[i],
+                                                                             metadata=metadatas[i] or {})
+                                                            for doc_id, i in zip(ids, fresh)})
+                            self.vector_store.index_to_docstore_id.update({offset + j: doc_id
+                                                                           for j, doc_id in enumerate(ids)})
+                        for doc_id, i in zip(ids, fresh):
+                            rows[keys[i]] = True
+                            name = (metadatas[i] or {}).get("document")
+                            if name is not None:
+                                documents.setdefault(name, {"chunks": {}})["chunks"][keys[i]] = doc_id
+                    for name in replace:
+                        if name in documents and not documents[name]["chunks"]:
+                            del documents[name]
+                        elif name in documents:
+                            documents[name]["updated"] = time.time()
+
+                    with track_stage("faiss_manager", "index_write"):
+                        self.vector_store.save_local(str(write.path))
+                        self._save_metadata(write.path)
+                self._version = write.version
+                return IndexUpdate(added=len(fresh), removed=len(stale), version=write.version)
+            except Exception:
+                self._version = None  # in-memory state may be ahead of what was published; reload next time
+                raise
+        raise DocumentPortalException(f"Index at {self.index_dir} kept losing chunks to concurrent writers; "
+                                      f"gave up after {self.COMMIT_ATTEMPTS} attempts", sys)
+
+    def upsert_documents(self, docs: List[Document]) -> IndexUpdate:
+        """Make the index hold exactly ``docs`` for every document they belong to.
+
+        Chunks are grouped by ``metadata["document"]`` (the uploaded file name). Unchanged
+        chunks keep their vectors, new or edited chunks are embedded, and chunks a re-uploaded
+        document no longer has are deleted. Chunks without a document name are only added.
+        Creates the index when none exists.
+        """
+        self._load_snapshot()
+        replace: Dict[str, Dict[str, Document]] = {}
+        for d in docs:
+            name = (d.metadata or {}).get("document")
+            if name is not None:
+                replace.setdefault(name, {}).setdefault(self._fingerprint(d.page_content, d.metadata), d)
+
+        texts = [d.page_content for d in docs]
+        metadatas = [d.metadata or {} for d in docs]
+        keep, keys = self._pending(texts, metadatas)
+        record_cache("faiss_fingerprint", hit=True, count=len(docs) - len(keep))
+        record_cache("faiss_fingerprint", hit=False, count=len(keep))
+        texts, metadatas = [texts[i] for i in keep], [metadatas[i] for i in keep]
+        update = self._commit(keys, texts, metadatas, self._embed(texts) if texts else None, replace=replace)
+        update.documents = len(replace)
+        update.unchanged = max(0, sum(len(wanted) for wanted in replace.values()) - update.added)
+        self.log.info("FAISS index synced", path=str(self.index_dir), **update.as_dict())
+        return update
+
+    def delete_document(self, name: str) -> IndexUpdate:
+        """Delete every chunk of one uploaded document and publish the result as a new version."""
+        update = self._commit([], [], [], None, replace={name: {}})
+        self.log.info("Document deleted from FAISS index", path=str(self.index_dir), document=name,
+                      removed=update.removed, version=update.version)
+        return update
+
+    def documents(self) -> Dict[str, int]:
+        """Chunk count per document in the published snapshot."""
+        self._load_snapshot()
+        return {name: len(entry["chunks"]) for name, entry in self._meta.get("documents", {}).items()}
+
+    def compact(self) -> List[str]:
+        """Reclaim disk space held by superseded versions (e.g. vectors of deleted documents) now.
+
+        Only the current version is kept. Readers load a snapshot fully into memory, so
+        this affects only a reader that resolved an old version this very moment, and
+        ``load_retriever_from_faiss`` re-resolves when that happens.
+        """
+        return self.store.compact()
+
     def add_documents(self, docs : List[Document]):
         """add the documents inside vector database"""
         if self.vector_store is None:
             raise RuntimeError("call load_or_create() before add_documents_idempotent().")
-        
-        new_docs :List[Document] =[]
-        
-        for d in docs:
-            key = self._fingerprint(d.page_content , d.metadata or {})
-            if key in self._meta["rows"]:
-                continue
-            self._meta["rows"][key]=True
-            new_docs.append(d)
-            
-            if new_docs:
-                self.vector_store.add_documents(new_docs)
-                self.vector_store.save_local(self.index_dir)
-                self._save_metadata()
-            return len(new_docs)
-            
-                
-    
+
+        texts = [d.page_content for d in docs]
+        metadatas = [d.metadata or {} for d in docs]
+        keep, keys = self._pending(texts, metadatas)
+        record_cache("faiss_fingerprint", hit=True, count=len(docs) - len(keep))
+        record_cache("faiss_fingerprint", hit=False, count=len(keep))
+        if not keep:
+            return 0
+        texts, metadatas = [texts[i] for i in keep], [metadatas[i] for i in keep]
+        return self._commit(keys, texts, metadatas, self._embed(texts)).added
+
+    def import_embeddings(self, texts: List[str], vectors: Any, metadatas: Optional[List[dict]] = None) -> int:
+        """Add precomputed embeddings (e.g. a memory-mapped ``.npy`` float32 matrix) without re-embedding.
+
+        Row ``i`` of ``vectors`` is the embedding of ``texts[i]``; its width must match the
+        configured embedding model. The matrix goes straight into the FAISS index, creating
+        it when none exists, so no per-vector Python objects are built. Chunks already in the
+        index (same fingerprint) are skipped. Returns the number of chunks added.
+        """
+        dim = embedding_dimension(self.embedding_model)
+        try:
+            matrix = as_float32_matrix(vectors, dim=dim)
+        except ValueError as e:
+            raise DocumentPortalException(f"Invalid embedding matrix: {e}", sys)
+        metadatas = metadatas if metadatas is not None else [{} for _ in texts]
+        if not (len(texts) == len(metadatas) == matrix.shape[0]):
+            raise DocumentPortalException(f"Got {matrix.shape[0]} vectors for {len(texts)} texts and "
+                                          f"{len(metadatas)} metadata rows", sys)
+
+        self._load_snapshot()
+        keep, keys = self._pending(texts, metadatas)
+        record_cache("faiss_fingerprint", hit=True, count=len(texts) - len(keep))
+        record_cache("faiss_fingerprint", hit=False, count=len(keep))
+        if not keep:
+            return 0
+        if len(keep) < matrix.shape[0]:
+            matrix = np.ascontiguousarray(matrix[keep])
+        added = self._commit(keys, [texts[i] for i in keep], [metadatas[i] for i in keep], matrix).added
+        self.log.info("Imported precomputed embeddings", added=added, skipped=len(texts) - added,
+                      dim=dim, path=str(self.index_dir), version=self._version)
+        return added
+
     def load_or_create(self, texts: Optional[List[str]]=None, metadatas: Optional[List[dict]]=None):
         """Load existing FAISS index or create new one.
         
@@ -106,29 +415,22 @@ class FaissManager:
         """
         try:
             # Try loading existing index first
-            if self._exists():
-                self.vector_store = FAISS.load_local(
-                    str(self.index_dir),
-                    embeddings=self.embedding_model,
-                    allow_dangerous_deserialization=True
-                )
-                self.log.info("Loaded existing FAISS index", path=str(self.index_dir))
+            if self._load_snapshot():
+                self.log.info("Loaded existing FAISS index", path=str(self.index_dir), version=self._version)
                 return self.vector_store
 
             # Create new index if texts provided
             if not texts:
                 raise DocumentPortalException("No existing FAISS index and no data to create one", sys)
 
-            # Create new vector store
-            self.vector_store = FAISS.from_texts(
-                texts=texts,
-                embedding=self.embedding_model,  # Changed from self.emb
-                metadatas=metadatas or []
-            )
-            
-            # Save to disk
-            self.vector_store.save_local(str(self.index_dir))
-            self.log.info("Created new FAISS index", path=str(self.index_dir))
+            # Create new vector store; a concurrent writer may publish first, _commit then only adds the rest
+            metadatas = [md or {} for md in (metadatas or [{}] * len(texts))]
+            keep, keys = self._pending(texts, metadatas)
+            texts, metadatas = [texts[i] for i in keep], [metadatas[i] for i in keep]
+            vectors = self._embed(texts)
+            with track_stage("faiss_manager", "index_build"):
+                self._commit(keys, texts, metadatas, vectors)
+            self.log.info("Created new FAISS index", path=str(self.index_dir), version=self._version)
             
             return self.vector_store
 
@@ -148,6 +450,7 @@ class DocumentHandler:
         self.session_id = session_id or generate_session_id("session")
         self.session_path = os.path.join(self.data_dir, self.session_id)
         os.makedirs(self.session_path, exist_ok=True)
+        touch_session(self.session_path)
         self.log.info("DocHandler initialized", session_id=self.session_id, session_path=self.session_path)
 
     async def save_pdf(self, uploaded_file) -> str:
@@ -162,6 +465,7 @@ class DocumentHandler:
 
             with open(save_path, "wb") as f:
                 f.write(buffer)
+            record_bytes("document_handler", len(buffer))
 
             self.log.info("PDF saved successfully", file=filename, save_path=save_path, session_id=self.session_id)
             return save_path
@@ -174,12 +478,11 @@ class DocumentHandler:
     def read_pdf(self, pdf_path: str) -> str:
         try:
             self.log = CustomLogger().get_logger(__name__)
-            text_chunks = []
-            with fitz.open(pdf_path) as doc:
-                for page_num in range(doc.page_count):
-                    page = doc.load_page(page_num)
-                    text_chunks.append(f"\n--- Page {page_num + 1} ---\n{page.get_text()}")  # type: ignore
+            with track_stage("document_handler", "parse"):
+                parsed = parse_pdf(pdf_path)
+            text_chunks = [f"\n--- Page {p['page'] + 1} ---\n{p['text']}" for p in parsed["pages"]]
             text = "\n".join(text_chunks)
+            record_pages("document_handler", len(text_chunks))
             self.log.info("PDF read successfully", pdf_path=pdf_path, session_id=self.session_id, pages=len(text_chunks))
             return text
         except Exception as e:
@@ -198,6 +501,7 @@ class DocumentComparator:
            self.session_id = session_id or generate_session_id()
            self.session_path = self.base_dir / self.session_id
            self.session_path.mkdir(parents=True, exist_ok=True)
+           touch_session(self.session_path)
            self.log.info("DocumentComparator initialized", session_path=str(self.session_path))
            
            
@@ -216,6 +520,7 @@ class DocumentComparator:
                     with open(out ,"wb") as f:
                         #if hasattr(fobj,"read"):
                         f.write(buffer)
+                    record_bytes("document_comparator", len(buffer))
                         
                 self.log.info("Files saved", reference=str(ref_path), actual=str(act_path), session=self.session_id)
                 
@@ -226,21 +531,35 @@ class DocumentComparator:
          
        def read_pdf(self, pdf_path: Path) -> str:
             try:
-                with fitz.open(pdf_path) as doc:
-                    if doc.is_encrypted:
-                        raise ValueError(f"PDF is encrypted: {pdf_path.name}")
-                    parts = []
-                    for page_num in range(doc.page_count):
-                        page = doc.load_page(page_num)
-                        text = page.get_text()  # type: ignore
-                        if text.strip():
-                            parts.append(f"\n --- Page {page_num + 1} --- \n{text}")
+                with track_stage("document_comparator", "parse"):
+                    parsed = parse_pdf(pdf_path)
+                if parsed["metadata"].get("is_encrypted"):
+                    raise ValueError(f"PDF is encrypted: {pdf_path.name}")
+                parts = [f"\n --- Page {p['page'] + 1} --- \n{p['text']}" for p in parsed["pages"] if p["text"].strip()]
+                record_pages("document_comparator", len(parsed["pages"]))
                 self.log.info("PDF read successfully", file=str(pdf_path), pages=len(parts))
                 return "\n".join(parts)
             except Exception as e:
                 self.log.error("Error reading PDF", file=str(pdf_path), error=str(e))
                 raise DocumentPortalException("Error reading PDF", sys) 
 
+       def read_sections(self, pdf_path: Path) -> List[Section]:
+            """Heading-delimited sections of one PDF, for the sectioned comparison mode."""
+            try:
+                cfg = get_settings().compare
+                with track_stage("document_comparator", "parse"):
+                    parsed = parse_pdf(pdf_path)
+                if parsed["metadata"].get("is_encrypted"):
+                    raise ValueError(f"PDF is encrypted: {pdf_path.name}")
+                record_pages("document_comparator", len(parsed["pages"]))
+                sections = segment_sections(pdf_path.name, parsed["pages"], min_chars=cfg.section_min_chars,
+                                            max_chars=cfg.section_max_chars)
+                self.log.info("PDF segmented", file=str(pdf_path), sections=len(sections))
+                return sections
+            except Exception as e:
+                self.log.error("Error segmenting PDF", file=str(pdf_path), error=str(e))
+                raise DocumentPortalException("Error segmenting PDF", sys)
+
        def combine_documents(self) -> str:
             try:
                 doc_parts = []
@@ -256,8 +575,10 @@ class DocumentComparator:
                 raise DocumentPortalException("Error combining documents", sys)
 
        def clean_old_sessions(self, keep_latest: int = 3):
+            """Keep the most recently used compare sessions. See utils.session_janitor for TTL/quota eviction."""
             try:
-                sessions = sorted([f for f in self.base_dir.iterdir() if f.is_dir()], reverse=True)
+                sessions = sorted([f for f in self.base_dir.iterdir() if f.is_dir() and not f.name.startswith(".")],
+                                  key=last_access, reverse=True)
                 for folder in sessions[keep_latest:]:
                     shutil.rmtree(folder, ignore_errors=True)
                     self.log.info("Old session folder deleted", path=str(folder))
@@ -268,11 +589,12 @@ class DocumentComparator:
 
 class ChatIngestor:
     
-    def __init__(self,temp_base: Path=Path("data"),faiss_base:Path  = Path("faiss_index"),use_session_dirs: bool = True,session_id: Optional[str] = None):
+    def __init__(self,temp_base: Path=Path("data"),faiss_base:Path  = Path("faiss_index"),use_session_dirs: bool = True,session_id: Optional[str] = None,
+                 model_loader: Optional[ModelLoader] = None):
 
         try:
             self.log = CustomLogger().get_logger(__name__)
-            self.model_loader = ModelLoader()
+            self.model_loader = model_loader or ModelLoader()
             
             self.use_session = use_session_dirs
             self.session_id = session_id or generate_session_id()
@@ -296,6 +618,10 @@ class ChatIngestor:
          raise DocumentPortalException("Error cleaning old sessions", sys) 
         
     
+    def _lease_dirs(self) -> List[Path]:
+        """Session dirs this ingest writes to; shared (non-session) roots are never evicted."""
+        return [self.temp_dir, self.faiss_dir] if self.use_session else []
+    
     def _resolve_dir(self,base:Optional[Path])->Path:
         print("Resolving base:", base, "type:", type(base))
         if base is None:
@@ -306,55 +632,149 @@ class ChatIngestor:
             return d
         return base
     
-    def _split(self, docs: List[Document], chunk_size=1000, chunk_overlap=200) -> List[Document]:
+    def _token_splitter(self) -> Optional[TokenAwareSplitter]:
+        settings = get_settings()
+        try:
+            tokenizer = get_tokenizer(settings.embedding_model.embedding_model_name)
+        except Exception as e:
+            self.log.warning("Tokenizer unavailable, token-aware chunking disabled", error=str(e))
+            return None
+        try:
+            embeddings = self.model_loader.load_embeddings()
+        except Exception as e:
+            self.log.warning("Embedding model unavailable, sizing chunks from the tokenizer", error=str(e))
+            embeddings = None
+        max_seq_length = model_max_seq_length(embeddings, tokenizer, settings.embedding_model.max_seq_length)
+        return TokenAwareSplitter(tokenizer, max_seq_length, chunk_tokens=settings.chunking.chunk_tokens,
+                                  overlap_tokens=settings.chunking.overlap_tokens,
+                                  batch_size=settings.chunking.batch_size)
+    
+    def _split(self, docs: List[Document], chunk_size=1000, chunk_overlap=200, mode: Optional[str] = None) -> List[Document]:
+        """Split docs into chunks; ``mode`` is "token" or "char" (default from config chunking.mode).
+
+        Truncation/overlap statistics for the split are kept in ``self.last_chunk_stats``.
+        """
         self.log = CustomLogger().get_logger(__name__)
-        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-        chunks = splitter.split_documents(docs)
-        self.log.info("Documents split", chunks=len(chunks), chunk_size=chunk_size, overlap=chunk_overlap)
+        chunking = get_settings().chunking
+        mode = mode or chunking.mode
+        token_splitter = self._token_splitter() if (mode == "token" or chunking.report_char_stats) else None
+        
+        with track_stage("chat_ingestor", "split"):
+            if mode == "token" and token_splitter is not None:
+                chunks, stats = token_splitter.split_documents(docs)
+            else:
+                mode = "char"
+                splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                                          add_start_index=True)  # lets the RAG context assembler stitch neighbours
+                chunks = splitter.split_documents(docs)
+                stats = ChunkingStats(mode="char", documents=len(docs), chunks=len(chunks))
+        if mode == "char" and token_splitter is not None:
+            stats = token_splitter.measure(docs, chunks, mode="char")
+            
+        self.last_chunk_stats = stats
+        self.log.info("Documents split", chunk_size=chunk_size, overlap=chunk_overlap, **stats.as_dict())
         return chunks
     
+    def _dedup(self, chunks: List[Document]) -> List[Document]:
+        """Drop near-duplicate chunks before they are embedded; stats kept in ``self.last_dedup_stats``."""
+        cfg = get_settings().dedup
+        if not cfg.enabled:
+            self.last_dedup_stats = DedupStats(input_chunks=len(chunks), kept_chunks=len(chunks))
+            return chunks
+        dedup = MinHashDeduplicator(threshold=cfg.threshold, num_perm=cfg.num_perm, bands=cfg.bands,
+                                    shingle_size=cfg.shingle_size)
+        with track_stage("chat_ingestor", "dedup"):
+            kept, stats = dedup.deduplicate(chunks)
+        record_dedup("chat_ingestor", stats.dropped_chunks)
+        self.last_dedup_stats = stats
+        self.log.info("Near-duplicate chunks removed", **stats.as_dict())
+        return kept
+    
     
     
  
 
 
-    def built_retriever(self,uploaded_files: Iterable,*,chunk_size: int = 1000,chunk_overlap: int = 200,k: int = 5):
+    def built_retriever(self,uploaded_files: Iterable,*,chunk_size: int = 1000,chunk_overlap: int = 200,k: int = 5,
+                        chunk_mode: Optional[str] = None):
         try:
+            with session_lease(*self._lease_dirs()):
        
-            self.log = CustomLogger().get_logger(__name__)
-            paths = save_uploaded_files(uploaded_files, self.temp_dir)
+                self.log = CustomLogger().get_logger(__name__)
+                # the uploaded file name identifies a document across re-uploads (saved names are random);
+                # files no extractor handles (by extension or content) are skipped while saving
+                with track_stage("chat_ingestor", "save"):
+                    saved = [(p, uf) for uf in uploaded_files for p in save_uploaded_files([uf], self.temp_dir)]
+                paths = [p for p, _ in saved]
+                record_bytes("chat_ingestor", sum(p.stat().st_size for p in paths))
+                names = {str(p): Path(getattr(uf, "name", p.name)).name for p, uf in saved}
         
     
-            docs = doc_ops.load_documents(paths)
-            if not docs:
-                raise ValueError("No valid documents loaded")
+                with track_stage("chat_ingestor", "parse"):
+                    docs = doc_ops.load_documents(paths)
+                record_pages("chat_ingestor", len(docs))
+                if not docs:
+                    raise ValueError("No valid documents loaded")
+                for d in docs:
+                    d.metadata["document"] = names.get(d.metadata.get("source"), d.metadata.get("source"))
             
-            chunks = self._split(docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+                chunks = self._split(docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap, mode=chunk_mode)
+                chunks = self._dedup(chunks)
             
-            ## FAISS manager very very important class for the docchat
-            fm = FaissManager(self.faiss_dir, self.model_loader)
+                ## FAISS manager very very important class for the docchat
+                fm = FaissManager(self.faiss_dir, self.model_loader)
             
-            texts = [c.page_content for c in chunks]
-            metas = [c.metadata for c in chunks]
-            
-            try:
-                vs = fm.load_or_create(texts=texts, metadatas=metas)
-            except Exception:
-                vs = fm.load_or_create(texts=texts, metadatas=metas)
-                
-            added = fm.add_documents(chunks)
-            self.log.info(f"FAISS index updated: added={added}, index={self.faiss_dir}")
-            #self.log.info(f"Retriever built successfully: retriever_type=similarity, k={k}")
+                with track_stage("chat_ingestor", "index"):
+                    # re-uploaded documents only re-embed changed chunks; their removed chunks are deleted
+                    self.last_index_update = fm.upsert_documents(chunks)
+                    vs = fm.vector_store
+                self.log.info("FAISS index updated", index=str(self.faiss_dir), **self.last_index_update.as_dict())
+                #self.log.info(f"Retriever built successfully: retriever_type=similarity, k={k}")
 
-            #self.log.info("Retriever built successfully", retriever_type="similarity", k=k)
+                #self.log.info("Retriever built successfully", retriever_type="similarity", k=k)
 
             
-            return vs.as_retriever(search_type="similarity", search_kwargs={"k": k})
+                return build_retriever(vs, k=k)
             
             
             
         except Exception as e:
          self.log.error(f"built_retriever failed: {str(e)}")
          raise DocumentPortalException(f"built_retriever failed :" ,e)
+
+    def import_embeddings(self, embeddings_path: Path, chunks_path: Path) -> Dict[str, Any]:
+        """Build or extend the session index from precomputed embeddings.
+
+        ``embeddings_path`` is a ``.npy`` float32 matrix (memory-mapped, never loaded whole)
+        and ``chunks_path`` a JSONL file with one ``{"text": ..., "metadata": {...}}`` object
+        per row of the matrix, in the same order.
+        """
+        try:
+            with session_lease(*self._lease_dirs()):
+                with track_stage("chat_ingestor", "parse"):
+                    vectors = np.load(embeddings_path, mmap_mode="r", allow_pickle=False)
+                    texts: List[str] = []
+                    metas: List[dict] = []
+                    with open(chunks_path, encoding="utf-8") as f:
+                        for lineno, line in enumerate(f, 1):
+                            if not line.strip():
+                                continue
+                            row = json.loads(line)
+                            if not isinstance(row, dict) or not isinstance(row.get("text"), str):
+                                raise ValueError(f"line {lineno}: expected an object with a 'text' string")
+                            texts.append(row["text"])
+                            metas.append(row.get("metadata") or {})
+
+                fm = FaissManager(self.faiss_dir, self.model_loader)
+                with track_stage("chat_ingestor", "index"):
+                    added = fm.import_embeddings(texts, vectors, metas)
+                self.log.info("Imported embeddings", session_id=self.session_id, rows=len(texts), added=added)
+                return {"rows": len(texts), "added": added, "skipped": len(texts) - added,
+                        "dim": int(vectors.shape[1]) if vectors.ndim == 2 else None}
+        except DocumentPortalException:
+            raise
+        except Exception as e:
+            self.log.error("import_embeddings failed", error=str(e))
+            raise DocumentPortalException(f"Embedding import failed: {e}", sys)
     
 
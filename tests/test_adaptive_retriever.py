@@ -0,0 +1,47 @@
+# tests/test_adaptive_retriever.py
+import pytest
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.fakes import StubModelLoader
+from src.document_chat.adaptive_retriever import AdaptiveKRetriever, adaptive_cutoff, build_retriever
+from utils.config_loader import RetrieverSettings
+
+
+def test_cutoff_applies_threshold_drop_off_and_minimum():
+    assert adaptive_cutoff([0.9, 0.85, 0.8, 0.4, 0.38], min_score=0.2, max_drop=0.3) == 3
+    assert adaptive_cutoff([0.9, 0.5, 0.3], min_score=0.6) == 1
+    assert adaptive_cutoff([0.1, 0.05], min_k=1, min_score=0.5) == 1  # min_k survives the threshold
+    assert adaptive_cutoff([0.9, 0.8, 0.7]) == 3
+    assert adaptive_cutoff([], min_k=2) == 0
+
+
+def _store():
+    texts = ["rent is due on the first day of each month",
+             "late rent incurs a fee of five percent",
+             "the pool opens at nine in summer",
+             "parking permits are issued by the office",
+             "pets require written approval"]
+    return FAISS.from_documents([Document(page_content=t, metadata={"source": "lease.txt", "row": i})
+                                 for i, t in enumerate(texts)], StubModelLoader(dim=256).load_embeddings())
+
+
+def test_easy_question_returns_fewer_chunks_with_scores():
+    store = _store()
+    retriever = AdaptiveKRetriever(vectorstore=store, k=5, min_score=0.2, max_drop=0.5)
+    docs = retriever.invoke("when is rent due each month")
+    assert 1 <= len(docs) < 5 and docs[0].metadata["row"] == 0
+    scores = [d.metadata["score"] for d in docs]
+    assert scores == sorted(scores, reverse=True) and scores[-1] >= 0.2
+    assert "score" not in store.docstore.search(store.index_to_docstore_id[0]).metadata
+
+
+def test_request_k_is_the_maximum_in_both_modes():
+    store = _store()
+    permissive = RetrieverSettings(top_k=4, min_score=None, max_drop=None)
+    assert len(build_retriever(store, cfg=permissive).invoke("rent")) == 4
+    assert len(build_retriever(store, k=2, cfg=permissive).invoke("rent")) == 2
+    fixed = RetrieverSettings(top_k=4, mode="similarity")
+    assert len(build_retriever(store, k=3, cfg=fixed).invoke("pool hours")) == 3
+    with pytest.raises(ValueError):
+        build_retriever(store, k=0, cfg=fixed)  # an explicit 0 is not "use top_k"
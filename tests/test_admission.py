@@ -0,0 +1,104 @@
+# tests/test_admission.py
+import asyncio
+import io
+import tracemalloc
+
+import fitz
+import pytest
+from fastapi.testclient import TestClient
+
+import utils.config_loader as config_loader
+from utils.admission import MB, AdmissionController, AdmissionRejected, estimate_cost
+from utils.config_loader import AdmissionSettings, get_settings
+from utils.metrics import STAGE_PEAK_BYTES, track_stage
+
+
+def _pdf(pages):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Page {i}: the tenant pays rent monthly.")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class FakeRSS:
+    def __init__(self, mb):
+        self.bytes = mb * MB
+
+    def __call__(self):
+        return self.bytes
+
+
+def test_cost_grows_with_size_and_pages():
+    cfg = AdmissionSettings(base_mb=10, upload_multiplier=4, per_page_kb=1024)
+    small, large = _pdf(2), _pdf(20)
+    fileobj = io.BytesIO(large)
+    fileobj.seek(7)
+    cost = estimate_cost([("a.pdf", io.BytesIO(small)), ("b.pdf", fileobj)], cfg)
+    assert cost.pages == 22 and cost.upload_bytes == len(small) + len(large)
+    assert cost.bytes == 10 * MB + 4 * (len(small) + len(large)) + 22 * MB
+    assert fileobj.tell() == 7  # upload position untouched
+
+    assert estimate_cost([("notes.txt", io.BytesIO(b"x" * 1000))], cfg).pages == 0
+
+
+def test_requests_queue_until_memory_is_released_then_time_out():
+    rss = FakeRSS(100)
+    controller = AdmissionController(budget_bytes=400 * MB, max_queue=1, queue_timeout=0.3, poll_interval=0.01, rss=rss)
+
+    async def scenario():
+        first = await controller.acquire(200 * MB, "chat_index")
+        rss.bytes = 250 * MB  # the first request is now parsing
+        waiter = asyncio.create_task(controller.acquire(150 * MB, "chat_index"))
+        await asyncio.sleep(0.05)
+        assert not waiter.done() and len(controller._waiting) == 1
+
+        with pytest.raises(AdmissionRejected) as full:
+            await controller.acquire(10 * MB, "compare")  # queue of one is full
+        assert full.value.status_code == 503
+
+        first.release()
+        rss.bytes = 100 * MB
+        second = await asyncio.wait_for(waiter, 1)
+        assert controller.reserved == 150 * MB
+
+        with pytest.raises(AdmissionRejected) as late:
+            await controller.acquire(200 * MB, "compare")
+        assert late.value.status_code == 503 and not controller._waiting
+        second.release()
+        assert controller.reserved == 0
+
+    asyncio.run(scenario())
+
+
+def test_request_that_can_never_fit_is_rejected_immediately():
+    controller = AdmissionController(budget_bytes=300 * MB, rss=FakeRSS(100))
+    with pytest.raises(AdmissionRejected) as e:
+        asyncio.run(controller.acquire(250 * MB, "chat_index"))
+    assert e.value.status_code == 413
+
+
+def test_stage_peak_memory_is_recorded_while_tracing():
+    def observed():
+        return sum(s.value for s in STAGE_PEAK_BYTES.collect()[0].samples
+                   if s.name.endswith("_sum") and s.labels == {"component": "test_admission", "stage": "parse"})
+
+    tracemalloc.start()
+    try:
+        with track_stage("test_admission", "parse"):
+            blob = [bytes(1024) for _ in range(8 * 1024)]  # ~8 MB, freed before the stage ends
+            del blob
+    finally:
+        tracemalloc.stop()
+    assert observed() >= 8 * MB
+
+
+def test_chat_index_rejects_uploads_over_the_worker_budget(monkeypatch):
+    cfg = AdmissionSettings(budget_mb=1, base_mb=0, per_page_kb=4096)
+    monkeypatch.setattr(config_loader, "_settings", get_settings().model_copy(update={"admission": cfg}))
+    from api.main import app
+
+    response = TestClient(app).post("/chat/index", files=[("files", ("big.pdf", _pdf(3), "application/pdf"))])
+    assert response.status_code == 413
+    assert "worker budget" in response.json()["detail"]
@@ -0,0 +1,47 @@
+# tests/test_batch_analysis.py
+import asyncio
+import threading
+import time
+
+from src.document_analyzer.batch_analysis import BatchDocumentAnalyzer
+
+
+class SlowAnalyzer:
+    """Stands in for DocumentAnalyzer: sleeps per document and tracks peak concurrency."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def analyze_document(self, text):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05 if text == "slow" else 0.01)
+        with self._lock:
+            self.active -= 1
+        if text == "boom":
+            raise RuntimeError("analysis exploded")
+        return {"Summary": [text]}
+
+
+async def _collect(batch, paths, errors=None):
+    return [record async for record in batch.stream(paths, errors)]
+
+
+def test_batch_streams_in_completion_order_with_bounded_concurrency():
+    analyzer = SlowAnalyzer()
+    batch = BatchDocumentAnalyzer(read_text=lambda p: p, analyzer=analyzer, max_concurrency=2, parse_workers=2)
+    paths = {0: "slow", 1: "a", 2: "boom", 3: "b"}
+    rejected = [{"index": 4, "filename": "x.txt", "status": "error", "error": "Only PDFs"}]
+
+    records = asyncio.run(_collect(batch, paths, rejected))
+
+    assert records[0] == rejected[0]
+    per_file = records[1:-1]
+    assert {r["index"] for r in per_file} == {0, 1, 2, 3}
+    assert per_file[-1]["index"] == 0  # the slow file finishes last
+    assert next(r for r in per_file if r["index"] == 2)["status"] == "error"
+    assert records[-1] == {"summary": {"files": 5, "succeeded": 3, "failed": 2}}
+    assert analyzer.peak <= 2
@@ -0,0 +1,20 @@
+# tests/test_benchmarks.py
+# the benchmark suite runs end-to-end on fake models and flags regressions
+
+from benchmarks.compare import compare_results
+from benchmarks.run import run_suite
+
+
+def test_suite_runs_on_tiny_corpus():
+    results = run_suite(files_per_type=1, pages=1, words_per_page=80, repeat=1)
+    stages = results["stages"]
+    for stage in ("load_documents", "split", "faiss_build", "faiss_add", "faiss_load", "retrieval", "rag_query"):
+        assert stages[stage]["seconds"] >= 0
+    assert stages["load_documents"]["items"] == 3  # one pdf page, one docx, one txt
+
+
+def test_compare_flags_slow_stage():
+    baseline = {"stages": {"split": {"seconds": 1.0}, "retrieval": {"seconds": 1.0}}}
+    current = {"stages": {"split": {"seconds": 1.5}, "retrieval": {"seconds": 1.05}}}
+    report = compare_results(current, baseline, tolerance=0.25)
+    assert report["regressions"] == ["split"]
@@ -0,0 +1,60 @@
+# tests/test_chat_memory.py
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from benchmarks.fakes import stub_llm
+from src.document_chat.chat_memory import SQLiteChatMemory, conversation_key
+from utils.session_janitor import SessionJanitor
+
+
+def test_history_is_windowed_and_old_turns_fold_into_summary(tmp_path):
+    memory = SQLiteChatMemory(tmp_path / "memory.sqlite3", window_turns=2, summarize_every=2)
+    summarizer = stub_llm(["User asked about fees and the notice period."])
+
+    for i in range(3):
+        memory.append("s1", f"question {i}", f"answer {i}")
+        assert memory.summarize_if_due("s1", summarizer) is False  # only one turn overflowed so far
+    memory.append("s1", "question 3", "answer 3")
+    assert memory.summarize_if_due("s1", summarizer) is True
+
+    history, stats = memory.history("s1")
+    assert isinstance(history[0], SystemMessage) and "notice period" in history[0].content
+    assert [m.content for m in history[1:]] == ["question 2", "answer 2", "question 3", "answer 3"]
+    assert isinstance(history[1], HumanMessage) and isinstance(history[2], AIMessage)
+    assert stats.summarized_turns == 2 and stats.window_turns == 2
+
+    memory.append("s1", "question 4", "answer 4")
+    assert memory.history("s1")[0][-2].content == "question 4"
+    assert memory.history("other")[0] == []  # sessions are isolated
+
+
+def test_history_size_stays_bounded(tmp_path):
+    memory = SQLiteChatMemory(tmp_path / "memory.sqlite3", window_turns=3, summarize_every=1,
+                              max_summary_tokens=50, max_message_tokens=40)
+    summarizer = stub_llm(["summary " * 500])
+    sizes = []
+    for i in range(12):
+        memory.append("s1", "long question " * 100, "long answer " * 100)
+        memory.summarize_if_due("s1", summarizer)
+        sizes.append(memory.history("s1")[1].history_tokens)
+
+    assert max(sizes) <= 50 + 3 * 2 * 45
+    assert sizes[-1] == sizes[-4]  # steady state once the window is full
+
+
+def test_conversations_are_isolated_and_evicted_with_their_session(tmp_path):
+    memory = SQLiteChatMemory(tmp_path / "memory.sqlite3", window_turns=4)
+    alice, bob = conversation_key("s_1", "alice"), conversation_key("s_1", "bob")
+    memory.append(alice, "alice asks", "answer")
+    memory.append(bob, "bob asks", "answer")
+    memory.append(conversation_key("s_10", "carol"), "carol asks", "answer")
+    memory.append(conversation_key("sX1", "dave"), "dave asks", "answer")  # "_" is not a wildcard
+    assert [m.content for m in memory.history(alice)[0]] == ["alice asks", "answer"]
+
+    (tmp_path / "faiss_index" / "s_1").mkdir(parents=True)
+    janitor = SessionJanitor([tmp_path / "faiss_index"], ttl_seconds=0, on_evict=memory.clear_session)
+    assert janitor.sweep(now=time.time() + 10).expired == ["s_1"]
+    assert memory.history(alice)[0] == [] and memory.history(bob)[0] == []
+    assert memory.history(conversation_key("s_10", "carol"))[0] != []
+    assert memory.history(conversation_key("sX1", "dave"))[0] != []
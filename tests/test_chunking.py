@@ -0,0 +1,90 @@
+# tests/test_chunking.py
+# token-aware chunks always fit the embedding model's sequence length
+
+import pytest
+from langchain.schema import Document
+from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+from transformers import PreTrainedTokenizerFast
+
+from utils.chunking import TokenAwareSplitter, model_max_seq_length
+
+WORDS = "the payment term of this agreement is thirty days after invoice date .".split()
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    vocab = {tok: i for i, tok in enumerate(["[PAD]", "[UNK]", "[CLS]", "[SEP]"] + sorted(set(WORDS)))}
+    backend = Tokenizer(models.WordPiece(vocab=vocab, unk_token="[UNK]"))
+    backend.normalizer = normalizers.BertNormalizer(lowercase=True)
+    backend.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    backend.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 2), ("[SEP]", 3)])
+    return PreTrainedTokenizerFast(tokenizer_object=backend, unk_token="[UNK]", cls_token="[CLS]",
+                                   sep_token="[SEP]", pad_token="[PAD]")
+
+
+def _doc(sentences: int) -> Document:
+    return Document(page_content=" ".join(["The payment term of this agreement is thirty days after invoice date."] * sentences),
+                    metadata={"source": "a.pdf"})
+
+
+def test_chunks_fit_model_limit(tokenizer):
+    splitter = TokenAwareSplitter(tokenizer, max_seq_length=32, overlap_tokens=4)
+    chunks, stats = splitter.split_documents([_doc(20)])
+    assert stats.chunks == len(chunks) > 1
+    assert stats.max_chunk_tokens <= 30  # 32 minus [CLS]/[SEP]
+    assert all(c.metadata["source"] == "a.pdf" and "start_index" in c.metadata for c in chunks)
+    assert chunks[0].page_content.endswith(".")  # snapped to a sentence end
+
+
+def test_measure_reports_truncation(tokenizer):
+    splitter = TokenAwareSplitter(tokenizer, max_seq_length=32, overlap_tokens=4)
+    doc = _doc(10)
+    stats = splitter.measure([doc], [doc], mode="char")
+    assert stats.truncated_chunks == 1
+    assert stats.truncated_tokens == stats.chunk_tokens - 30
+
+
+def test_max_seq_length_comes_from_the_loaded_model(tokenizer):
+    class Model:
+        max_seq_length = 256
+
+    class Embeddings:
+        _client = Model()
+
+    original = tokenizer.model_max_length
+    try:
+        tokenizer.model_max_length = 512
+        assert model_max_seq_length(Embeddings(), tokenizer) == 256  # not the tokenizer's 512
+        assert model_max_seq_length(Embeddings(), tokenizer, configured=128) == 128
+        assert model_max_seq_length(Embeddings(), tokenizer, configured=1024) == 256
+        assert model_max_seq_length(None, tokenizer) == 512
+        tokenizer.model_max_length = int(1e30)  # "no limit" sentinel
+        assert model_max_seq_length(None, tokenizer) == 512
+    finally:
+        tokenizer.model_max_length = original
+
+
+def test_char_sizes_select_char_mode_and_are_ignored_in_token_mode(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import api.main as api
+    import src.document_ingestion.data_ingestion as ingestion
+    from benchmarks.fakes import StubModelLoader
+
+    monkeypatch.setattr(ingestion, "ModelLoader", StubModelLoader)
+    monkeypatch.setattr(api, "FAISS_BASE", str(tmp_path / "faiss"))
+    monkeypatch.setattr(api, "UPLOAD_BASE", str(tmp_path / "uploads"))
+    client = TestClient(api.app)
+    files = [("files", ("a.txt", b"The payment term is thirty days.", "text/plain"))]
+
+    # what existing clients (and the old UI) send: 1000/200 without a chunk_mode
+    response = client.post("/chat/index", data={"session_id": "old", "chunk_size": "1000", "chunk_overlap": "200"},
+                           files=files)
+    assert response.status_code == 200, response.text
+    assert response.json()["chunking"]["mode"] == "char" and response.json()["warnings"] == []
+
+    response = client.post("/chat/index", data={"session_id": "tok", "chunk_size": "500", "chunk_mode": "token"},
+                           files=files)
+    assert response.status_code == 200, response.text
+    assert "ignored" in response.json()["warnings"][0]
@@ -0,0 +1,28 @@
+# tests/test_config_loader.py
+# settings are parsed once and swapped atomically on reload
+
+from utils import config_loader
+from utils.config_loader import Settings, get_settings, reload_settings
+
+
+def test_settings_are_cached():
+    assert get_settings() is get_settings()
+
+
+def test_max_output_tokens_alias():
+    settings = get_settings()
+    for provider in settings.llm.values():
+        assert provider.max_tokens > 0
+
+
+def test_reload_swaps_settings(tmp_path):
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text("retriever:\n  top_k: 3\n", encoding="utf-8")
+    previous = get_settings()
+    try:
+        fresh = reload_settings(cfg)
+        assert isinstance(fresh, Settings)
+        assert get_settings() is fresh
+        assert fresh.retriever.top_k == 3
+    finally:
+        config_loader._settings = previous
@@ -0,0 +1,44 @@
+# tests/test_context_assembler.py
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from src.document_chat.context_assembler import ContextAssembler
+
+PAGE = " ".join(f"Sentence number {i} explains clause {i} of the master services agreement." for i in range(60))
+
+
+def _chunks(source="contract.pdf", page=0, start_index=True):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=400, chunk_overlap=100, add_start_index=start_index)
+    return splitter.split_documents([Document(page_content=PAGE, metadata={"source": source, "page": page})])
+
+
+def test_overlapping_neighbours_are_stitched_back_into_the_original_text():
+    chunks = _chunks()[3:7]
+    context, stats = ContextAssembler(max_tokens=10_000).assemble(list(reversed(chunks)))
+
+    start = chunks[0].metadata["start_index"]
+    end = chunks[-1].metadata["start_index"] + len(chunks[-1].page_content)
+    assert context == PAGE[start:end]
+    assert stats.spans == 1 and stats.merged_chunks == 3
+    assert stats.tokens_saved > 0 and stats.context_tokens < stats.retrieved_tokens
+
+
+def test_text_overlap_and_duplicates_are_used_without_offsets():
+    chunks = _chunks(start_index=False)[3:6]
+    docs = chunks + [Document(page_content=chunks[1].page_content, metadata=dict(chunks[1].metadata))]
+    context, stats = ContextAssembler(max_tokens=10_000).assemble(docs)
+
+    assert stats.spans == 1 and stats.merged_chunks == 2 and stats.duplicate_chunks == 1
+    assert context.startswith(chunks[0].page_content) and context.endswith(chunks[-1].page_content)
+
+
+def test_budget_keeps_best_ranked_spans_first():
+    best = Document(page_content="Termination requires ninety days notice. " * 10, metadata={"source": "b.pdf", "score": 0.9})
+    worse = Document(page_content="Payment is due in thirty days. " * 40, metadata={"source": "a.pdf", "score": 0.4})
+    assembler = ContextAssembler(max_tokens=150, min_fragment_tokens=20)
+
+    context, stats = assembler.assemble([worse, best])
+
+    assert context.startswith("Termination")
+    assert stats.truncated_spans == 1
+    assert stats.context_tokens <= 150
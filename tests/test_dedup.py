@@ -0,0 +1,30 @@
+# tests/test_dedup.py
+# near-duplicate chunks are dropped, distinct ones kept in order
+
+from langchain.schema import Document
+
+from utils.dedup import MinHashDeduplicator
+
+DISCLAIMER = ("This document is confidential and intended solely for the addressee. Any review, "
+              "retransmission or other use of this information by persons other than the intended "
+              "recipient is prohibited. All rights reserved by the company and its affiliates.")
+
+
+def test_boilerplate_variants_are_dropped():
+    docs = [
+        Document(page_content=DISCLAIMER, metadata={"page": 0}),
+        Document(page_content="Invoice total is 4,200 USD payable within thirty days of delivery.", metadata={"page": 0}),
+        Document(page_content=DISCLAIMER + " Page 2", metadata={"page": 1}),
+        Document(page_content=DISCLAIMER, metadata={"page": 2}),
+        Document(page_content="The warranty covers parts and labour for twelve months.", metadata={"page": 2}),
+    ]
+    kept, stats = MinHashDeduplicator(threshold=0.8).deduplicate(docs)
+    assert [d.metadata["page"] for d in kept] == [0, 0, 2]
+    assert stats.dropped_chunks == 2
+    assert kept[0].page_content == DISCLAIMER
+
+
+def test_distinct_chunks_survive():
+    docs = [Document(page_content=f"clause {i} covers topic number {i * 7} in detail") for i in range(20)]
+    kept, stats = MinHashDeduplicator(threshold=0.85).deduplicate(docs)
+    assert len(kept) == 20 and stats.dropped_chunks == 0
@@ -0,0 +1,47 @@
+# tests/test_embedding_backend.py
+import numpy as np
+import pytest
+
+from utils.config_loader import EmbeddingSettings
+from utils.embedding_backend import int8_file_name, sentence_transformer_kwargs
+
+
+def test_backend_kwargs():
+    assert sentence_transformer_kwargs(EmbeddingSettings()) == {}
+    with pytest.raises(ValueError):
+        sentence_transformer_kwargs(EmbeddingSettings(backend="tensorrt"))
+
+    pytest.importorskip("onnxruntime")  # optional: requirements-onnx.txt
+    onnx = sentence_transformer_kwargs(EmbeddingSettings(backend="onnx", threads=2))
+    assert onnx["backend"] == "onnx" and onnx["device"] == "cpu"
+    assert onnx["model_kwargs"]["session_options"].intra_op_num_threads == 2
+    assert "file_name" not in onnx["model_kwargs"]
+
+    int8 = sentence_transformer_kwargs(EmbeddingSettings(backend="onnx-int8", onnx_file_name="onnx/custom.onnx"))
+    assert int8["model_kwargs"]["file_name"] == "onnx/custom.onnx"
+
+
+def test_int8_file_names_match_published_variants():
+    assert int8_file_name("avx2") == "onnx/model_quint8_avx2.onnx"
+    assert int8_file_name("avx512_vnni") == "onnx/model_qint8_avx512_vnni.onnx"
+    assert int8_file_name("arm64") == "onnx/model_qint8_arm64.onnx"
+
+
+def test_onnx_backends_agree_with_torch(tmp_path):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("optimum")
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    from benchmarks.bench_embeddings import agreement, make_texts
+    from benchmarks.fakes import build_tiny_sentence_model
+
+    model = build_tiny_sentence_model(tmp_path / "tiny", hidden=64, layers=1)
+    texts = make_texts(40, words=30)
+    vectors = {}
+    for backend in ("torch", "onnx", "onnx-int8"):
+        cfg = EmbeddingSettings(embedding_model_name=model, backend=backend, threads=1)
+        embedder = HuggingFaceEmbeddings(model_name=model, model_kwargs=sentence_transformer_kwargs(cfg))
+        vectors[backend] = np.asarray(embedder.embed_documents(texts), dtype=np.float32)
+
+    assert agreement(vectors["torch"], vectors["onnx"], queries=20)["cosine_min"] > 0.999
+    assert agreement(vectors["torch"], vectors["onnx-int8"], queries=20)["cosine_mean"] > 0.98
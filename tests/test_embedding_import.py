@@ -0,0 +1,58 @@
+# tests/test_embedding_import.py
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks.fakes import StubModelLoader
+from exception.custom_exception import DocumentPortalException
+from src.document_ingestion.data_ingestion import ChatIngestor, FaissManager
+
+
+def _corpus(loader, count, start=0):
+    texts = [f"clause {i} covers payment terms and notice period number {i}" for i in range(start, start + count)]
+    metas = [{"source": "upstream.pdf", "row_id": i} for i in range(start, start + count)]
+    vectors = np.asarray(loader.load_embeddings().embed_documents(texts), dtype=np.float32)
+    return texts, metas, vectors
+
+
+def test_import_builds_and_extends_index_from_memmap(tmp_path):
+    loader = StubModelLoader(dim=64)
+    texts, metas, vectors = _corpus(loader, 30)
+    np.save(tmp_path / "emb.npy", vectors)
+
+    fm = FaissManager(tmp_path / "index", loader)
+    assert fm.import_embeddings(texts, np.load(tmp_path / "emb.npy", mmap_mode="r"), metas) == 30
+    assert fm.import_embeddings(texts[:10], vectors[:10], metas[:10]) == 0  # already indexed
+
+    more_texts, more_metas, more_vectors = _corpus(loader, 5, start=30)
+    reloaded = FaissManager(tmp_path / "index", loader)
+    assert reloaded.import_embeddings(more_texts, more_vectors, more_metas) == 5
+    store = reloaded.vector_store
+    assert store.index.ntotal == 35
+
+    hit = store.similarity_search("clause 32 covers payment terms and notice period number 32", k=1)[0]
+    assert hit.metadata["row_id"] == 32
+
+
+def test_import_rejects_wrong_dimension_and_row_count(tmp_path):
+    loader = StubModelLoader(dim=64)
+    texts, metas, vectors = _corpus(loader, 4)
+    fm = FaissManager(tmp_path / "index", loader)
+    with pytest.raises(DocumentPortalException, match="dimension"):
+        fm.import_embeddings(texts, np.zeros((4, 32), dtype=np.float32), metas)
+    with pytest.raises(DocumentPortalException):
+        fm.import_embeddings(texts[:3], vectors, metas[:3])
+
+
+def test_chat_ingestor_imports_npy_and_jsonl(tmp_path):
+    loader = StubModelLoader(dim=64)
+    texts, metas, vectors = _corpus(loader, 12)
+    np.save(tmp_path / "emb.npy", vectors)
+    (tmp_path / "chunks.jsonl").write_text("\n".join(json.dumps({"text": t, "metadata": m})
+                                                     for t, m in zip(texts, metas)), encoding="utf-8")
+
+    ci = ChatIngestor(temp_base=tmp_path / "data", faiss_base=tmp_path / "faiss", model_loader=loader)
+    result = ci.import_embeddings(tmp_path / "emb.npy", tmp_path / "chunks.jsonl")
+    assert result == {"rows": 12, "added": 12, "skipped": 0, "dim": 64}
+    assert (ci.faiss_dir / "CURRENT").read_text() == "v000001"
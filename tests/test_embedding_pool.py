@@ -0,0 +1,62 @@
+# tests/test_embedding_pool.py
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from utils.config_loader import EmbeddingPoolSettings, EmbeddingSettings, get_settings
+from utils.embedding_pool import EmbeddingPool, _claim_cpu_region, as_float32_matrix, get_embedding_pool, pool_workers
+
+
+def test_as_float32_matrix_validates_shape():
+    matrix = as_float32_matrix([[1, 2], [3, 4]], dim=2)
+    assert matrix.dtype == np.float32 and matrix.flags["C_CONTIGUOUS"]
+    assert as_float32_matrix([], dim=384).shape == (0, 384)
+    with pytest.raises(ValueError):
+        as_float32_matrix([[1.0, 2.0]], dim=3)
+
+
+def test_pool_is_only_used_above_the_threshold():
+    settings = get_settings()
+    assert get_embedding_pool(10_000, settings) is None  # off by default
+    small = settings.model_copy(update={"embedding_pool": EmbeddingPoolSettings(enabled=True, workers=4,
+                                                                                min_chunks=100)})
+    assert get_embedding_pool(99, small) is None
+    single = settings.model_copy(update={"embedding_pool": EmbeddingPoolSettings(enabled=True, workers=1,
+                                                                                 min_chunks=1)})
+    assert get_embedding_pool(10_000, single) is None
+
+
+def test_server_workers_split_the_cpus():
+    cpus = os.cpu_count()
+    assert pool_workers(EmbeddingPoolSettings(), server_workers=4) == cpus // 4
+    assert pool_workers(EmbeddingPoolSettings(workers=3), server_workers=4) == 3
+
+    # each server worker process claims a different region of cores to pin its pool to
+    mine = _claim_cpu_region(4)
+    probe = "from utils.embedding_pool import _claim_cpu_region; print(_claim_cpu_region(4))"
+    other = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    assert other.stdout.strip().splitlines()[-1] not in (str(mine), "None")
+
+
+def test_pool_matches_in_process_embeddings_in_order(tmp_path):
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    from benchmarks.bench_embeddings import make_texts
+    from benchmarks.fakes import build_tiny_sentence_model
+
+    model = build_tiny_sentence_model(tmp_path / "tiny", hidden=64, layers=1)
+    texts = make_texts(45, words=20)
+    expected = np.asarray(HuggingFaceEmbeddings(model_name=model).embed_documents(texts), dtype=np.float32)
+
+    pool = EmbeddingPool(EmbeddingSettings(embedding_model_name=model), workers=2, batch_size=8,
+                         threads_per_worker=1)
+    try:
+        vectors = pool.embed(texts)
+    finally:
+        pool.shutdown()
+    assert vectors.dtype == np.float32 and vectors.flags["C_CONTIGUOUS"]
+    assert vectors.shape == expected.shape
+    np.testing.assert_allclose(vectors, expected, atol=1e-5)
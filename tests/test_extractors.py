@@ -0,0 +1,86 @@
+# tests/test_extractors.py
+import shutil
+
+import utils.config_loader as config_loader
+from benchmarks.bench_extractors import run
+from benchmarks.corpus import generate_corpus
+from utils.config_loader import ExtractorSettings, get_settings
+from utils.document_ops import load_documents
+from utils.extractors import EXTRACTORS, SUPPORTED_EXTENSIONS, Extractor, ExtractorRegistry, sniff_mime
+from utils.metrics import EXTRACTED_PAGES
+from utils.parse_cache import ParsedDocumentCache, set_parse_cache
+
+
+def test_pdf_pages_keep_metadata_and_default_to_pymupdf(tmp_path):
+    corpus = generate_corpus(tmp_path, files_per_type=1, pages=3, words_per_page=60)
+    set_parse_cache(ParsedDocumentCache(tmp_path / "cache"))
+    try:
+        before = EXTRACTED_PAGES.labels("pymupdf")._value.get()
+        docs = load_documents(corpus[".pdf"] + corpus[".docx"] + corpus[".txt"])
+        load_documents(corpus[".pdf"])  # served from the parse cache
+        assert EXTRACTED_PAGES.labels("pymupdf")._value.get() == before + 3
+    finally:
+        set_parse_cache(None)
+
+    pdf = [d for d in docs if d.metadata["source"].endswith(".pdf")]
+    assert [(d.metadata["page"], d.metadata["total_pages"]) for d in pdf] == [(0, 3), (1, 3), (2, 3)]
+    assert [d.metadata for d in docs[3:]] == [{"source": str(corpus[".docx"][0])}, {"source": str(corpus[".txt"][0])}]
+    assert all(d.page_content.strip() for d in docs)
+
+
+def test_config_override_and_content_sniffing(tmp_path, monkeypatch):
+    corpus = generate_corpus(tmp_path, files_per_type=1, pages=2, words_per_page=40)
+    monkeypatch.setattr("utils.parse_cache._cache", ParsedDocumentCache(tmp_path / "cache"))
+    pdf = corpus[".pdf"][0]
+    assert EXTRACTORS.for_path(pdf).name == "pymupdf"
+
+    cfg = ExtractorSettings(backends={".pdf": "pypdf"})
+    monkeypatch.setattr(config_loader, "_settings", get_settings().model_copy(update={"extractors": cfg}))
+    assert EXTRACTORS.for_path(pdf).name == "pypdf"
+    assert len(load_documents([pdf])) == 2
+    monkeypatch.undo()
+
+    for ext, name in ((".pdf", "pymupdf"), (".docx", "docx2txt"), (".txt", "text")):
+        bare = tmp_path / f"upload_without_extension_{ext[1:]}"
+        shutil.copy(corpus[ext][0], bare)
+        assert EXTRACTORS.for_path(bare).name == name
+    (tmp_path / "blob").write_bytes(bytes(range(256)))
+    assert sniff_mime(tmp_path / "blob") is None and EXTRACTORS.for_path(tmp_path / "blob") is None
+
+
+def test_custom_extractor_registration(tmp_path):
+    registry = ExtractorRegistry()
+    registry.register(Extractor("markdown", (".md",), ("text/markdown",),
+                                lambda p: {"metadata": {}, "pages": [{"text": p.read_text()}]}, cacheable=False))
+    (tmp_path / "notes.md").write_text("# Notes")
+    assert registry.for_path(tmp_path / "notes.md").name == "markdown"
+    assert registry.extensions == {".md"} and ".md" not in SUPPORTED_EXTENSIONS
+
+
+def test_extractor_benchmark_compares_pdf_backends(tmp_path):
+    paths = generate_corpus(tmp_path, files_per_type=1, pages=2, words_per_page=50, types=(".pdf",))[".pdf"]
+    results = run(paths, ".pdf", repeat=1)
+    assert [r["extractor"] for r in results] == ["pymupdf", "pypdf"]
+    assert results[1]["word_agreement_vs_default"] > 0.9 and results[0]["pages"] == 2
+
+
+def test_chat_index_accepts_an_extensionless_pdf(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import api.main as api
+    import src.document_ingestion.data_ingestion as ingestion
+    from benchmarks.fakes import StubModelLoader
+
+    pdf = generate_corpus(tmp_path, files_per_type=1, pages=2, words_per_page=40, types=(".pdf",))[".pdf"][0]
+    monkeypatch.setattr("utils.parse_cache._cache", ParsedDocumentCache(tmp_path / "cache"))
+    monkeypatch.setattr(ingestion, "ModelLoader", StubModelLoader)
+    monkeypatch.setattr(api, "FAISS_BASE", str(tmp_path / "faiss"))
+    monkeypatch.setattr(api, "UPLOAD_BASE", str(tmp_path / "uploads"))
+    client = TestClient(api.app)
+
+    files = [("files", ("scan", pdf.read_bytes(), "application/octet-stream")),
+             ("files", ("blob.bin", bytes(range(256)), "application/octet-stream"))]
+    response = client.post("/chat/index", data={"session_id": "sniffed", "chunk_mode": "char"}, files=files)
+    assert response.status_code == 200, response.text
+    assert response.json()["chunking"]["documents"] == 2  # both pages of the PDF; the binary blob is skipped
+    assert client.get("/chat/documents", params={"session_id": "sniffed"}).json()["documents"] == {"scan": 2}
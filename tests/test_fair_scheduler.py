@@ -0,0 +1,207 @@
+# tests/test_fair_scheduler.py
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+import utils.config_loader as config_loader
+from benchmarks.fakes import HashingEmbeddings, StubModelLoader
+from utils.config_loader import (AdmissionSettings, ChunkingSettings, DedupSettings, FairShareSettings,
+                                 get_settings)
+from utils.fair_scheduler import (BULK, INTERACTIVE, TENANT_HEADER, FairScheduler, TenantMiddleware, fair_slot,
+                                  get_scheduler, work_scope)
+from utils.metrics import FAIR_QUEUE_DEPTH, FAIR_WAIT_SECONDS
+
+
+def _run_queued(scheduler, requests):
+    """Hold the only slot, queue ``requests`` (tenant, priority, cost) in order, then record grant order."""
+    order, threads = [], []
+    scheduler.acquire("holder", BULK, 1)
+
+    def worker(tenant, priority, cost, label):
+        scheduler.acquire(tenant, priority, cost)
+        order.append(label)
+        scheduler.release()
+
+    for label, (tenant, priority, cost) in enumerate(requests):
+        t = threading.Thread(target=worker, args=(tenant, priority, cost, label))
+        t.start()
+        threads.append(t)
+        while scheduler.depth() < label + 1:
+            time.sleep(0.001)
+    scheduler.release()
+    for t in threads:
+        t.join(5)
+    return order
+
+
+def test_tenants_interleave_and_interactive_goes_first():
+    scheduler = FairScheduler("test", capacity=1, quantum=10, weights={INTERACTIVE: 8, BULK: 1})
+    order = _run_queued(scheduler, [("a", BULK, 10)] * 3 + [("b", BULK, 10)] * 2 + [("c", INTERACTIVE, 10)] * 2)
+    # a's first batch was already at the head of the round; then b, c (both of its queries), a, b, a
+    assert order == [0, 3, 5, 6, 1, 4, 2]
+    assert scheduler.depth() == 0 and scheduler._running == 0
+
+
+def test_queue_depth_and_wait_metrics():
+    scheduler = FairScheduler("metrics_test", capacity=1, quantum=1, weights={INTERACTIVE: 1, BULK: 1})
+    waits = FAIR_WAIT_SECONDS.labels("metrics_test", BULK)
+    before = waits._sum.get()
+    scheduler.acquire("a", BULK, 1)
+    t = threading.Thread(target=lambda: (scheduler.acquire("b", BULK, 1), scheduler.release()))
+    t.start()
+    while scheduler.depth(BULK) < 1:
+        time.sleep(0.001)
+    assert FAIR_QUEUE_DEPTH.labels("metrics_test", BULK)._value.get() == 1
+    time.sleep(0.05)
+    scheduler.release()
+    t.join(5)
+    assert FAIR_QUEUE_DEPTH.labels("metrics_test", BULK)._value.get() == 0
+    assert waits._sum.get() - before >= 0.05
+
+
+def test_scope_header_and_disabled(monkeypatch):
+    seen = []
+
+    class Recorder(FairScheduler):
+        def acquire(self, tenant, priority, cost):
+            seen.append((tenant, priority, cost))
+            super().acquire(tenant, priority, cost)
+
+    monkeypatch.setattr("utils.fair_scheduler._schedulers", {"llm": Recorder("llm", 1, 1, {INTERACTIVE: 1, BULK: 1})})
+    monkeypatch.setattr("utils.fair_scheduler._schedulers_settings", get_settings().fair_share)
+    with fair_slot("llm", cost=5):
+        pass
+    with work_scope(BULK, "session-1"), fair_slot("llm", priority=INTERACTIVE):
+        pass
+
+    async def app(scope, receive, send):
+        with work_scope(INTERACTIVE, "session-2"), fair_slot("llm", cost=2):
+            pass
+
+    asyncio.run(TenantMiddleware(app)({"type": "http", "headers": [(b"x-tenant-id", b"acme")]}, None, None))
+    assert seen == [("anonymous", INTERACTIVE, 5), ("session-1", BULK, 1.0), ("acme", INTERACTIVE, 2)]
+
+    disabled = get_settings().model_copy(update={"fair_share": FairShareSettings(enabled=False)})
+    monkeypatch.setattr(config_loader, "_settings", disabled)
+    assert get_scheduler("llm") is None
+    with fair_slot("llm", cost=1):
+        pass
+    assert len(seen) == 3
+
+
+class SlowEmbeddings(HashingEmbeddings):
+    """Embedding batches take a while, like a CPU-bound model would (the GIL is released while sleeping)."""
+
+    batches = 0
+
+    def embed_documents(self, texts):
+        SlowEmbeddings.batches += 1
+        time.sleep(0.02)
+        return super().embed_documents(texts)
+
+
+class SlowLoader(StubModelLoader):
+    def __init__(self):
+        super().__init__(dim=64)
+        self._embeddings = SlowEmbeddings(64)
+
+
+def test_query_is_answered_while_a_bulk_index_runs(tmp_path, monkeypatch):
+    import api.main as api
+    import src.document_chat.retrieval as retrieval
+    import src.document_ingestion.data_ingestion as ingestion
+
+    settings = get_settings().model_copy(update={
+        "fair_share": FairShareSettings(embedding_batch=2, embedding_quantum=2),
+        "chunking": ChunkingSettings(mode="char", report_char_stats=False),
+        "dedup": DedupSettings(enabled=False),
+        "admission": AdmissionSettings(enabled=False),
+    })
+    monkeypatch.setattr(config_loader, "_settings", settings)
+    monkeypatch.setattr(ingestion, "ModelLoader", SlowLoader)
+    monkeypatch.setattr(retrieval, "ModelLoader", SlowLoader)
+    monkeypatch.setattr(api, "FAISS_BASE", str(tmp_path / "faiss"))
+    monkeypatch.setattr(api, "UPLOAD_BASE", str(tmp_path / "uploads"))
+
+    small = "Rent is due on the first day of each month."
+    large = "\n\n".join(f"Clause {i}: the tenant keeps unit {i} clean and quiet." for i in range(120))
+    finished = []
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://test") as client:
+            async def post(label, url, **kwargs):
+                response = await client.post(url, **kwargs)
+                assert response.status_code == 200, response.text
+                finished.append(label)
+
+            await post("setup", "/chat/index", data={"session_id": "reader", "chunk_size": "200", "chunk_overlap": "0"},
+                       files=[("files", ("lease.txt", small.encode(), "text/plain"))])
+            index = asyncio.create_task(post("index", "/chat/index", headers={TENANT_HEADER: "bulk-tenant"},
+                                             data={"session_id": "writer", "chunk_size": "60", "chunk_overlap": "0"},
+                                             files=[("files", ("rules.txt", large.encode(), "text/plain"))]))
+            started = SlowEmbeddings.batches
+            while SlowEmbeddings.batches < started + 2:
+                await asyncio.sleep(0.005)  # the index is embedding its batches now
+            health = await client.get("/health")
+            finished.append("health")
+            assert health.status_code == 200
+            await post("query", "/chat/query",
+                       data={"question": "when is rent due", "session_id": "reader", "use_memory": "false"})
+            await index
+
+    asyncio.run(scenario())
+    assert finished == ["setup", "health", "query", "index"]
+
+
+class SlowIndex:
+    """Stands in for FaissManager/ChatIngestor, whose constructors load the embedding model."""
+
+    def __init__(self, *args, temp_dir=None, **kwargs):
+        time.sleep(0.3)
+        self.temp_dir, self.session_id = temp_dir, "s1"
+
+    def documents(self):
+        return {"lease.pdf": 1}
+
+    def delete_document(self, name):
+        from src.document_ingestion.data_ingestion import IndexUpdate
+        return IndexUpdate(removed=1)
+
+    def import_embeddings(self, embeddings_path, chunks_path):
+        return {"imported": 1}
+
+
+@pytest.mark.parametrize("method, url, kwargs", [
+    ("get", "/chat/documents", {"params": {"session_id": "s1"}}),
+    ("post", "/chat/documents/delete", {"data": {"document": "lease.pdf", "session_id": "s1"}}),
+    ("post", "/chat/import", {"data": {"use_session_dirs": "false"},
+                              "files": [("embeddings", ("e.npy", b"\x93NUMPY", "application/octet-stream")),
+                                        ("chunks", ("c.jsonl", b"{}", "application/json"))]}),
+])
+def test_index_endpoints_do_not_block_the_event_loop(tmp_path, monkeypatch, method, url, kwargs):
+    import api.main as api
+
+    monkeypatch.setattr(config_loader, "_settings",
+                        get_settings().model_copy(update={"admission": AdmissionSettings(enabled=False)}))
+    monkeypatch.setattr(api, "FaissManager", SlowIndex)
+    monkeypatch.setattr(api, "ChatIngestor", lambda **kw: SlowIndex(temp_dir=tmp_path))
+    monkeypatch.setattr(api, "FAISS_BASE", str(tmp_path))
+    (tmp_path / "s1").mkdir()
+    gaps = []
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://test") as client:
+            task = asyncio.create_task(getattr(client, method)(url, **kwargs))
+            last = time.perf_counter()
+            while not task.done():  # how long the event loop goes without running anything else
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+            assert task.result().status_code == 200, task.result().text
+
+    asyncio.run(scenario())
+    assert max(gaps) < 0.2  # the 0.3s constructor ran off the event loop
@@ -0,0 +1,91 @@
+# tests/test_incremental_index.py
+import json
+
+from langchain.schema import Document
+
+from benchmarks.fakes import StubModelLoader
+from src.document_ingestion.data_ingestion import FaissManager
+from utils.index_store import VersionedIndexStore
+
+
+class CountingLoader(StubModelLoader):
+    def __init__(self):
+        super().__init__(dim=32)
+        self.embedded = 0
+        inner = self._embeddings.embed_documents
+
+        def embed_documents(texts):
+            self.embedded += len(texts)
+            return inner(texts)
+
+        self._embeddings.embed_documents = embed_documents
+
+
+def _chunks(document, clauses, saved_as):
+    return [Document(page_content=f"Clause {c}: the tenant pays rent on the first day",
+                     metadata={"document": document, "source": saved_as, "page": i})
+            for i, c in enumerate(clauses)]
+
+
+def test_reupload_only_embeds_changed_chunks_and_deletes_removed_ones(tmp_path):
+    loader = CountingLoader()
+    fm = FaissManager(tmp_path, loader)
+    first = fm.upsert_documents(_chunks("lease.pdf", ["A", "B", "C", "D"], "data/1a2b.pdf")
+                                + _chunks("other.pdf", ["X"], "data/9f9f.pdf"))
+    assert (first.added, first.removed, first.documents) == (5, 0, 2)
+    assert loader.embedded == 5
+
+    # revised upload: C edited into C2, D removed, E added; saved under a new random name
+    revised = FaissManager(tmp_path, loader).upsert_documents(
+        _chunks("lease.pdf", ["A", "B", "C2", "E"], "data/7c7c.pdf"))
+    assert (revised.added, revised.removed, revised.unchanged) == (2, 2, 2)
+    assert loader.embedded == 7
+
+    fm = FaissManager(tmp_path, loader)
+    store = fm.load_or_create()
+    assert store.index.ntotal == len(store.docstore._dict) == 5
+    contents = {d.page_content for d in store.docstore._dict.values()}
+    assert not any(c.startswith(("Clause C:", "Clause D:")) for c in contents)
+    assert fm.documents() == {"lease.pdf": 4, "other.pdf": 1}
+
+    again = FaissManager(tmp_path, loader).upsert_documents(_chunks("lease.pdf", ["A", "B", "C2", "E"], "data/x.pdf"))
+    assert (again.added, again.removed) == (0, 0) and loader.embedded == 7
+    assert again.version == revised.version  # nothing changed: no new version published
+
+
+def test_delete_document_and_compact(tmp_path):
+    loader = CountingLoader()
+    fm = FaissManager(tmp_path, loader)
+    fm.upsert_documents(_chunks("lease.pdf", ["A", "B"], "data/a.pdf") + _chunks("other.pdf", ["X"], "data/b.pdf"))
+
+    update = fm.delete_document("lease.pdf")
+    assert update.removed == 2
+    store = FaissManager(tmp_path, loader).load_or_create()
+    assert store.index.ntotal == 1
+    assert store.similarity_search("tenant pays rent", k=3)[0].metadata["document"] == "other.pdf"
+
+    assert fm.compact() == ["v000001"]
+    assert VersionedIndexStore(tmp_path).versions() == ["v000002"]
+    assert FaissManager(tmp_path, loader).documents() == {"other.pdf": 1}
+
+
+def test_reupload_adopts_chunks_indexed_before_documents_were_tracked(tmp_path):
+    loader = CountingLoader()
+    legacy = _chunks(None, ["A", "B", "C"], "data/1a2b.pdf")
+    FaissManager(tmp_path, loader).load_or_create([d.page_content for d in legacy],
+                                                  [{"source": "data/1a2b.pdf"} for _ in legacy])
+    _, snapshot = VersionedIndexStore(tmp_path).current()
+    meta = json.loads((snapshot / "ingested_meta.json").read_text())
+    meta.pop("documents", None)  # as written before chunks were keyed by document name
+    (snapshot / "ingested_meta.json").write_text(json.dumps(meta))
+    assert loader.embedded == 3
+
+    update = FaissManager(tmp_path, loader).upsert_documents(_chunks("lease.pdf", ["A", "B", "C"], "data/7c7c.pdf"))
+    assert (update.added, update.removed) == (0, 0) and loader.embedded == 3
+    fm = FaissManager(tmp_path, loader)
+    assert fm.documents() == {"lease.pdf": 3}
+    assert fm.load_or_create().index.ntotal == 3
+
+    revised = fm.upsert_documents(_chunks("lease.pdf", ["A", "B2"], "data/x.pdf"))
+    assert (revised.added, revised.removed) == (1, 2) and loader.embedded == 4
+    assert FaissManager(tmp_path, loader).load_or_create().index.ntotal == 2
@@ -0,0 +1,111 @@
+# tests/test_index_store.py
+import fcntl
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.fakes import StubModelLoader
+from src.document_ingestion.data_ingestion import FaissManager
+from utils.index_store import LOCK_FILE, VersionedIndexStore
+
+
+def _docs(prefix, count):
+    return [Document(page_content=f"{prefix} clause {i} about termination and fees",
+                     metadata={"source": f"{prefix}.pdf", "row_id": i}) for i in range(count)]
+
+
+def test_writes_publish_new_versions_and_gc_keeps_recent(tmp_path):
+    store = VersionedIndexStore(tmp_path, keep_versions=2, gc_grace_seconds=0)
+    assert store.current() == (None, None)
+    for n in range(4):
+        with store.writer() as write:
+            (write.path / "index.faiss").write_text(str(n))
+    assert store.current() == ("v000004", tmp_path / ".versions" / "v000004")
+    assert store.versions() == ["v000003", "v000004"]
+
+    with store.writer():
+        pass  # nothing written: nothing published
+    assert store.current()[0] == "v000004"
+
+    try:
+        with store.writer() as write:
+            (write.path / "index.faiss").write_text("partial")
+            raise RuntimeError("crash mid-write")
+    except RuntimeError:
+        pass
+    assert store.current()[0] == "v000004" and store.versions() == ["v000003", "v000004"]
+
+
+def test_superseded_versions_survive_the_grace_period(tmp_path):
+    store = VersionedIndexStore(tmp_path, keep_versions=1, gc_grace_seconds=60)
+    for n in range(3):
+        with store.writer() as write:
+            (write.path / "index.faiss").write_text(str(n))
+    assert store.versions() == ["v000001", "v000002", "v000003"]
+    assert store.collect_garbage(now=time.time() + 120) == ["v000001", "v000002"]
+
+
+def test_legacy_index_is_read_then_superseded(tmp_path):
+    loader = StubModelLoader(dim=32)
+    legacy = FAISS.from_documents(_docs("old", 3), loader.load_embeddings())
+    legacy.save_local(str(tmp_path))
+    assert VersionedIndexStore(tmp_path).current() == ("legacy", tmp_path)
+
+    fm = FaissManager(tmp_path, loader)
+    fm.load_or_create()
+    assert fm.vector_store.index.ntotal == 3
+    assert fm.add_documents(_docs("new", 2)) == 2
+
+    store = VersionedIndexStore(tmp_path, gc_grace_seconds=0)
+    assert store.current()[0] == "v000001"
+    assert store.collect_garbage() == ["legacy"]
+    assert not (tmp_path / "index.faiss").exists()
+    reloaded = FaissManager(tmp_path, loader)
+    assert reloaded.load_or_create().index.ntotal == 5
+
+
+def test_concurrent_writers_do_not_lose_chunks(tmp_path):
+    loader = StubModelLoader(dim=32)
+    FaissManager(tmp_path, loader).load_or_create(texts=["seed chunk"], metadatas=[{"source": "seed.pdf"}])
+
+    def ingest(worker):
+        fm = FaissManager(tmp_path, loader)
+        fm.load_or_create()
+        return fm.add_documents(_docs(f"worker{worker}", 10))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert sum(pool.map(ingest, range(4))) == 40
+
+    final = FaissManager(tmp_path, loader).load_or_create()
+    assert final.index.ntotal == 41 and len(final.docstore._dict) == 41
+    assert not any(name.startswith(".staging-") for name in os.listdir(tmp_path / ".versions"))
+
+
+def test_chunks_lost_to_a_concurrent_delete_are_embedded_outside_the_lock(tmp_path):
+    loader = StubModelLoader(dim=32)
+    docs = [Document(page_content=f"clause {i} of the lease", metadata={"document": "lease.pdf", "source": "a.pdf"})
+            for i in range(3)]
+    FaissManager(tmp_path, loader).upsert_documents(docs[:2])
+
+    fm = FaissManager(tmp_path, loader)
+    pending = fm._pending
+    fm._pending = lambda texts, metadatas: (pending(texts, metadatas),
+                                            FaissManager(tmp_path, loader).delete_document("lease.pdf"))[0]
+    lock_free = []
+    inner = loader._embeddings.embed_documents
+
+    def embed_documents(texts):
+        with open(tmp_path / LOCK_FILE, "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)  # raises if a writer holds the lock
+            fcntl.flock(fh, fcntl.LOCK_UN)
+        lock_free.append(len(texts))
+        return inner(texts)
+
+    loader._embeddings.embed_documents = embed_documents
+    update = fm.upsert_documents(docs)
+    assert lock_free == [1, 2]  # the new chunk, then the two the delete took away
+    assert update.added == 3
+    assert FaissManager(tmp_path, loader).documents() == {"lease.pdf": 3}
@@ -0,0 +1,134 @@
+# tests/test_llm_gateway.py
+# limiter and breaker run on a fake clock; the gateway talks to local stub servers over HTTP
+
+from langchain_groq import ChatGroq
+
+from benchmarks.stub_llm_server import StubLLMServer
+from utils.llm_gateway import CircuitBreaker, LLMGateway, ProviderRoute, RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_reserves_and_refills():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=4, clock=clock)
+
+    assert [bucket.reserve() for _ in range(4)] == [0.0] * 4
+    assert bucket.reserve() == 0.5  # one token short at 2 tokens/s
+    clock.now += 0.5
+    assert bucket.available == 0.0
+    clock.now += 10
+    assert bucket.available == 4  # capped at capacity
+
+
+def test_rate_limiter_waits_for_rpm_tpm_and_retry_after():
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=60, tpm=600, clock=clock, sleep=clock.sleep)
+
+    assert limiter.acquire(tokens=500) == 0.0
+    assert limiter.acquire(tokens=200) == 10.0  # 100 tokens short at 10 tokens/s
+    limiter.pause(30)
+    assert limiter.acquire(tokens=1) == 30.0
+
+
+def test_circuit_breaker_opens_half_opens_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 10
+    assert breaker.allow()  # single half-open probe
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def _route(name, server, breaker=None):
+    factory = lambda: ChatGroq(model="stub", api_key="stub-key", base_url=server.base_url, max_retries=0)
+    return ProviderRoute(name, factory, RateLimiter(), breaker or CircuitBreaker(failure_threshold=3))
+
+
+def test_gateway_fails_over_when_primary_keeps_failing():
+    with StubLLMServer(error_rate=1.0) as broken, StubLLMServer(reply="from secondary") as healthy:
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        gateway = LLMGateway([_route("groq", broken, breaker), _route("google", healthy)],
+                             max_retries=3, backoff_base=0.01)
+
+        assert gateway.invoke("hello").content == "from secondary"
+        assert broken.requests_failed == 2  # breaker opened before retries ran out
+        assert gateway.invoke("again").content == "from secondary"
+        assert broken.requests_failed == 2  # open circuit: primary skipped entirely
+
+
+def test_gateway_honours_retry_after_on_429():
+    with StubLLMServer(reply="ok", rpm_limit=1, rate_window=0.3) as throttled:
+        gateway = LLMGateway([_route("groq", throttled)], max_retries=2, backoff_base=0.01)
+
+        assert gateway.invoke("first").content == "ok"
+        assert gateway.invoke("second").content == "ok"
+        assert throttled.requests_throttled == 1
+        assert throttled.requests_served == 2
+
+
+def test_throttling_does_not_open_the_circuit():
+    with StubLLMServer(error_rate=1.0, error_status=429) as throttled, StubLLMServer(reply="from secondary") as healthy:
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        gateway = LLMGateway([_route("groq", throttled, breaker), _route("google", healthy)],
+                             max_retries=3, backoff_base=0.01)
+
+        assert gateway.invoke("hello").content == "from secondary"
+        assert throttled.requests_failed == 4  # 429s without Retry-After: every retry was spent
+        assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_long_retry_after_fails_over_instead_of_pausing():
+    with StubLLMServer(reply="ok", rpm_limit=1, rate_window=3600) as throttled, \
+            StubLLMServer(reply="from secondary") as healthy:
+        primary = _route("groq", throttled)
+        gateway = LLMGateway([primary, _route("google", healthy)], max_retries=3, backoff_base=0.01, backoff_max=1)
+
+        assert gateway.invoke("first").content == "ok"
+        assert gateway.invoke("second").content == "from secondary"
+        assert throttled.requests_throttled == 1  # no retries against an hour-long Retry-After
+        assert primary.limiter.acquire() == 0.0  # and no pause imposed on other callers
+
+
+def test_reloaded_limits_rebuild_the_shared_guards(monkeypatch):
+    import utils.config_loader as config_loader
+    from utils.config_loader import get_settings
+    from utils.model_loader import ModelLoader
+
+    monkeypatch.setattr("utils.llm_gateway._guards", {})
+
+    def reload(rpm, failure_threshold):
+        settings = get_settings()
+        llm = dict(settings.llm)
+        llm["groq"] = llm["groq"].model_copy(update={"rpm": rpm})
+        gateway = settings.llm_gateway.model_copy(update={"failure_threshold": failure_threshold})
+        monkeypatch.setattr(config_loader, "_settings", settings.model_copy(update={"llm": llm, "llm_gateway": gateway}))
+        return ModelLoader().load_llm("groq").routes[0]
+
+    first = reload(rpm=30, failure_threshold=5)
+    assert reload(rpm=30, failure_threshold=5).breaker is first.breaker  # shared while unchanged
+    faster = reload(rpm=600, failure_threshold=5)
+    assert faster.limiter is not first.limiter and faster.limiter.requests.capacity == 600
+    stricter = reload(rpm=600, failure_threshold=2)
+    assert stricter.breaker is not faster.breaker and stricter.breaker.failure_threshold == 2
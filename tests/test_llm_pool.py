@@ -0,0 +1,50 @@
+# tests/test_llm_pool.py
+# pooled LLM clients are built once per key and share one HTTP pool
+
+import asyncio
+
+from utils.config_loader import LLMPoolSettings
+from utils.llm_pool import LLMClientPool
+
+
+def test_clients_are_reused_per_key():
+    pool = LLMClientPool(LLMPoolSettings(max_connections=2))
+    built = []
+    factory = lambda: built.append(object()) or built[-1]
+
+    first = pool.get_or_create(("groq", "m", 0.0, 10), factory)
+    again = pool.get_or_create(("groq", "m", 0.0, 10), factory)
+    other = pool.get_or_create(("groq", "m", 0.5, 10), factory)
+
+    assert first is again
+    assert other is not first
+    assert pool.stats() == {"clients": 2, "hits": 1, "misses": 2}
+
+
+def test_close_releases_http_clients():
+    pool = LLMClientPool(LLMPoolSettings())
+    sync_client, async_client = pool.http_clients()
+    asyncio.run(pool.aclose())
+    assert sync_client.is_closed and async_client.is_closed
+    assert pool.stats()["clients"] == 0
+
+
+def test_client_options_are_part_of_the_key(monkeypatch):
+    import utils.model_loader as model_loader
+    from utils.config_loader import LLMGatewaySettings, get_settings
+
+    pool = LLMClientPool(LLMPoolSettings())
+    monkeypatch.setattr(model_loader, "get_llm_pool", lambda: pool)
+    monkeypatch.setattr(model_loader.ModelLoader, "_build_llm", lambda self, cfg: object())
+
+    def loader(base_url=None, gateway=True):
+        llm = dict(get_settings().llm)
+        llm["groq"] = llm["groq"].model_copy(update={"base_url": base_url})
+        return model_loader.ModelLoader(get_settings().model_copy(
+            update={"llm": llm, "llm_gateway": LLMGatewaySettings(enabled=gateway)}))
+
+    default = loader().load_client("groq")
+    assert loader().load_client("groq") is default
+    assert loader(base_url="http://proxy.local/v1").load_client("groq") is not default  # reloaded config
+    assert loader(gateway=False).load_client("groq") is not default  # SDK retries differ
+    assert pool.stats()["clients"] == 3
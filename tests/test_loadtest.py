@@ -0,0 +1,38 @@
+# tests/test_loadtest.py
+import json
+
+import pytest
+
+from benchmarks.loadtest import load_mix, percentile, portal_responder, summarize
+from model.models import Metadata
+from src.document_compare.document_comparator import DocumentComparison
+
+
+def test_summary_percentiles_and_error_rates():
+    samples = [("/chat/query", i / 100, 200) for i in range(1, 101)] + [("/compare", 2.0, 500), ("/compare", 1.0, 200)]
+    report = summarize(samples, seconds=10)
+    query = report["/chat/query"]
+    assert (query["p50_ms"], query["p95_ms"], query["p99_ms"]) == (500.0, 950.0, 990.0)
+    assert report["/compare"]["error_rate"] == 0.5 and report["/compare"]["statuses"] == {"500": 1, "200": 1}
+    assert report["all"]["requests"] == 102 and report["all"]["throughput_rps"] == 10.2
+    assert percentile([], 95) == 0.0
+
+
+def test_mix_file_is_validated(tmp_path):
+    mix = tmp_path / "mix.jsonl"
+    mix.write_text('{"endpoint": "/chat/query", "weight": 3, "data": {"k": 4}}\n\n{"endpoint": "/compare"}\n')
+    entries = load_mix(mix)
+    assert [e.endpoint for e in entries] == ["/chat/query", "/compare"] and entries[0].data == {"k": 4}
+    mix.write_text('{"endpoint": "/admin"}\n')
+    with pytest.raises(ValueError):
+        load_mix(mix)
+
+
+def test_stub_replies_parse_for_each_prompt():
+    analysis = portal_responder({"messages": [{"role": "user", "content": "Analyze this document\n..."}]})
+    Metadata.model_validate(json.loads(analysis))
+    comparison = portal_responder({"messages": [{"role": "user", "content": "Compare these documents ..."}]})
+    DocumentComparison.model_validate(json.loads(comparison))
+    rewrite = portal_responder({"messages": [{"role": "system", "content": "rewrite the query as a standalone question"},
+                                             {"role": "user", "content": "and the fees?"}]})
+    assert rewrite == "and the fees?"
@@ -0,0 +1,71 @@
+# tests/test_parse_cache.py
+# a repeat parse of the same bytes is served from the compressed cache
+
+import fitz
+
+from utils.parse_cache import ParsedDocumentCache, extract_pdf_pymupdf
+
+
+def _pdf(path, pages):
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+
+
+def test_same_content_hits_cache(tmp_path):
+    cache = ParsedDocumentCache(tmp_path / "cache")
+    first, second = tmp_path / "a.pdf", tmp_path / "copy_of_a.pdf"
+    _pdf(first, ["alpha page", "beta page"])
+    second.write_bytes(first.read_bytes())
+
+    calls = []
+    def parse(path):
+        calls.append(path)
+        return extract_pdf_pymupdf(path)
+
+    parsed, hit = cache.get_or_parse(first, "pymupdf", parse)
+    again, hit_again = cache.get_or_parse(second, "pymupdf", parse)
+
+    assert (hit, hit_again) == (False, True)
+    assert len(calls) == 1
+    assert again == parsed
+    assert [p["page"] for p in again["pages"]] == [0, 1]
+    assert "beta page" in again["pages"][1]["text"]
+
+
+def test_prune_keeps_cache_under_budget(tmp_path):
+    cache = ParsedDocumentCache(tmp_path / "cache", max_bytes=0)
+    cache.put("ab" * 32, "pymupdf", {"metadata": {}, "pages": [{"page": 0, "text": "x" * 1000}]})
+    assert cache.prune() == 1
+    assert cache.get("ab" * 32, "pymupdf") is None
+
+
+def test_entries_vanishing_under_a_concurrent_prune_are_tolerated(tmp_path, monkeypatch):
+    import pathlib
+
+    import utils.parse_cache as parse_cache
+
+    cache = ParsedDocumentCache(tmp_path / "cache", max_bytes=0)
+    parsed = {"metadata": {}, "pages": [{"page": 0, "text": "x" * 1000}]}
+    cache.put("cd" * 32, "pymupdf", parsed)
+
+    def utime_after_delete(path, *args):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(parse_cache.os, "utime", utime_after_delete)
+    assert cache.get("cd" * 32, "pymupdf") == parsed
+
+    real_glob = pathlib.Path.glob
+    ghost = tmp_path / "cache" / "ef" / ("ef" * 32 + ".pymupdf.json.zst")  # listed, then deleted elsewhere
+    monkeypatch.setattr(pathlib.Path, "glob", lambda self, pattern: [*real_glob(self, pattern), ghost])
+    assert cache.prune() == 1
+
+
+def test_periodic_prune_runs_in_the_background(tmp_path):
+    cache = ParsedDocumentCache(tmp_path / "cache", max_bytes=0, prune_every=2)
+    for digest in ("01" * 32, "02" * 32):
+        cache.put(digest, "pymupdf", {"metadata": {}, "pages": [{"page": 0, "text": "y" * 500}]})
+    cache._prune_thread.join(5)
+    assert not list((tmp_path / "cache").glob("*/*.json.zst"))
@@ -0,0 +1,63 @@
+# tests/test_profiler.py
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import utils.config_loader as config_loader
+from utils.config_loader import ProfilingSettings, get_settings
+from utils.metrics import track_stage
+from utils.profiling import ProfilingMiddleware
+
+
+def _busy_embedding(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(i * i for i in range(500))
+
+
+def _client(monkeypatch, tmp_path, **profiling):
+    cfg = ProfilingSettings(enabled=True, dir=str(tmp_path), interval_ms=2, **profiling)
+    monkeypatch.setattr(config_loader, "_settings", get_settings().model_copy(update={"profiling": cfg}))
+
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.post("/chat/index")
+    async def index():
+        with track_stage("chat_ingestor", "split"):
+            await asyncio.sleep(0.01)
+
+        def embed():
+            with track_stage("faiss_manager", "embed"):
+                _busy_embedding(0.15)
+
+        await asyncio.to_thread(embed)
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_header_triggers_profile_with_stages_and_folded_stacks(monkeypatch, tmp_path):
+    client = _client(monkeypatch, tmp_path)
+    assert "x-profile-id" not in client.post("/chat/index").headers
+
+    response = client.post("/chat/index", headers={"X-Profile": "1"})
+    profile_id = response.headers["x-profile-id"]
+    report = json.loads((tmp_path / f"{profile_id}.json").read_text())
+    assert report["path"] == "/chat/index" and report["status"] == 200
+    assert set(report["stage_totals_ms"]) == {"chat_ingestor/split", "faiss_manager/embed"}
+    assert report["stage_totals_ms"]["faiss_manager/embed"] >= 150
+
+    folded = (tmp_path / f"{profile_id}.folded").read_text().splitlines()
+    assert folded and all(line.rsplit(" ", 1)[1].isdigit() for line in folded)
+    assert any("_busy_embedding (test_profiler.py" in line for line in folded)
+
+
+def test_sampling_rate_and_retention(monkeypatch, tmp_path):
+    client = _client(monkeypatch, tmp_path, sample_rate=1.0, max_profiles=2)
+    ids = [client.post("/chat/index").headers["x-profile-id"] for _ in range(3)]
+    assert sorted(p.stem for p in tmp_path.glob("*.json")) == sorted(ids[1:])
+    assert not (tmp_path / f"{ids[0]}.folded").exists()
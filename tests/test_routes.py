@@ -0,0 +1,34 @@
+# tests/test_routes.py
+# route-level checks that do not need model or API keys
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from utils.metrics import track_stage
+
+client = TestClient(app)
+
+
+def test_health():
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+
+
+def test_metrics_exposes_stage_histograms():
+    with track_stage("test_component", "parse"):
+        pass
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'docportal_stage_seconds_count{component="test_component",stage="parse"}' in response.text
+
+
+def test_chat_query_rejects_k_zero(tmp_path, monkeypatch):
+    import api.main as api
+
+    monkeypatch.setattr(api, "FAISS_BASE", str(tmp_path))
+    (tmp_path / "s1").mkdir()
+    response = client.post("/chat/query", data={"question": "when is rent due", "session_id": "s1", "k": "0"})
+    assert response.status_code == 400
+    assert "k must be at least 1" in response.json()["detail"]
@@ -0,0 +1,60 @@
+# tests/test_section_alignment.py
+import json
+
+import numpy as np
+
+from benchmarks.fakes import StubModelLoader, stub_llm
+from src.document_compare.document_comparator import DocumentComparatorLLM
+from src.document_compare.section_alignment import align_sections, cosine_matrix, segment_sections
+
+BODY = {
+    "PAYMENT TERMS": "Invoices are payable within thirty days of receipt by wire transfer to the supplier account. ",
+    "CONFIDENTIALITY": "Each party keeps the other party's confidential information secret and uses it only for this agreement. ",
+    "TERMINATION": "Either party may terminate this agreement with ninety days written notice to the other party. ",
+}
+
+
+def _pages(order, extra=None):
+    text = "\n".join(f"{title}\n{BODY[title] * 6}" for title in order)
+    if extra:
+        text += f"\n{extra}\n" + "Sub-processors must be approved in writing before any personal data is shared. " * 6
+    return [{"page": 0, "text": text}]
+
+
+def test_segment_sections_splits_at_headings_and_bounds_length():
+    sections = segment_sections("a.pdf", _pages(list(BODY)), min_chars=100, max_chars=6000)
+    assert [s.title for s in sections] == list(BODY)
+
+    small = segment_sections("a.pdf", _pages(list(BODY)), min_chars=100, max_chars=300)
+    assert len(small) > 3 and all(len(s.text) <= 300 for s in small)
+
+
+def test_alignment_matches_reordered_sections_and_reports_unmatched():
+    embedder = StubModelLoader().load_embeddings()
+    ref = segment_sections("ref.pdf", _pages(list(BODY)), min_chars=100)
+    act = segment_sections("act.pdf", _pages(["TERMINATION", "PAYMENT TERMS", "CONFIDENTIALITY"], extra="DATA PROTECTION"),
+                           min_chars=100)
+    sim = cosine_matrix(np.array(embedder.embed_documents([s.text for s in ref])),
+                        np.array(embedder.embed_documents([s.text for s in act])))
+    assert sim.shape == (3, 4)
+
+    pairs = align_sections(ref, act, sim, threshold=0.5)
+    matched = {p.reference.title: p.actual.title for p in pairs if p.reference and p.actual}
+    assert matched == {t: t for t in BODY}
+    assert [p.actual.title for p in pairs if p.reference is None] == ["DATA PROTECTION"]
+
+
+def test_compare_sections_merges_pair_results_into_rows():
+    reply = json.dumps({"title": "t", "similarities": ["same clause"], "differences": [], "document1_summary": ["s1"],
+                        "document2_summary": ["s2"], "unique_information": {}})
+    comparator = DocumentComparatorLLM(llm=stub_llm([reply]), model_loader=StubModelLoader())
+    ref = segment_sections("ref.pdf", _pages(list(BODY)), min_chars=100)
+    act = segment_sections("act.pdf", _pages(list(BODY), extra="DATA PROTECTION"), min_chars=100)
+
+    df = comparator.compare_sections(ref, act)
+
+    rows = df.to_dict(orient="records")
+    assert sum(r["Category"] == "Similarities" for r in rows) == 3
+    assert {"Category": "Similarities", "Description": "[TERMINATION] same clause"} in rows
+    unique = [r["Description"] for r in rows if r["Category"] == "Unique to act.pdf"]
+    assert len(unique) == 1 and unique[0].startswith("Section DATA PROTECTION")
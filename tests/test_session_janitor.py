@@ -0,0 +1,73 @@
+# tests/test_session_janitor.py
+# TTL / quota eviction in LRU order, never touching leased sessions
+
+import os
+import threading
+import time
+
+from utils.session_janitor import SessionJanitor, session_lease, touch_session
+
+
+def _session(root, name, size, age):
+    d = root / name
+    d.mkdir(parents=True)
+    (d / "blob.bin").write_bytes(b"x" * size)
+    touch_session(d)
+    past = time.time() - age
+    os.utime(d / ".last_access", (past, past))
+    os.utime(d, (past, past))
+    return d
+
+
+def test_ttl_then_quota_in_lru_order(tmp_path):
+    data, faiss = tmp_path / "data", tmp_path / "faiss_index"
+    _session(data, "old", 100, age=10_000)
+    _session(faiss, "old", 100, age=10_000)
+    _session(data, "mid", 300, age=500)
+    _session(data, "new", 300, age=10)
+
+    janitor = SessionJanitor([data, faiss], ttl_seconds=3600, max_total_bytes=400)
+    report = janitor.sweep()
+
+    assert report.expired == ["old"]
+    assert report.over_quota == ["mid"]
+    assert not (data / "old").exists() and not (faiss / "old").exists()
+    assert (data / "new").exists()
+
+
+def test_leased_session_is_never_evicted(tmp_path):
+    d = _session(tmp_path / "faiss_index", "busy", 10, age=10_000)
+    janitor = SessionJanitor([tmp_path / "faiss_index"], ttl_seconds=1, max_total_bytes=0)
+    with session_lease(d):
+        os.utime(d / ".last_access", (0, 0))
+        os.utime(d, (0, 0))
+        report = janitor.sweep()
+    assert report.skipped_in_use == ["busy"]
+    assert d.exists()
+
+
+def test_lease_taken_during_eviction_is_not_lost(tmp_path, monkeypatch):
+    import utils.session_janitor as session_janitor
+
+    d = _session(tmp_path / "faiss_index", "racy", 10, age=10_000)
+    janitor = SessionJanitor([tmp_path / "faiss_index"], ttl_seconds=1)
+    check = session_janitor.is_in_use
+    writer, calls = [], []
+
+    def write_index():
+        with session_lease(d):
+            (d / "index.faiss").write_bytes(b"new index")
+
+    def is_in_use(path):
+        # an upload leases the session between _evict's in-use re-check and its rename
+        calls.append(path)
+        if len(calls) == 2:
+            writer.append(threading.Thread(target=write_index))
+            writer[0].start()
+            writer[0].join(0.2)
+        return check(path)
+
+    monkeypatch.setattr(session_janitor, "is_in_use", is_in_use)
+    assert janitor.sweep().expired == ["racy"]
+    writer[0].join(5)
+    assert (d / "index.faiss").read_bytes() == b"new index"  # landed in the recreated session, not the trash
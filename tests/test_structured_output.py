@@ -0,0 +1,69 @@
+# tests/test_structured_output.py
+import json
+
+import pytest
+from langchain.output_parsers import OutputFixingParser
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import JsonOutputParser
+
+from benchmarks.fakes import StubModelLoader, stub_llm
+from model.models import Metadata
+from src.document_compare.document_comparator import DocumentComparatorLLM, DocumentComparison
+from utils.metrics import STRUCTURED_OUTPUT
+from utils.structured_output import JsonRepairError, LocalRepairOutputParser, parse_json
+
+COMPARISON = {"title": "Lease v1 vs v2", "similarities": ["Both run 12 months"], "differences": ["Rent rose"],
+              "document1_summary": ["v1"], "document2_summary": ["v2"], "unique_information": {"v2": ["Pet clause"]}}
+
+
+def _count(component, outcome):
+    return STRUCTURED_OUTPUT.labels(component, outcome)._value.get()
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ('```json\n{"a": 1, "b": [1, 2,],}\n```', {"a": 1, "b": [1, 2]}),
+    ("Here is the result: {'a': 'it\\'s', b: True, c: None}. Let me know!", {"a": "it's", "b": True, "c": None}),
+    ('{"a": "x" "b": 2}', {"a": "x", "b": 2}),
+    ('{"a": "line one\nline two", // note\n "b": .5}', {"a": "line one\nline two", "b": 0.5}),
+    ('{"a": ["x", "y"], "b": {"c": "trunc', {"a": ["x", "y"], "b": {"c": "trunc"}}),
+    ("{a: True, b: 3.}", {"a": True, "b": 3.0}),
+    ('{"x": 1e}', {"x": 1}),
+    ('{"x": 2.5e-3, "y": -.5, "z": 1E+, "w": 007}', {"x": 0.0025, "y": -0.5, "z": 1, "w": 7}),
+])
+def test_repairs_common_llm_json_mistakes(reply, expected):
+    assert parse_json(reply) == (expected, True)
+
+
+def test_clean_json_is_not_marked_repaired_and_prose_is_rejected():
+    assert parse_json('{"a": 1}') == ({"a": 1}, False)
+    with pytest.raises(JsonRepairError):
+        parse_json("I could not find any metadata in this document.")
+
+
+def test_coerces_key_case_and_scalar_list_shapes():
+    reply = ('```\n{"summary": "One point", "title": "Lease", "author": ["A", "B"], "date_created": 2021, '
+             '"LastModifiedDate": "2022", "Publisher": "P", "Language": "en", "PageCount": 3, '
+             '"SentTimeTone": "neutral"}\n```')
+    result = LocalRepairOutputParser(pydantic_object=Metadata, component="test_structured").parse(reply)
+    assert result["Summary"] == ["One point"] and result["Author"] == "A; B"
+    assert result["DateCreated"] == "2021" and result["Pagecount"] == 3
+
+
+def test_comparator_repairs_locally_and_counts_llm_fallbacks():
+    fenced = "```json\n" + json.dumps(COMPARISON)[:-1] + ",}\n```"
+    comparator = DocumentComparatorLLM(llm=stub_llm([fenced]), model_loader=StubModelLoader())
+    before = _count("document_comparator_llm", "repaired")
+    rows = comparator.compare_documents("ref + act").to_dict(orient="records")
+    assert {"Category": "Differences", "Description": "Rent rose"} in rows
+    assert _count("document_comparator_llm", "repaired") == before + 1
+
+    # unrecoverable reply: the LLM fixer is called once and its answer is parsed
+    fixer = OutputFixingParser.from_llm(parser=JsonOutputParser(), llm=stub_llm([json.dumps(COMPARISON)]))
+    parser = LocalRepairOutputParser(pydantic_object=DocumentComparison, as_dict=False, fallback=fixer,
+                                     component="test_structured")
+    before = _count("test_structured", "llm_fallback")
+    assert parser.parse("Sorry, I cannot compare these.") == DocumentComparison(**COMPARISON)
+    assert _count("test_structured", "llm_fallback") == before + 1
+
+    with pytest.raises(OutputParserException):
+        LocalRepairOutputParser(pydantic_object=DocumentComparison, as_dict=False).parse('{"title": "only"}')
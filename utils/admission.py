@@ -0,0 +1,245 @@
+"""Memory-aware admission control for upload endpoints.
+
+Each upload request gets a memory estimate from its file sizes and PDF page counts
+(:func:`estimate_cost`) and must reserve it from the worker's budget before any parsing
+starts. A request is admitted when
+
+    max(current RSS, idle RSS + outstanding reservations) + cost <= budget
+
+so memory already allocated by admitted requests is not counted twice. Otherwise it waits
+in a FIFO queue until enough memory is released, and is rejected with 503 if the queue is
+full or ``queue_timeout_seconds`` passes. A request that could never fit gets 413.
+
+The budget is per worker process (``admission.budget_mb``). If it is not set, it is
+derived from the container's cgroup memory limit, split over ``admission.workers``.
+Without a limit, requests are only measured, never queued. Tune ``base_mb`` /
+``per_page_kb`` / ``upload_multiplier`` from the ``docportal_stage_peak_bytes`` histogram,
+which ``track_stage`` fills when ``admission.trace_stages`` turns on tracemalloc.
+"""
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Callable, Deque, Iterable, Optional
+
+import fitz
+
+from logger.custom_logger import CustomLogger
+from utils.config_loader import AdmissionSettings, get_settings
+from utils.metrics import record_admission, set_admission_state, track_stage
+
+log = CustomLogger().get_logger(__file__)
+
+MB = 1024 * 1024
+_CGROUP_LIMITS = ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes")
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process (``/proc/self/statm``; peak RSS where there is no procfs)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def cgroup_memory_limit() -> Optional[int]:
+    for path in _CGROUP_LIMITS:
+        try:
+            raw = Path(path).read_text().strip()
+        except OSError:
+            continue
+        if raw.isdigit() and int(raw) < 1 << 60:  # "max" or a huge sentinel means unlimited
+            return int(raw)
+    return None
+
+
+def upload_size(fileobj: BinaryIO) -> int:
+    pos = fileobj.tell()
+    try:
+        return fileobj.seek(0, os.SEEK_END)
+    finally:
+        fileobj.seek(pos)
+
+
+def pdf_page_count(fileobj: BinaryIO) -> Optional[int]:
+    """Page count from the PDF's page tree without extracting anything; None if it does not open."""
+    pos = fileobj.tell()
+    try:
+        # spooled uploads larger than 1 MB are already on disk: open by name instead of reading them
+        name = getattr(getattr(fileobj, "_file", fileobj), "name", None)
+        if isinstance(name, str) and os.path.isfile(name):
+            doc = fitz.open(name)
+        else:
+            fileobj.seek(0)
+            doc = fitz.open(stream=fileobj.read(), filetype="pdf")
+        with doc:
+            return doc.page_count
+    except Exception:
+        return None
+    finally:
+        fileobj.seek(pos)
+
+
+@dataclass(frozen=True)
+class UploadCost:
+    bytes: int
+    upload_bytes: int
+    pages: int
+
+
+def estimate_cost(uploads: Iterable[tuple], cfg: Optional[AdmissionSettings] = None) -> UploadCost:
+    """Estimate peak memory for processing ``(filename, fileobj)`` uploads.
+
+    Every upload costs ``upload_multiplier`` times its size (raw bytes, extracted text, chunk
+    copies); PDFs also cost ``per_page_kb`` per page (PyMuPDF page objects, per-page
+    Documents, embeddings). Unreadable PDFs are charged at one page per 50 KB.
+    """
+    cfg = cfg or get_settings().admission
+    size_total = pages_total = 0
+    for filename, fileobj in uploads:
+        size = upload_size(fileobj)
+        size_total += size
+        if Path(filename or "").suffix.lower() == ".pdf":
+            pages = pdf_page_count(fileobj)
+            pages_total += pages if pages is not None else max(1, size // (50 * 1024))
+    cost = cfg.base_mb * MB + cfg.upload_multiplier * size_total + pages_total * cfg.per_page_kb * 1024
+    return UploadCost(bytes=int(cost), upload_bytes=size_total, pages=pages_total)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, status_code: int = 503, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Reservation:
+    def __init__(self, controller: "AdmissionController", cost: int, endpoint: str):
+        self.controller = controller
+        self.cost = cost
+        self.endpoint = endpoint
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """Per-process memory budget shared by all upload requests (see the module docstring)."""
+
+    def __init__(self, budget_bytes: Optional[int], max_queue: int = 32, queue_timeout: float = 30.0,
+                 poll_interval: float = 0.05, rss: Callable[[], int] = current_rss_bytes):
+        self.budget = budget_bytes
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.poll_interval = poll_interval
+        self.rss = rss
+        self.reserved = 0
+        self.idle_rss = rss()
+        self._waiting: Deque[int] = deque()
+        self._tickets = itertools.count()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, cfg: Optional[AdmissionSettings] = None) -> "AdmissionController":
+        cfg = cfg or get_settings().admission
+        budget = int(cfg.budget_mb * MB) if cfg.budget_mb else None
+        if budget is None and cfg.enabled:
+            limit = cgroup_memory_limit()
+            budget = int(limit * cfg.budget_fraction / max(1, cfg.workers)) if limit else None
+        return cls(budget if cfg.enabled else None, cfg.max_queue, cfg.queue_timeout_seconds)
+
+    def _projected(self, cost: int) -> int:
+        return max(self.rss(), self.idle_rss + self.reserved) + cost
+
+    def _try_reserve(self, ticket: int, cost: int) -> bool:
+        with self._lock:
+            if self.reserved == 0:
+                self.idle_rss = self.rss()
+            # alone against an idle worker it still would not fit: nothing to wait for
+            if self.budget is not None and self.idle_rss + cost > self.budget:
+                raise AdmissionRejected(
+                    f"Request needs ~{cost // MB} MB but the worker budget is {self.budget // MB} MB",
+                    status_code=413)
+            if self._waiting and self._waiting[0] != ticket:
+                return False
+            if self.budget is not None and self._projected(cost) > self.budget:
+                return False
+            self.reserved += cost
+            if self._waiting and self._waiting[0] == ticket:
+                self._waiting.popleft()
+            set_admission_state(self.reserved, len(self._waiting))
+            return True
+
+    def _release(self, reservation: Reservation) -> None:
+        with self._lock:
+            self.reserved -= reservation.cost
+            set_admission_state(self.reserved, len(self._waiting))
+
+    async def acquire(self, cost: int, endpoint: str) -> Reservation:
+        ticket = next(self._tickets)
+        try:
+            if self._try_reserve(ticket, cost):
+                record_admission(endpoint, "admitted")
+                return Reservation(self, cost, endpoint)
+        except AdmissionRejected:
+            record_admission(endpoint, "too_large")
+            raise
+        with self._lock:
+            if len(self._waiting) >= self.max_queue:
+                record_admission(endpoint, "rejected")
+                raise AdmissionRejected("Server is at its memory budget, retry later", retry_after=self.queue_timeout)
+            self._waiting.append(ticket)
+            set_admission_state(self.reserved, len(self._waiting))
+        record_admission(endpoint, "queued")
+        log.info("Request queued for memory", endpoint=endpoint, cost_mb=round(cost / MB, 1),
+                 reserved_mb=round(self.reserved / MB, 1), rss_mb=round(self.rss() / MB, 1))
+        deadline = time.monotonic() + self.queue_timeout
+        try:
+            with track_stage("admission", "wait"):
+                while not self._try_reserve(ticket, cost):
+                    if time.monotonic() >= deadline:
+                        record_admission(endpoint, "timed_out")
+                        raise AdmissionRejected("Timed out waiting for memory, retry later",
+                                                retry_after=self.queue_timeout)
+                    await asyncio.sleep(self.poll_interval)
+        except BaseException:
+            with self._lock:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                set_admission_state(self.reserved, len(self._waiting))
+            raise
+        record_admission(endpoint, "admitted")
+        return Reservation(self, cost, endpoint)
+
+    @asynccontextmanager
+    async def admit(self, cost: int, endpoint: str) -> AsyncIterator[Reservation]:
+        reservation = await self.acquire(cost, endpoint)
+        try:
+            yield reservation
+        finally:
+            reservation.release()
+
+
+_controller: Optional[AdmissionController] = None
+_controller_settings: Optional[AdmissionSettings] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Process-wide controller, rebuilt when the ``admission`` settings change."""
+    global _controller, _controller_settings
+    cfg = get_settings().admission
+    with _controller_lock:
+        if _controller is None or cfg != _controller_settings:
+            _controller, _controller_settings = AdmissionController.from_settings(cfg), cfg
+        return _controller
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__file__)
+
+_SENTENCE_END = (".", "!", "?", "\n", ";", ":")
+
+_tokenizers: Dict[str, Any] = {}
+_tokenizer_failures: Dict[str, Tuple[float, str]] = {}
+_tokenizer_lock = threading.Lock()
+_RETRY_FAILED_AFTER = 300.0  # seconds before retrying a tokenizer that failed to load
+_NO_TOKENIZER_LIMIT = 1_000_000  # tokenizers without a limit report a huge sentinel instead
+_FALLBACK_MAX_SEQ_LENGTH = 512  # BERT-family position limit, when nothing else is known
+
+
+def get_tokenizer(model_name: str):
+    """Load (once per process) the fast tokenizer that matches the embedding model."""
+    tok = _tokenizers.get(model_name)
+    if tok is None:
+        with _tokenizer_lock:
+            tok = _tokenizers.get(model_name)
+            failed = _tokenizer_failures.get(model_name)
+            if tok is None and failed and time.monotonic() - failed[0] < _RETRY_FAILED_AFTER:
+                raise RuntimeError(f"Tokenizer for {model_name} failed to load recently: {failed[1]}")
+            if tok is None:
+                from transformers import AutoTokenizer
+
+                try:
+                    tok = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+                except Exception as e:
+                    _tokenizer_failures[model_name] = (time.monotonic(), str(e))
+                    raise
+                _tokenizer_failures.pop(model_name, None)
+                if not tok.is_fast:
+                    log.warning("Tokenizer is not a fast tokenizer; chunking will be slower", model=model_name)
+                _tokenizers[model_name] = tok
+    return tok
+
+
+def model_max_seq_length(embeddings: Any, tokenizer: Any, configured: Optional[int] = None) -> int:
+    """Tokens the embedding model keeps before truncating input.
+
+    The loaded SentenceTransformer's ``max_seq_length`` is authoritative: the tokenizer's
+    ``model_max_length`` can be larger (512 vs 256 for all-MiniLM-L6-v2) or a sentinel.
+    A ``configured`` value can only lower it.
+    """
+    limits = [int(v) for v in (configured, getattr(getattr(embeddings, "_client", None), "max_seq_length", None)) if v]
+    if not limits:
+        limit = getattr(tokenizer, "model_max_length", None) or _NO_TOKENIZER_LIMIT
+        limits = [limit if limit < _NO_TOKENIZER_LIMIT else _FALLBACK_MAX_SEQ_LENGTH]
+    return min(limits)
+
+
+@dataclass
+class ChunkingStats:
+    mode: str
+    documents: int = 0
+    chunks: int = 0
+    max_seq_length: int = 0
+    doc_tokens: int = 0
+    chunk_tokens: int = 0
+    max_chunk_tokens: int = 0
+    truncated_chunks: int = 0
+    truncated_tokens: int = 0
+
+    @property
+    def overlap_tokens(self) -> int:
+        """Tokens embedded more than once because of chunk overlap."""
+        return max(0, self.chunk_tokens - self.doc_tokens)
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["overlap_tokens"] = self.overlap_tokens
+        data["overlap_ratio"] = round(self.overlap_tokens / self.chunk_tokens, 4) if self.chunk_tokens else 0.0
+        data["mean_chunk_tokens"] = round(self.chunk_tokens / self.chunks, 1) if self.chunks else 0.0
+        return data
+
+
+class TokenAwareSplitter:
+    """Split documents into windows sized by the embedding model's own tokenizer.
+
+    Every chunk fits in ``max_seq_length`` minus the special tokens the model adds, so
+    nothing is silently truncated at embedding time. All documents are tokenized in one
+    batched call; chunk boundaries snap back to the nearest sentence end when one is close.
+    """
+
+    def __init__(self, tokenizer, max_seq_length: int, chunk_tokens: Optional[int] = None,
+                 overlap_tokens: int = 32, batch_size: int = 256):
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        budget = max_seq_length - tokenizer.num_special_tokens_to_add(pair=False)
+        self.chunk_tokens = min(chunk_tokens or budget, budget)
+        if overlap_tokens >= self.chunk_tokens:
+            raise ValueError(f"overlap_tokens ({overlap_tokens}) must be smaller than chunk size ({self.chunk_tokens})")
+        self.overlap_tokens = overlap_tokens
+        self.batch_size = batch_size
+
+    def _encode(self, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        offsets: List[List[Tuple[int, int]]] = []
+        for i in range(0, len(texts), self.batch_size):
+            enc = self.tokenizer(texts[i:i + self.batch_size], add_special_tokens=False,
+                                 return_offsets_mapping=True, return_attention_mask=False, verbose=False)
+            offsets.extend(enc["offset_mapping"])
+        return offsets
+
+    def _windows(self, text: str, offsets: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Token index ranges [start, end) for one document."""
+        n = len(offsets)
+        windows, start = [], 0
+        lookback = max(1, self.chunk_tokens // 4)
+        while start < n:
+            end = min(start + self.chunk_tokens, n)
+            if end < n:
+                for cut in range(end, end - lookback, -1):
+                    if text[offsets[cut - 1][1] - 1:offsets[cut - 1][1]] in _SENTENCE_END:
+                        end = cut
+                        break
+            windows.append((start, end))
+            if end >= n:
+                break
+            start = max(end - self.overlap_tokens, start + 1)
+        return windows
+
+    def split_documents(self, docs: List[Document]) -> Tuple[List[Document], ChunkingStats]:
+        stats = ChunkingStats(mode="token", documents=len(docs), max_seq_length=self.max_seq_length)
+        texts = [d.page_content for d in docs]
+        chunks: List[Document] = []
+        for doc, text, offsets in zip(docs, texts, self._encode(texts)):
+            stats.doc_tokens += len(offsets)
+            for start, end in self._windows(text, offsets):
+                char_start, char_end = offsets[start][0], offsets[end - 1][1]
+                count = end - start
+                stats.chunk_tokens += count
+                stats.max_chunk_tokens = max(stats.max_chunk_tokens, count)
+                metadata = dict(doc.metadata or {})
+                metadata.update(start_index=char_start, token_count=count)
+                chunks.append(Document(page_content=text[char_start:char_end], metadata=metadata))
+        stats.chunks = len(chunks)
+        return chunks, stats
+
+    def measure(self, docs: List[Document], chunks: List[Document], mode: str) -> ChunkingStats:
+        """Truncation/overlap statistics for chunks produced by any splitter."""
+        stats = ChunkingStats(mode=mode, documents=len(docs), chunks=len(chunks), max_seq_length=self.max_seq_length)
+        stats.doc_tokens = sum(len(o) for o in self._encode([d.page_content for d in docs]))
+        budget = self.max_seq_length - self.tokenizer.num_special_tokens_to_add(pair=False)
+        for offsets in self._encode([c.page_content for c in chunks]):
+            count = len(offsets)
+            stats.chunk_tokens += count
+            stats.max_chunk_tokens = max(stats.max_chunk_tokens, count)
+            if count > budget:
+                stats.truncated_chunks += 1
+                stats.truncated_tokens += count - budget
+        return stats
@@ -1,14 +1,309 @@
-import yaml
+import os
+import threading
 from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import yaml
+from dotenv import load_dotenv
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__file__)
 
 config_path = Path(__file__).resolve().parent.parent / "config" / "config.yaml"
+
+
 def load_config(config_path: str = config_path) -> dict:
+    """Read and parse config.yaml. Prefer get_settings(), which caches the parsed result."""
     with open(config_path, "r") as file:
-        config=yaml.safe_load(file)
-        print("Configuration loaded successfully.")
-        print(config)
+        config = yaml.safe_load(file) or {}
     return config
 
 
-#load_config("config/config.yaml")
\ No newline at end of file
+# ----------------------------- #
+# Typed, immutable settings     #
+# ----------------------------- #
+class _FrozenSettings(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="allow", populate_by_name=True)
+
+
+class FaissDbSettings(_FrozenSettings):
+    collection_name: str = "document_portal"
+
+
+class EmbeddingSettings(_FrozenSettings):
+    provider: str = "sentence-transformers"
+    embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+    max_seq_length: Optional[int] = None  # chunk limit; defaults to (and is capped by) the loaded model's max_seq_length
+    backend: str = "torch"  # "torch", "onnx" or "onnx-int8" (see utils.embedding_backend)
+    threads: Optional[int] = None  # intra-op CPU threads; None lets the runtime decide
+    onnx_file_name: Optional[str] = None  # e.g. "onnx/model_qint8_avx512_vnni.onnx"; int8 default matches the CPU
+
+
+class EmbeddingPoolSettings(_FrozenSettings):
+    enabled: bool = False  # opt-in: each uvicorn worker spawns its own pool, each process loads the model
+    workers: Optional[int] = None  # processes per uvicorn worker; None = cpu_count // admission.workers. <2 disables
+    min_chunks: int = 2000  # embed calls smaller than this stay in-process
+    batch_size: int = 256  # texts per task sent to a worker
+    threads_per_worker: Optional[int] = None  # defaults to cpu_count // (admission.workers * workers)
+    pin_cpus: bool = True  # give each worker its own CPU slice (Linux sched_setaffinity)
+
+
+class IndexVersionsSettings(_FrozenSettings):
+    keep_versions: int = 3  # newest snapshots always kept per index
+    gc_grace_seconds: float = 300  # older snapshots are deleted this long after being superseded
+    lock_timeout_seconds: float = 300  # how long a writer waits for another writer on the same index
+
+
+class RetrieverSettings(_FrozenSettings):
+    top_k: int = 10  # max chunks per query when the request gives no k
+    mode: str = "adaptive"  # "adaptive" (cut at min_score / max_drop) or "similarity" (always k)
+    min_k: int = 1
+    min_score: Optional[float] = 0.25
+    max_drop: Optional[float] = 0.3  # stop when a score is >30% below the previous one
+
+
+class RagContextSettings(_FrozenSettings):
+    enabled: bool = True  # merge/dedupe/budget retrieved chunks instead of joining them verbatim
+    max_tokens: int = 3000
+    min_fragment_tokens: int = 64  # smallest partial span worth adding when the budget runs out
+
+
+class ChatMemorySettings(_FrozenSettings):
+    enabled: bool = True
+    db_path: str = "data/chat_memory.sqlite3"
+    window_turns: int = 6  # recent question/answer pairs sent verbatim
+    summarize_every: int = 2  # turns folded into the rolling summary per LLM call
+    max_summary_tokens: int = 400
+    max_message_tokens: int = 500
+
+
+class ChunkingSettings(_FrozenSettings):
+    mode: str = "token"  # "token" (tokenizer-aware) or "char" (RecursiveCharacterTextSplitter)
+    chunk_tokens: Optional[int] = None  # defaults to the embedding model's max_seq_length
+    overlap_tokens: int = 32
+    batch_size: int = 256
+    report_char_stats: bool = True  # tokenize char-mode chunks to report truncation
+
+
+class DedupSettings(_FrozenSettings):
+    enabled: bool = True
+    threshold: float = 0.85  # estimated Jaccard similarity at which a chunk is dropped
+    num_perm: int = 128
+    bands: int = 32
+    shingle_size: int = 5
+
+
+class SessionJanitorSettings(_FrozenSettings):
+    enabled: bool = False  # run the sweep as a background task in the API process
+    interval_seconds: float = 600
+    ttl_hours: Optional[float] = 72
+    max_total_mb: Optional[float] = 5120
+    roots: List[str] = Field(default_factory=lambda: ["data", "data/document_analysis", "data/document_compare", "faiss_index"])
+    lock_path: str = "data/.janitor.lock"
+
+
+class ParseCacheSettings(_FrozenSettings):
+    enabled: bool = True
+    dir: str = "data/.parse_cache"
+    compression_level: int = 3
+    max_mb: Optional[float] = 1024
+
+
+class BatchAnalyzeSettings(_FrozenSettings):
+    max_files: int = 50
+    max_concurrency: int = 4  # concurrent LLM analyses per batch request
+    parse_workers: int = 4
+
+
+class CompareSettings(_FrozenSettings):
+    mode: str = "full"  # "full" (one call on both documents) or "sectioned"
+    section_min_chars: int = 400
+    section_max_chars: int = 6000
+    align_threshold: float = 0.5  # cosine similarity below which sections count as unmatched
+    max_concurrency: int = 4
+
+
+class LLMProviderSettings(_FrozenSettings):
+    provider: str
+    model_name: str
+    temperature: float = 0.2
+    max_tokens: int = Field(2048, validation_alias=AliasChoices("max_tokens", "max_output_tokens"))
+    base_url: Optional[str] = None
+    rpm: Optional[int] = None  # provider rate limits enforced client-side by the LLM gateway
+    tpm: Optional[int] = None
+
+
+class LLMGatewaySettings(_FrozenSettings):
+    enabled: bool = True
+    failover: List[str] = Field(default_factory=lambda: ["groq", "google"])  # tried after the primary, in order
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 20.0
+    failure_threshold: int = 5  # consecutive failures that open a provider's circuit
+    reset_timeout: float = 30.0
+
+
+class LLMPoolSettings(_FrozenSettings):
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    timeout: float = 60.0
+
+
+class ExtractorSettings(_FrozenSettings):
+    backends: Dict[str, str] = Field(default_factory=dict)  # extension -> extractor name, e.g. {".pdf": "pypdf"}
+
+
+class ProfilingSettings(_FrozenSettings):
+    enabled: bool = False
+    header: str = "X-Profile"  # requests sending "X-Profile: 1" are profiled
+    sample_rate: float = 0.0  # fraction of all other requests profiled at random
+    interval_ms: float = 5
+    dir: str = "data/.profiles"
+    max_profiles: int = 200
+
+
+class FairShareSettings(_FrozenSettings):
+    enabled: bool = True
+    interactive_weight: float = 8  # share of an interactive (chat/analyze) queue vs a bulk (indexing) one
+    bulk_weight: float = 1
+    embedding_concurrency: int = 1  # embedding batches at once per worker (each uses every core)
+    embedding_quantum: int = 256  # texts credited per round-robin turn
+    embedding_batch: int = 256  # ingests are embedded (and scheduled) in batches of this many texts
+    llm_concurrency: int = 8
+    llm_quantum_tokens: int = 4000
+
+
+class AdmissionSettings(_FrozenSettings):
+    enabled: bool = True
+    budget_mb: Optional[float] = None  # per worker; None = cgroup limit * budget_fraction / workers
+    budget_fraction: float = 0.8
+    workers: int = 4  # uvicorn workers sharing the container (see Dockerfile)
+    max_queue: int = 32
+    queue_timeout_seconds: float = 30
+    base_mb: float = 64  # cost model: base + upload_multiplier * bytes + per_page_kb * pages
+    upload_multiplier: float = 4
+    per_page_kb: float = 512
+    trace_stages: bool = False  # tracemalloc peak per track_stage (slows allocation-heavy code)
+
+
+class Settings(_FrozenSettings):
+    """Typed view of config.yaml plus the environment, built once and shared by all components."""
+
+    faiss_db: FaissDbSettings = Field(default_factory=FaissDbSettings)
+    embedding_model: EmbeddingSettings = Field(default_factory=EmbeddingSettings)
+    embedding_pool: EmbeddingPoolSettings = Field(default_factory=EmbeddingPoolSettings)
+    index_versions: IndexVersionsSettings = Field(default_factory=IndexVersionsSettings)
+    retriever: RetrieverSettings = Field(default_factory=RetrieverSettings)
+    rag_context: RagContextSettings = Field(default_factory=RagContextSettings)
+    chat_memory: ChatMemorySettings = Field(default_factory=ChatMemorySettings)
+    chunking: ChunkingSettings = Field(default_factory=ChunkingSettings)
+    dedup: DedupSettings = Field(default_factory=DedupSettings)
+    session_janitor: SessionJanitorSettings = Field(default_factory=SessionJanitorSettings)
+    parse_cache: ParseCacheSettings = Field(default_factory=ParseCacheSettings)
+    extractors: ExtractorSettings = Field(default_factory=ExtractorSettings)
+    batch_analyze: BatchAnalyzeSettings = Field(default_factory=BatchAnalyzeSettings)
+    compare: CompareSettings = Field(default_factory=CompareSettings)
+    llm: Dict[str, LLMProviderSettings] = Field(default_factory=dict)
+    llm_pool: LLMPoolSettings = Field(default_factory=LLMPoolSettings)
+    llm_gateway: LLMGatewaySettings = Field(default_factory=LLMGatewaySettings)
+    profiling: ProfilingSettings = Field(default_factory=ProfilingSettings)
+    admission: AdmissionSettings = Field(default_factory=AdmissionSettings)
+    fair_share: FairShareSettings = Field(default_factory=FairShareSettings)
+
+    env: str = "local"
+    llm_provider: str = "groq"
+    source_path: str = ""
+    source_mtime: float = 0.0
+
+    @classmethod
+    def from_yaml(cls, path: Optional[os.PathLike] = None) -> "Settings":
+        path = Path(path or os.getenv("CONFIG_PATH") or config_path)
+        raw: Dict[str, Any] = load_config(path)
+        return cls(
+            **raw,
+            env=os.getenv("ENV", "local").lower(),
+            llm_provider=os.getenv("LLM_PROVIDER", "groq"),
+            source_path=str(path),
+            source_mtime=path.stat().st_mtime,
+        )
+
+
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+_dotenv_loaded = False
+
+
+def _load_env_once() -> None:
+    global _dotenv_loaded
+    if _dotenv_loaded:
+        return
+    if os.getenv("ENV", "local").lower() != "production":
+        load_dotenv()
+        log.info("Running in LOCAL mode: .env loaded")
+    else:
+        log.info("Running in PRODUCTION mode")
+    _dotenv_loaded = True
+
+
+def get_settings() -> Settings:
+    """Return the process-wide settings, building them on first use."""
+    global _settings
+    current = _settings
+    if current is not None:
+        return current
+    with _settings_lock:
+        if _settings is None:
+            _load_env_once()
+            _settings = Settings.from_yaml()
+            log.info("Settings loaded", path=_settings.source_path, sections=list(_settings.model_dump().keys()))
+        return _settings
+
+
+def reload_settings(path: Optional[os.PathLike] = None) -> Settings:
+    """Re-read config.yaml and atomically swap the shared settings.
+
+    A file that fails to parse or validate leaves the previous settings in place.
+    """
+    global _settings
+    _load_env_once()
+    fresh = Settings.from_yaml(path or (_settings.source_path if _settings else None))
+    with _settings_lock:
+        _settings = fresh
+    log.info("Settings reloaded", path=fresh.source_path, mtime=fresh.source_mtime)
+    return fresh
+
+
+class SettingsWatcher:
+    """Opt-in background thread that polls config.yaml and reloads settings when it changes."""
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="settings-watcher", daemon=True)
+        self._thread.start()
+        log.info("Settings watcher started", interval=self.interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+        log.info("Settings watcher stopped")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            current = get_settings()
+            try:
+                mtime = Path(current.source_path).stat().st_mtime
+                if mtime != current.source_mtime:
+                    reload_settings(current.source_path)
+            except Exception as e:
+                log.error("Settings reload failed, keeping previous settings", error=str(e))
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import re
+import zlib
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+_WORD = re.compile(r"\w+")
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+@dataclass
+class DedupStats:
+    input_chunks: int = 0
+    kept_chunks: int = 0
+    dropped_chunks: int = 0
+    candidate_pairs: int = 0
+    threshold: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class MinHashDeduplicator:
+    """Drop near-duplicate chunks (boilerplate headers, disclaimers, template clauses) before embedding.
+
+    Each chunk gets a MinHash signature over word shingles, computed for all permutations at
+    once with NumPy. LSH banding proposes candidate pairs, and a chunk is dropped when its
+    estimated Jaccard similarity to an earlier kept chunk reaches ``threshold``. The first
+    occurrence always survives, so document order is preserved.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, bands: int = 32,
+                 shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # multiply-shift hashing: h(x) = ((a*x + b) mod 2^64) >> 32 with odd a
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def _shingle_hashes(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        if not words:
+            return np.array([zlib.crc32(text.encode("utf-8"))], dtype=np.uint64)
+        word_hashes = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+        k = min(self.shingle_size, len(words))
+        n = len(words) - k + 1
+        shingles = np.zeros(n, dtype=np.uint64)
+        for j in range(k):  # rolling polynomial combine of k consecutive word hashes
+            shingles = (shingles * np.uint64(1_000_003) + word_hashes[j:j + n]) & _MASK32
+        return np.unique(shingles)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        sigs = np.empty((len(texts), self.num_perm), dtype=np.uint64)
+        for i, text in enumerate(texts):
+            h = self._shingle_hashes(text)
+            sigs[i] = ((h[:, None] * self._a[None, :] + self._b[None, :]) >> np.uint64(32)).min(axis=0)
+        return sigs
+
+    def deduplicate(self, docs: List[Document]) -> Tuple[List[Document], DedupStats]:
+        stats = DedupStats(input_chunks=len(docs), threshold=self.threshold)
+        if len(docs) < 2:
+            stats.kept_chunks = len(docs)
+            return list(docs), stats
+
+        sigs = self.signatures([d.page_content for d in docs])
+        band_keys = sigs.reshape(len(docs), self.bands, self.rows)
+        buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        kept: List[int] = []
+        for i in range(len(docs)):
+            keys = [(b, band_keys[i, b].tobytes()) for b in range(self.bands)]
+            candidates = {j for key in keys for j in buckets.get(key, ())}
+            stats.candidate_pairs += len(candidates)
+            if candidates:
+                cand = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+                similarity = (sigs[cand] == sigs[i]).mean(axis=1)
+                if similarity.max() >= self.threshold:
+                    continue
+            kept.append(i)
+            for key in keys:
+                buckets[key].append(i)
+
+        stats.kept_chunks = len(kept)
+        stats.dropped_chunks = len(docs) - len(kept)
+        return [docs[i] for i in kept], stats
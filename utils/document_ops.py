@@ -1,35 +1,19 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Optional
 from fastapi import UploadFile
 from langchain.schema import Document
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
+from utils.extractors import SUPPORTED_EXTENSIONS, load_with_extractors
 import sys
-SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
 
 
-def load_documents(paths: Iterable[Path]) -> List[Document]:
+def load_documents(paths: Iterable[Path], extractor: Optional[str] = None) -> List[Document]:
+    """Load docs with the extractor registered for each file (see utils.extractors)."""
     log = CustomLogger().get_logger(__name__)
-    print("load_documents is:", load_documents)
-    print("type of load_documents:", type(load_documents))
-
-    """Load docs using appropriate loader based on extension."""
-    docs: List[Document] = []
     try:
-        for p in paths:
-            ext = p.suffix.lower()
-            if ext == ".pdf":
-                loader = PyPDFLoader(str(p))
-            elif ext == ".docx":
-                loader = Docx2txtLoader(str(p))
-            elif ext == ".txt":
-                loader = TextLoader(str(p), encoding="utf-8")
-            else:
-                log.warning("Unsupported extension skipped", path=str(p))
-                continue
-            docs.extend(loader.load())
+        docs = load_with_extractors(paths, extractor)
         log.info("Documents loaded", count=len(docs))
         return docs
     except Exception as e:
@@ -0,0 +1,93 @@
+"""CPU inference backends for the sentence-transformers embedding model.
+
+``embedding_model.backend`` in config.yaml selects one of:
+
+- ``torch``: the PyTorch model (default)
+- ``onnx``: the ONNX export, run by ONNX Runtime
+- ``onnx-int8``: a dynamically int8-quantized ONNX model. The variant matching the CPU
+  (AVX-512 VNNI, AVX2 or ARM64) is used; it is quantized on first load for local models
+  that do not ship one.
+
+The ONNX backends need ``onnxruntime`` and ``optimum``, which are not installed by
+default: ``pip install -r requirements-onnx.txt``.
+"""
+import platform
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from logger.custom_logger import CustomLogger
+from utils.config_loader import EmbeddingSettings
+
+log = CustomLogger().get_logger(__file__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def int8_variant() -> str:
+    """Quantization config name sentence-transformers uses for this CPU."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        flags = Path("/proc/cpuinfo").read_text()
+    except OSError:
+        flags = ""
+    return "avx512_vnni" if "avx512_vnni" in flags else "avx2"
+
+
+def int8_file_name(variant: Optional[str] = None) -> str:
+    variant = variant or int8_variant()
+    dtype = "quint8" if variant == "avx2" else "qint8"
+    return f"onnx/model_{dtype}_{variant}.onnx"
+
+
+def _session_options(threads: Optional[int]):
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise ImportError("The onnx embedding backends need onnxruntime and optimum: "
+                          "pip install -r requirements-onnx.txt") from e
+
+    options = ort.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    return options
+
+
+def _ensure_local_int8(model_name: str, file_name: str, threads: Optional[int]) -> None:
+    """Quantize a local model directory that does not ship the int8 ONNX file yet."""
+    model_dir = Path(model_name)
+    if not model_dir.is_dir() or (model_dir / file_name).exists():
+        return
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    log.info("Quantizing ONNX embedding model to int8", model=model_name, file=file_name)
+    onnx_model = SentenceTransformer(model_name, device="cpu", backend="onnx",
+                                     model_kwargs={"provider": "CPUExecutionProvider",
+                                                   "session_options": _session_options(threads)})
+    if not (model_dir / "onnx" / "model.onnx").exists():
+        onnx_model.save_pretrained(str(model_dir))
+    export_dynamic_quantized_onnx_model(onnx_model, quantization_config=int8_variant(), model_name_or_path=str(model_dir),
+                                        file_suffix=Path(file_name).stem.removeprefix("model_"))
+
+
+def sentence_transformer_kwargs(cfg: EmbeddingSettings) -> Dict[str, Any]:
+    """``model_kwargs`` for ``HuggingFaceEmbeddings`` (forwarded to ``SentenceTransformer``)."""
+    backend = cfg.backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported embedding backend '{backend}', expected one of {BACKENDS}")
+    if backend == "torch":
+        if cfg.threads:
+            import torch
+
+            torch.set_num_threads(cfg.threads)
+        return {}
+
+    onnx_kwargs: Dict[str, Any] = {"provider": "CPUExecutionProvider", "session_options": _session_options(cfg.threads)}
+    if backend == "onnx-int8":
+        file_name = cfg.onnx_file_name or int8_file_name()
+        _ensure_local_int8(cfg.embedding_model_name, file_name, cfg.threads)
+        onnx_kwargs["file_name"] = file_name
+    elif cfg.onnx_file_name:
+        onnx_kwargs["file_name"] = cfg.onnx_file_name
+    return {"device": "cpu", "backend": "onnx", "model_kwargs": onnx_kwargs}
@@ -0,0 +1,214 @@
+"""Multi-process embedding for large ingests.
+
+One Python process running sentence-transformers leaves most cores of a large ingest node
+idle. ``EmbeddingPool`` shards chunk batches across ``workers`` spawned processes; each
+loads the model once in its initializer, caps its intra-op threads (and, on Linux, pins
+itself to its own CPU slice) so workers do not oversubscribe the machine, and returns a
+float32 matrix. Batches are reassembled in input order.
+
+``FaissManager`` switches to the pool automatically once a call embeds at least
+``embedding_pool.min_chunks`` texts; smaller calls stay in-process.
+
+Every uvicorn worker owns its own pool, so the machine's CPUs are split between the
+``admission.workers`` server workers: by default each pool gets ``cpu_count // workers``
+processes, and each server worker pins its pool to a separate region of cores.
+"""
+import atexit
+import fcntl
+import multiprocessing as mp
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from logger.custom_logger import CustomLogger
+from utils.config_loader import EmbeddingPoolSettings, EmbeddingSettings, Settings, get_settings
+
+_THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+_worker_model = None
+
+
+def as_float32_matrix(vectors: Any, dim: Optional[int] = None) -> np.ndarray:
+    """C-contiguous float32 ``(n, dim)`` view/copy of ``vectors`` (list of lists or array)."""
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1 and matrix.size == 0:
+        matrix = matrix.reshape(0, dim or 0)
+    if matrix.ndim != 2:
+        raise ValueError(f"expected a 2-D embedding matrix, got shape {matrix.shape}")
+    if dim is not None and matrix.shape[1] != dim:
+        raise ValueError(f"embedding dimension {matrix.shape[1]} does not match the model's {dim}")
+    return matrix
+
+
+def embedding_dimension(embeddings: Any) -> int:
+    """Output dimension of a LangChain embeddings object (probes it when the model does not say)."""
+    client = getattr(embeddings, "_client", None)
+    dim = client.get_sentence_embedding_dimension() if hasattr(client, "get_sentence_embedding_dimension") else None
+    return int(dim) if dim else len(embeddings.embed_query("dimension probe"))
+
+
+def _cpu_slice(slot: int, threads: int, first: int = 0) -> Optional[List[int]]:
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    cores = sorted(os.sched_getaffinity(0))
+    start = first + slot * threads
+    if start + threads > len(cores):  # more workers than cores: let the scheduler place them
+        return None
+    return cores[start:start + threads]
+
+
+_region_lock: Optional[Tuple[int, int]] = None  # (region, fd) held for the life of this server worker
+
+
+def _claim_cpu_region(regions: int) -> Optional[int]:
+    """Index of a CPU region no other server worker on this machine holds (flock'd), or None."""
+    global _region_lock
+    if regions <= 1:
+        return 0
+    if _region_lock is not None:
+        return _region_lock[0]
+    for region in range(regions):
+        fd = os.open(os.path.join(tempfile.gettempdir(), f"docportal-embedding-cpus-{region}.lock"),
+                     os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)  # released by the OS if this process dies
+        except OSError:
+            os.close(fd)
+            continue
+        _region_lock = (region, fd)
+        return region
+    return None
+
+
+def _init_worker(cfg: Dict[str, Any], threads: int, pin_cpus: bool, counter, first_core: int = 0) -> None:
+    """Runs once per worker process: pin threads, then load the model."""
+    global _worker_model
+    for name in _THREAD_ENV:
+        os.environ[name] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    with counter.get_lock():
+        slot = counter.value
+        counter.value += 1
+    cores = _cpu_slice(slot, threads, first_core) if pin_cpus else None
+    if cores:
+        os.sched_setaffinity(0, cores)
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    from utils.embedding_backend import sentence_transformer_kwargs
+
+    torch.set_num_threads(threads)
+    settings = EmbeddingSettings(**{**cfg, "threads": threads})
+    _worker_model = SentenceTransformer(settings.embedding_model_name, **sentence_transformer_kwargs(settings))
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    vectors = _worker_model.encode(texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False)
+    return as_float32_matrix(vectors)
+
+
+class EmbeddingPool:
+    """A spawn-context process pool that embeds texts with one model copy per worker."""
+
+    def __init__(self, cfg: EmbeddingSettings, workers: int, batch_size: int = 256,
+                 threads_per_worker: Optional[int] = None, pin_cpus: bool = True, server_workers: int = 1):
+        self.log = CustomLogger().get_logger(__name__)
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self.cfg = cfg
+        self.workers = workers
+        self.batch_size = max(1, batch_size)
+        server_workers = max(1, server_workers)
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // (server_workers * workers))
+        first_core = 0
+        if pin_cpus:
+            region = _claim_cpu_region(server_workers)
+            pin_cpus = region is not None  # more server workers than configured: leave placement to the OS
+            first_core = (region or 0) * workers * self.threads_per_worker
+        if cfg.backend == "onnx-int8":
+            from utils.embedding_backend import sentence_transformer_kwargs
+
+            sentence_transformer_kwargs(cfg)  # quantize once here rather than racing in every worker
+        ctx = mp.get_context("spawn")  # fork would copy the parent's torch/tokenizer thread state
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=ctx, initializer=_init_worker,
+            initargs=(cfg.model_dump(), self.threads_per_worker, pin_cpus, ctx.Value("i", 0), first_core))
+        self.log.info("Embedding pool started", workers=workers, threads_per_worker=self.threads_per_worker,
+                      first_core=first_core if pin_cpus else None, model=cfg.embedding_model_name,
+                      backend=cfg.backend)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed ``texts``; row ``i`` of the float32 result belongs to ``texts[i]``."""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        futures = [self._executor.submit(_encode, batch) for batch in batches]
+        return np.ascontiguousarray(np.concatenate([f.result() for f in futures], axis=0))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool: Optional[EmbeddingPool] = None
+_pool_key: Optional[Tuple] = None
+_pool_lock = threading.Lock()
+
+
+def pool_workers(cfg: EmbeddingPoolSettings, server_workers: int = 1) -> int:
+    """Processes per pool: ``cfg.workers``, or this server worker's share of the CPUs."""
+    return cfg.workers or (os.cpu_count() or 1) // max(1, server_workers)
+
+
+def get_embedding_pool(chunks: Optional[int] = None, settings: Optional[Settings] = None) -> Optional[EmbeddingPool]:
+    """Process-wide pool, or None when disabled, below the threshold, or with fewer than two workers.
+
+    ``chunks`` is the size of the pending embed call, checked against
+    ``embedding_pool.min_chunks``. The pool is started lazily and restarted when the
+    embedding model or pool settings change.
+    """
+    global _pool, _pool_key
+    settings = settings or get_settings()
+    cfg = settings.embedding_pool
+    server_workers = settings.admission.workers
+    workers = pool_workers(cfg, server_workers)
+    if not cfg.enabled or workers < 2 or (chunks is not None and chunks < cfg.min_chunks):
+        return None
+    key = (settings.embedding_model, workers, cfg.batch_size, cfg.threads_per_worker, cfg.pin_cpus, server_workers)
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = EmbeddingPool(settings.embedding_model, workers, batch_size=cfg.batch_size,
+                                  threads_per_worker=cfg.threads_per_worker, pin_cpus=cfg.pin_cpus,
+                                  server_workers=server_workers)
+            _pool_key = key
+        return _pool
+
+
+def discard_embedding_pool(pool: EmbeddingPool) -> None:
+    """Drop ``pool`` (e.g. after a worker crashed) so the next large ingest starts a fresh one."""
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_key = None, None
+    try:
+        pool.shutdown()
+    except Exception:
+        pass
+
+
+def shutdown_embedding_pool() -> None:
+    global _pool, _pool_key
+    with _pool_lock:
+        pool, _pool, _pool_key = _pool, None, None
+    if pool is not None:
+        pool.shutdown()
+
+
+atexit.register(shutdown_embedding_pool)
@@ -0,0 +1,182 @@
+"""Pluggable text extractors for chat ingestion.
+
+An extractor turns a file into the parse-cache format
+``{"metadata": {...}, "pages": [{"page": 0, "text": "..."}, ...]}``. Paginated formats
+set ``page`` on every entry; single-flow formats (txt, docx) omit it. Extractors are
+looked up by file extension. Files with no known extension are identified by sniffing
+their leading bytes. ``extractors.backends`` in config.yaml overrides the default per
+extension, e.g. ``{".pdf": "pypdf"}``.
+
+    EXTRACTORS.register(Extractor("html", (".html", ".htm"), ("text/html",), extract_html))
+
+PDFs default to PyMuPDF, the same parse (and cache entries) that /analyze and /compare
+use. pypdf is registered as a pure-Python alternative.
+"""
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain.schema import Document
+
+from logger.custom_logger import CustomLogger
+from utils.config_loader import get_settings
+from utils.metrics import record_extraction, track_stage
+from utils.parse_cache import Parsed, extract_pdf_pymupdf, get_parse_cache
+
+log = CustomLogger().get_logger(__file__)
+
+PDF_MIME = "application/pdf"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+TEXT_MIME = "text/plain"
+
+
+@dataclass(frozen=True)
+class Extractor:
+    name: str
+    extensions: Tuple[str, ...]
+    mimetypes: Tuple[str, ...]
+    extract: Callable[[Path], Parsed]
+    cacheable: bool = True  # worth a trip through the parse cache (cheap formats are not)
+
+
+def sniff_mime(path: Path) -> Optional[str]:
+    """MIME type from the file's content: PDF header, DOCX package, or UTF-8 text."""
+    with open(path, "rb") as f:
+        head = f.read(4096)
+    if head.lstrip(b"\x00\t\n\r ").startswith(b"%PDF-"):
+        return PDF_MIME
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(path) as zf:
+                return DOCX_MIME if "word/document.xml" in zf.namelist() else None
+        except zipfile.BadZipFile:
+            return None
+    if b"\x00" in head:
+        return None
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.start < len(head) - 3:  # not just a multi-byte character cut at the 4 KB boundary
+            return None
+    return TEXT_MIME
+
+
+class ExtractorRegistry:
+    def __init__(self):
+        self._by_name: Dict[str, Extractor] = {}
+        self._by_extension: Dict[str, str] = {}
+        self._by_mime: Dict[str, str] = {}
+        self.extensions: Set[str] = set()
+
+    def register(self, extractor: Extractor, default: bool = True) -> None:
+        """Add ``extractor``; ``default`` makes it the choice for its extensions and MIME types."""
+        self._by_name[extractor.name] = extractor
+        for ext in extractor.extensions:
+            if default or ext not in self._by_extension:
+                self._by_extension[ext] = extractor.name
+            self.extensions.add(ext)
+        for mime in extractor.mimetypes:
+            if default or mime not in self._by_mime:
+                self._by_mime[mime] = extractor.name
+
+    def get(self, name: str) -> Extractor:
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise ValueError(f"Unknown extractor {name!r}; registered: {sorted(self._by_name)}") from None
+
+    def names(self) -> List[str]:
+        return sorted(self._by_name)
+
+    def for_path(self, path: Path, name: Optional[str] = None) -> Optional[Extractor]:
+        """Extractor for ``path``: explicit ``name``, configured backend, extension, then content sniffing."""
+        if name:
+            return self.get(name)
+        ext = path.suffix.lower()
+        configured = get_settings().extractors.backends.get(ext)
+        if configured:
+            return self.get(configured)
+        if ext in self._by_extension:
+            return self._by_name[self._by_extension[ext]]
+        mime = sniff_mime(path)
+        return self._by_name[self._by_mime[mime]] if mime in self._by_mime else None
+
+
+def _extract_pypdf(path: Path) -> Parsed:
+    from pypdf import PdfReader
+
+    reader = PdfReader(str(path))
+    info = reader.metadata or {}
+    meta = {k.lstrip("/").lower(): str(v) for k, v in info.items() if v and k in ("/Title", "/Author")}
+    meta.update(page_count=len(reader.pages), is_encrypted=bool(reader.is_encrypted))
+    pages = [] if reader.is_encrypted else [{"page": i, "text": p.extract_text() or ""}
+                                              for i, p in enumerate(reader.pages)]
+    return {"metadata": meta, "pages": pages}
+
+
+def _extract_docx(path: Path) -> Parsed:
+    import docx2txt
+
+    return {"metadata": {}, "pages": [{"text": docx2txt.process(str(path))}]}
+
+
+def _extract_text(path: Path) -> Parsed:
+    return {"metadata": {}, "pages": [{"text": path.read_text(encoding="utf-8")}]}
+
+
+EXTRACTORS = ExtractorRegistry()
+EXTRACTORS.register(Extractor("pymupdf", (".pdf",), (PDF_MIME,), extract_pdf_pymupdf))
+EXTRACTORS.register(Extractor("pypdf", (".pdf",), (PDF_MIME,), _extract_pypdf), default=False)
+EXTRACTORS.register(Extractor("docx2txt", (".docx",), (DOCX_MIME,), _extract_docx, cacheable=False))
+EXTRACTORS.register(Extractor("text", (".txt",), (TEXT_MIME,), _extract_text, cacheable=False))
+
+# live view: upload filters accept formats registered later on
+SUPPORTED_EXTENSIONS = EXTRACTORS.extensions
+
+
+def extract(path: Path, extractor: Extractor, use_cache: bool = True) -> Parsed:
+    """Run ``extractor`` (through the parse cache when it is cacheable) and record its throughput."""
+
+    def timed(p: Path) -> Parsed:
+        with track_stage("extractor", extractor.name):
+            start = time.perf_counter()
+            parsed = extractor.extract(Path(p))
+            seconds = time.perf_counter() - start
+        record_extraction(extractor.name, len(parsed["pages"]), Path(p).stat().st_size, seconds)
+        return parsed
+
+    cache = get_parse_cache() if use_cache and extractor.cacheable else None
+    if cache is None:
+        return timed(path)
+    parsed, _ = cache.get_or_parse(path, extractor.name, timed)
+    return parsed
+
+
+def to_documents(path: Path, parsed: Parsed) -> List[Document]:
+    """One Document per page (per file for formats without pages), with page metadata."""
+    doc_meta = parsed["metadata"]
+    extra = {k: v for k, v in doc_meta.items() if k in ("title", "author")}
+    total = doc_meta.get("page_count", len(parsed["pages"]))
+    documents = []
+    for p in parsed["pages"]:
+        metadata = {"source": str(path)}
+        if "page" in p:
+            metadata.update(page=p["page"], total_pages=total, **extra)
+        documents.append(Document(page_content=p["text"], metadata=metadata))
+    return documents
+
+
+def load_with_extractors(paths: Iterable[Path], extractor: Optional[str] = None,
+                         use_cache: bool = True) -> List[Document]:
+    """Documents for every file an extractor handles; others are skipped with a warning."""
+    docs: List[Document] = []
+    for p in paths:
+        p = Path(p)
+        chosen = EXTRACTORS.for_path(p, extractor)
+        if chosen is None:
+            log.warning("Unsupported extension skipped", path=str(p))
+            continue
+        docs.extend(to_documents(p, extract(p, chosen, use_cache=use_cache)))
+    return docs
@@ -0,0 +1,189 @@
+"""Per-tenant fair sharing of embedding and LLM capacity within a worker.
+
+Each resource (``embedding``, ``llm``) has a fixed number of concurrent slots. Callers
+wait for a slot in a queue keyed by (priority, tenant). Queues are served by weighted
+deficit round-robin: on its turn, a queue earns ``quantum * weight`` credit and runs
+requests while their cost fits the credit. Cost is texts per embedding batch and
+estimated tokens per LLM call. A tenant ingesting thousands of chunks therefore gets
+one batch per round instead of the whole resource. ``interactive`` queues (chat queries,
+single-document analyze/compare) weigh ``interactive_weight`` times a ``bulk`` queue
+(indexing, batch analysis), so they jump ahead without starving bulk work.
+
+The tenant and priority come from the request context: :func:`work_scope` in the API
+handlers sets them, and the ``X-Tenant-Id`` header, when sent, takes precedence over the
+session id. When the resource is idle, a slot is granted immediately.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+from utils.config_loader import FairShareSettings, get_settings
+from utils.metrics import record_fair_wait, set_fair_queue_depth
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+TENANT_HEADER = "X-Tenant-Id"
+
+_tenant: ContextVar[Optional[str]] = ContextVar("docportal_tenant", default=None)
+_priority: ContextVar[Optional[str]] = ContextVar("docportal_priority", default=None)
+
+
+@contextmanager
+def work_scope(priority: Optional[str] = None, tenant: Optional[str] = None) -> Iterator[None]:
+    """Tag work done in this context; ``tenant`` only applies if none is set yet (e.g. by the header)."""
+    tokens = []
+    if tenant and _tenant.get() is None:
+        tokens.append((_tenant, _tenant.set(tenant)))
+    if priority:
+        tokens.append((_priority, _priority.set(priority)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class _Ticket:
+    __slots__ = ("cost", "queued_at", "granted")
+
+    def __init__(self, cost: float):
+        self.cost = cost
+        self.queued_at = time.monotonic()
+        self.granted = threading.Event()
+
+
+class FairScheduler:
+    """Weighted deficit round-robin over (priority, tenant) queues for ``capacity`` slots."""
+
+    def __init__(self, name: str, capacity: int, quantum: float, weights: Dict[str, float]):
+        if capacity < 1 or quantum <= 0 or any(w <= 0 for w in weights.values()):
+            raise ValueError("capacity must be >= 1, quantum and weights > 0")
+        self.name = name
+        self.capacity = capacity
+        self.quantum = quantum
+        self.weights = weights
+        self._queues: Dict[Tuple[str, str], Deque[_Ticket]] = {}
+        self._deficit: Dict[Tuple[str, str], float] = {}
+        self._active: Deque[Tuple[str, str]] = deque()  # round-robin order of non-empty queues
+        self._credited = False  # whether _active[0] already got its quantum this turn
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def depth(self, priority: Optional[str] = None) -> int:
+        with self._lock:
+            return sum(len(q) for (p, _), q in self._queues.items() if priority in (None, p))
+
+    def _publish_depth(self, priority: str) -> None:
+        set_fair_queue_depth(self.name, priority,
+                             sum(len(q) for (p, _), q in self._queues.items() if p == priority))
+
+    def _dispatch(self) -> None:
+        while self._running < self.capacity and self._active:
+            key = self._active[0]
+            queue = self._queues[key]
+            if not self._credited:
+                self._deficit[key] += self.quantum * self.weights.get(key[0], 1.0)
+                self._credited = True
+            head = queue[0]
+            if head.cost > self._deficit[key]:
+                self._active.rotate(-1)
+                self._credited = False
+                continue
+            queue.popleft()
+            self._deficit[key] -= head.cost
+            self._running += 1
+            if not queue:
+                del self._queues[key], self._deficit[key]
+                self._active.popleft()
+                self._credited = False
+            self._publish_depth(key[0])
+            head.granted.set()
+
+    def acquire(self, tenant: str, priority: str, cost: float) -> None:
+        ticket = _Ticket(max(cost, 1e-9))
+        key = (priority, tenant)
+        with self._lock:
+            if self._running < self.capacity and not self._active:
+                self._running += 1
+                ticket.granted.set()
+            else:
+                if key not in self._queues:
+                    self._queues[key] = deque()
+                    self._deficit[key] = 0.0
+                    self._active.append(key)
+                self._queues[key].append(ticket)
+                self._publish_depth(priority)
+                self._dispatch()
+        ticket.granted.wait()
+        record_fair_wait(self.name, priority, time.monotonic() - ticket.queued_at)
+
+    def release(self) -> None:
+        with self._lock:
+            self._running -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, cost: float = 1.0, priority: Optional[str] = None, tenant: Optional[str] = None) -> Iterator[None]:
+        self.acquire(tenant or _tenant.get() or "anonymous", priority or _priority.get() or INTERACTIVE, cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_schedulers: Dict[str, FairScheduler] = {}
+_schedulers_settings: Optional[FairShareSettings] = None
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(resource: str) -> Optional[FairScheduler]:
+    """Process-wide scheduler for ``resource`` (``embedding`` or ``llm``); None when disabled."""
+    global _schedulers_settings
+    cfg = get_settings().fair_share
+    if not cfg.enabled:
+        return None
+    with _schedulers_lock:
+        if cfg != _schedulers_settings:
+            # in-flight slots finish on the old instances; new work queues on the new ones
+            _schedulers.clear()
+            _schedulers_settings = cfg
+        if resource not in _schedulers:
+            weights = {INTERACTIVE: cfg.interactive_weight, BULK: cfg.bulk_weight}
+            capacity, quantum = ((cfg.embedding_concurrency, cfg.embedding_quantum) if resource == "embedding"
+                                 else (cfg.llm_concurrency, cfg.llm_quantum_tokens))
+            _schedulers[resource] = FairScheduler(resource, capacity, quantum, weights)
+        return _schedulers[resource]
+
+
+@contextmanager
+def fair_slot(resource: str, cost: float = 1.0, priority: Optional[str] = None) -> Iterator[None]:
+    """Hold a slot of ``resource`` for the current tenant; ``priority`` is the default if the context sets none."""
+    scheduler = get_scheduler(resource)
+    if scheduler is None:
+        yield
+        return
+    with scheduler.slot(cost, priority=_priority.get() or priority):
+        yield
+
+
+class TenantMiddleware:
+    """ASGI middleware: an ``X-Tenant-Id`` request header names the tenant for fair scheduling."""
+
+    def __init__(self, app):
+        self.app = app
+        self._header = TENANT_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        tenant = None
+        if scope["type"] == "http":
+            tenant = next((v.decode("latin-1") for k, v in scope.get("headers", []) if k == self._header), None)
+        if not tenant:
+            return await self.app(scope, receive, send)
+        token = _tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _tenant.reset(token)
@@ -13,7 +13,7 @@ from exception.custom_exception import DocumentPortalException
 
 
 
-SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
+from utils.extractors import EXTRACTORS, SUPPORTED_EXTENSIONS  # extensions with a registered extractor
 
 # ----------------------------- #
 # Helpers (file I/O + loading)  #
@@ -31,9 +31,6 @@ def save_uploaded_files(uploaded_files: Iterable, target_dir: Path) -> List[Path
         for uf in uploaded_files:
             name = getattr(uf, "name", "file")
             ext = Path(name).suffix.lower()
-            if ext not in SUPPORTED_EXTENSIONS:
-                log.warning("Unsupported file skipped", filename=name)
-                continue
             # Clean file name (only alphanum, dash, underscore)
             safe_name = re.sub(r'[^a-zA-Z0-9_\-]', '_', Path(name).stem).lower()
             fname = f"{safe_name}_{uuid.uuid4().hex[:6]}{ext}"
@@ -44,6 +41,11 @@ def save_uploaded_files(uploaded_files: Iterable, target_dir: Path) -> List[Path
                     f.write(uf.read())
                 else:
                     f.write(uf.getbuffer())  # fallback
+            # unknown or missing extensions are identified by content (e.g. a PDF named "scan")
+            if ext not in SUPPORTED_EXTENSIONS and EXTRACTORS.for_path(out) is None:
+                out.unlink()
+                log.warning("Unsupported file skipped", filename=name)
+                continue
             saved.append(out)
             log.info("File saved for ingestion", uploaded=name, saved_as=str(out))
         return saved
@@ -0,0 +1,216 @@
+"""Versioned, immutable FAISS index snapshots with atomic publication.
+
+Layout of an index directory::
+
+    CURRENT                  name of the published version, replaced atomically
+    .versions/v000007/       index.faiss, index.pkl, ingested_meta.json (never modified)
+    .versions/.staging-...   a write in progress; renamed to its version on publish
+    .writer.lock             fcntl lock serializing writers across processes
+
+Readers resolve ``CURRENT`` once and load that directory, so they always see a complete
+snapshot however writes interleave. Writers hold the lock, write the next version into a
+staging directory, fsync it, rename it into place and swap ``CURRENT``. A crash at any
+point leaves the previous version published. Old versions are garbage-collected after a
+grace period so readers that resolved them just before a swap can finish loading.
+
+Directories written before versioning (index files directly in the index directory) are
+read as the current snapshot until the first versioned write supersedes them.
+"""
+from __future__ import annotations
+
+import fcntl
+import os
+import re
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from logger.custom_logger import CustomLogger
+from utils.config_loader import get_settings
+
+CURRENT = "CURRENT"
+VERSIONS_DIR = ".versions"
+LOCK_FILE = ".writer.lock"
+STAGING_PREFIX = ".staging-"
+LEGACY_FILES = ("index.faiss", "index.pkl", "ingested_meta.json")
+LEGACY_VERSION = "legacy"
+
+_VERSION = re.compile(r"^v(\d+)$")
+
+
+@dataclass
+class IndexWrite:
+    """A pending version: write the snapshot files into ``path``; it is published as ``version``."""
+    version: str
+    path: Path
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_tree(path: Path) -> None:
+    for child in path.iterdir():
+        if child.is_file():
+            with open(child, "rb") as fh:
+                os.fsync(fh.fileno())
+    _fsync_dir(path)
+
+
+class VersionedIndexStore:
+    """Publishes and resolves index snapshots under one index directory (see the module docstring)."""
+
+    def __init__(self, root: os.PathLike, keep_versions: int = 3, gc_grace_seconds: float = 300,
+                 lock_timeout_seconds: float = 300):
+        self.log = CustomLogger().get_logger(__name__)
+        self.root = Path(root)
+        self.keep_versions = max(1, keep_versions)
+        self.gc_grace_seconds = gc_grace_seconds
+        self.lock_timeout_seconds = lock_timeout_seconds
+
+    @classmethod
+    def from_settings(cls, root: os.PathLike) -> "VersionedIndexStore":
+        cfg = get_settings().index_versions
+        return cls(root, keep_versions=cfg.keep_versions, gc_grace_seconds=cfg.gc_grace_seconds,
+                   lock_timeout_seconds=cfg.lock_timeout_seconds)
+
+    @property
+    def versions_dir(self) -> Path:
+        return self.root / VERSIONS_DIR
+
+    def _has_legacy(self) -> bool:
+        return (self.root / "index.faiss").exists() and (self.root / "index.pkl").exists()
+
+    def current(self) -> Tuple[Optional[str], Optional[Path]]:
+        """``(version, directory)`` of the published snapshot, or ``(None, None)`` when there is none."""
+        try:
+            version = (self.root / CURRENT).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            version = ""
+        if version:
+            path = self.versions_dir / version
+            if path.is_dir():
+                return version, path
+            self.log.error("CURRENT points at a missing index version", root=str(self.root), version=version)
+        if self._has_legacy():
+            return LEGACY_VERSION, self.root
+        return None, None
+
+    def versions(self) -> List[str]:
+        """Published version names, oldest first."""
+        if not self.versions_dir.is_dir():
+            return []
+        found = [(int(m.group(1)), p.name) for p in self.versions_dir.iterdir()
+                 if p.is_dir() and (m := _VERSION.match(p.name))]
+        return [name for _, name in sorted(found)]
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + self.lock_timeout_seconds
+        with open(self.root / LOCK_FILE, "a") as fh:
+            while True:
+                try:
+                    fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"index writer lock on {self.root} not acquired "
+                                           f"within {self.lock_timeout_seconds}s")
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    @contextmanager
+    def writer(self) -> Iterator[IndexWrite]:
+        """Exclusive write of the next version.
+
+        Read the current snapshot *inside* the block (another writer may have published
+        since you last looked), write the new snapshot into ``IndexWrite.path``, and it is
+        published when the block exits cleanly. Nothing is published if the block raises or
+        writes no files.
+        """
+        with self._lock():
+            existing = self.versions()
+            number = int(existing[-1][1:]) + 1 if existing else 1
+            version = f"v{number:06d}"
+            self.versions_dir.mkdir(parents=True, exist_ok=True)
+            staging = self.versions_dir / f"{STAGING_PREFIX}{version}-{uuid.uuid4().hex[:8]}"
+            staging.mkdir()
+            try:
+                yield IndexWrite(version=version, path=staging)
+                if any(staging.iterdir()):
+                    self._publish(staging, version)
+            finally:
+                if staging.exists():
+                    shutil.rmtree(staging, ignore_errors=True)
+            self.collect_garbage()
+
+    def _publish(self, staging: Path, version: str) -> None:
+        _fsync_tree(staging)
+        target = self.versions_dir / version
+        os.rename(staging, target)
+        os.utime(target)  # publication time, used for the GC grace period
+        _fsync_dir(self.versions_dir)
+
+        tmp = self.root / f".{CURRENT}.{uuid.uuid4().hex[:8]}"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(version)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.root / CURRENT)
+        _fsync_dir(self.root)
+        self.log.info("Published index version", root=str(self.root), version=version)
+
+    def compact(self) -> List[str]:
+        """Delete every version but the current one right away, ignoring the grace period."""
+        with self._lock():
+            return self.collect_garbage(keep_versions=1, grace_seconds=0)
+
+    def collect_garbage(self, now: Optional[float] = None, keep_versions: Optional[int] = None,
+                        grace_seconds: Optional[float] = None) -> List[str]:
+        """Delete versions older than the newest ``keep_versions`` once superseded for the grace period.
+
+        Call with the writer lock held (``writer`` does). Returns the names removed.
+        """
+        now = time.time() if now is None else now
+        keep = max(1, keep_versions or self.keep_versions)
+        grace = self.gc_grace_seconds if grace_seconds is None else grace_seconds
+        current, _ = self.current()
+        versions = self.versions()
+        removed: List[str] = []
+
+        def expired(successor: str) -> bool:  # superseded when its successor was published
+            try:
+                return now - (self.versions_dir / successor).stat().st_mtime >= grace
+            except FileNotFoundError:
+                return False
+
+        for i, name in enumerate(versions[:-keep]):
+            if name != current and expired(versions[i + 1]):
+                shutil.rmtree(self.versions_dir / name, ignore_errors=True)
+                removed.append(name)
+        if versions and current != LEGACY_VERSION and self._has_legacy() and expired(versions[0]):
+            for name in LEGACY_FILES:
+                (self.root / name).unlink(missing_ok=True)
+            removed.append(LEGACY_VERSION)
+        if self.versions_dir.is_dir():
+            for stale in self.versions_dir.glob(f"{STAGING_PREFIX}*"):  # left by a crashed writer
+                try:
+                    if now - stale.stat().st_mtime >= grace:
+                        shutil.rmtree(stale, ignore_errors=True)
+                except FileNotFoundError:
+                    pass
+        if removed:
+            self.log.info("Garbage-collected index versions", root=str(self.root), removed=removed)
+        return removed
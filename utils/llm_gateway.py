@@ -0,0 +1,327 @@
+"""Rate limiting, retries, circuit breaking and provider failover for chat model calls.
+
+``ModelLoader.load_llm()`` returns an :class:`LLMGateway` (when ``llm_gateway.enabled``),
+which is a LangChain Runnable and drops into LCEL chains exactly like a chat model.
+"""
+import email.utils
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from logger.custom_logger import CustomLogger
+from utils.config_loader import LLMGatewaySettings, LLMProviderSettings
+from utils.fair_scheduler import INTERACTIVE, fair_slot
+from utils.metrics import STAGE_SECONDS, record_llm_gateway
+
+log = CustomLogger().get_logger(__file__)
+
+Clock = Callable[[], float]
+
+
+class TokenBucket:
+    """Thread-safe token bucket using reservations.
+
+    ``reserve`` always takes the tokens (the balance may go negative) and returns how long
+    the caller has to wait before using them, so concurrent callers queue up fairly
+    without polling.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Clock = time.monotonic):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def adjust(self, amount: float) -> None:
+        """Give back (positive) or take (negative) tokens once the real cost is known."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits for one provider."""
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None, clock: Clock = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.requests = TokenBucket(rpm / 60.0, rpm, clock) if rpm else None
+        self.tokens = TokenBucket(tpm / 60.0, tpm, clock) if tpm else None
+        self.clock = clock
+        self.sleep = sleep
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until one request of ~``tokens`` tokens may be sent; returns seconds waited."""
+        waits = [0.0]
+        if self.requests:
+            waits.append(self.requests.reserve(1))
+        if self.tokens and tokens:
+            waits.append(self.tokens.reserve(min(tokens, self.tokens.capacity)))
+        with self._lock:
+            waits.append(self._blocked_until - self.clock())
+        wait = max(waits)
+        if wait > 0:
+            self.sleep(wait)
+        return max(wait, 0.0)
+
+    def settle(self, estimated: int, actual: Optional[int]) -> None:
+        if self.tokens and actual is not None:
+            self.tokens.adjust(estimated - actual)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back, e.g. for the Retry-After of a 429."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self.clock() + seconds)
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures; half-open after
+    ``reset_timeout`` seconds lets a single probe call through."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Clock = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._state, self._probing = self.HALF_OPEN, False
+        return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures, self._state, self._probing = 0, self.CLOSED, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._current_state() == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._state, self._opened_at, self._probing = self.OPEN, self.clock(), False
+
+
+@dataclass
+class ProviderRoute:
+    name: str
+    factory: Callable[[], Any]
+    limiter: RateLimiter
+    breaker: CircuitBreaker
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """HTTP status of a provider error (groq/openai SDKs, httpx, google api_core)."""
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    value = getattr(getattr(exc, "response", None), "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:  # HTTP-date form
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    if type(exc).__name__ in ("APIConnectionError", "APITimeoutError", "ServiceUnavailable", "DeadlineExceeded"):
+        return True
+    code = status_code(exc)
+    return code is not None and (code in (408, 409, 429) or code >= 500)
+
+
+def is_outage(exc: BaseException) -> bool:
+    """Errors that count against a provider's circuit breaker: 5xx, timeouts and connection failures."""
+    return is_retryable(exc) and status_code(exc) not in (409, 429)
+
+
+def estimate_tokens(value: Any) -> int:
+    """Rough prompt size (~4 characters per token) for the TPM bucket before the call."""
+    if hasattr(value, "to_string"):
+        value = value.to_string()
+    if isinstance(value, list):
+        value = " ".join(str(getattr(m, "content", m)) for m in value)
+    return len(str(value)) // 4 + 1
+
+
+class LLMGateway(Runnable[LanguageModelInput, BaseMessage]):
+    """Chat-model Runnable that sends each call to the first healthy provider.
+
+    Per provider: a token-bucket limiter (RPM/TPM), retries with full-jitter exponential
+    backoff on 429/5xx/connection errors (honouring Retry-After up to ``backoff_max``), and a
+    circuit breaker that only counts outages, not throttling. When a provider's retries are
+    exhausted, its breaker is open or it asks to wait longer than ``backoff_max``, the call
+    fails over to the next route. Non-retryable errors (400, 401, ...) are raised immediately.
+    """
+
+    def __init__(self, routes: List[ProviderRoute], max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 20.0, sleep: Callable[[float], None] = time.sleep):
+        if not routes:
+            raise ValueError("LLMGateway needs at least one provider route")
+        self.routes = routes
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+        self._clients: Dict[str, Any] = {}
+
+    @property
+    def primary(self) -> str:
+        return self.routes[0].name
+
+    def _client(self, route: ProviderRoute) -> Any:
+        if route.name not in self._clients:
+            self._clients[route.name] = route.factory()
+        return self._clients[route.name]
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        # the fair-share slot is held across retries and failover: it caps calls in flight per worker
+        with fair_slot("llm", cost=estimate_tokens(input), priority=INTERACTIVE):
+            return self._invoke(input, config, **kwargs)
+
+    def _invoke(self, input: Any, config: Optional[RunnableConfig], **kwargs: Any) -> BaseMessage:
+        last_error: Optional[BaseException] = None
+        for route in self.routes:
+            if not route.breaker.allow():
+                record_llm_gateway(route.name, "circuit_open")
+                continue
+            try:
+                llm = self._client(route)
+            except Exception as e:  # e.g. missing API key for a fallback provider
+                log.error("LLM provider unavailable", provider=route.name, error=str(e))
+                route.breaker.record_failure()
+                last_error = e
+                continue
+
+            estimated = estimate_tokens(input)
+            for attempt in range(self.max_retries + 1):
+                waited = route.limiter.acquire(estimated)
+                if waited:
+                    STAGE_SECONDS.labels("llm_gateway", "rate_limit_wait").observe(waited)
+                try:
+                    result = llm.invoke(input, config, **kwargs)
+                except Exception as e:
+                    if not is_retryable(e):
+                        route.breaker.record_success()  # the provider answered; the request is at fault
+                        raise
+                    last_error = e
+                    delay = retry_after(e)
+                    throttled = status_code(e) == 429
+                    if throttled:
+                        # throttling is not an outage: the limiter backs off, the breaker stays closed
+                        record_llm_gateway(route.name, "throttled")
+                        if delay and delay > self.backoff_max:
+                            break  # not worth waiting for; the next provider may answer now
+                        if delay:
+                            route.limiter.pause(delay)  # every caller on this provider backs off
+                    elif is_outage(e):
+                        route.breaker.record_failure()
+                    if attempt == self.max_retries or route.breaker.state != CircuitBreaker.CLOSED:
+                        break
+                    record_llm_gateway(route.name, "retry")
+                    log.warning("Retrying LLM call", provider=route.name, attempt=attempt + 1,
+                                status=status_code(e), error=str(e)[:200])
+                    if not (throttled and delay):  # a pause is waited out by limiter.acquire
+                        self.sleep(min(delay, self.backoff_max) if delay else self._backoff(attempt))
+                    continue
+
+                route.breaker.record_success()
+                usage = getattr(result, "usage_metadata", None) or {}
+                route.limiter.settle(estimated, usage.get("total_tokens"))
+                if route.name != self.primary:
+                    record_llm_gateway(route.name, "failover")
+                return result
+
+            record_llm_gateway(route.name, "exhausted")
+            log.error("LLM provider failed, failing over", provider=route.name, error=str(last_error)[:200])
+
+        raise last_error or RuntimeError("No LLM provider is available (all circuit breakers open)")
+
+
+_guards: Dict[str, Tuple[Tuple, ProviderRoute]] = {}  # name -> (limits it was built with, route)
+_guards_lock = threading.Lock()
+
+
+def provider_route(name: str, provider: LLMProviderSettings, gateway: LLMGatewaySettings,
+                   factory: Callable[[], Any]) -> ProviderRoute:
+    """Route for a provider whose limiter and breaker are shared by every caller in this worker.
+
+    They are rebuilt when a settings reload changes the provider's limits or the breaker
+    settings; callers holding the old route finish on the old instances.
+    """
+    limits = (provider.rpm, provider.tpm, gateway.failure_threshold, gateway.reset_timeout)
+    with _guards_lock:
+        built, guard = _guards.get(name, (None, None))
+        if guard is None or built != limits:
+            guard = ProviderRoute(name, factory, RateLimiter(provider.rpm, provider.tpm),
+                                  CircuitBreaker(gateway.failure_threshold, gateway.reset_timeout))
+            _guards[name] = (limits, guard)
+    return ProviderRoute(name, factory, guard.limiter, guard.breaker)
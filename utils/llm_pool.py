@@ -0,0 +1,104 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+
+from logger.custom_logger import CustomLogger
+from utils.config_loader import LLMPoolSettings, get_settings
+from utils.metrics import record_cache
+
+log = CustomLogger().get_logger(__file__)
+
+# (provider, model, temperature, max_tokens, base_url, gateway retries): every option a client is built with
+PoolKey = Tuple[str, str, float, int, Optional[str], bool]
+
+
+class LLMClientPool:
+    """Per-worker cache of chat model clients sharing one keep-alive HTTP connection pool.
+
+    Clients are keyed by the options they are built with (``PoolKey``) and built once; every
+    HTTP-based client created through the pool reuses the same httpx transports, so
+    connections (and their TLS sessions) survive across requests.
+    """
+
+    def __init__(self, pool_settings: Optional[LLMPoolSettings] = None):
+        self.pool_settings = pool_settings or get_settings().llm_pool
+        self._clients: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self._http_lock = threading.Lock()  # separate: factories call http_clients() under _lock
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.pool_settings.max_connections,
+            max_keepalive_connections=self.pool_settings.max_keepalive_connections,
+            keepalive_expiry=self.pool_settings.keepalive_expiry,
+        )
+
+    def http_clients(self) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        """Return the shared sync/async httpx clients, creating them on first use."""
+        with self._http_lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(limits=self._limits(), timeout=self.pool_settings.timeout)
+                self._http_async_client = httpx.AsyncClient(limits=self._limits(), timeout=self.pool_settings.timeout)
+                log.info("LLM HTTP pool created", max_connections=self.pool_settings.max_connections,
+                         keepalive=self.pool_settings.max_keepalive_connections)
+            return self._http_client, self._http_async_client  # type: ignore[return-value]
+
+    def get_or_create(self, key: PoolKey, factory: Callable[[], Any]) -> Any:
+        client = self._clients.get(key)
+        if client is not None:
+            self.hits += 1
+            record_cache("llm_client_pool", hit=True)
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = factory()
+                self._clients[key] = client
+                self.misses += 1
+                record_cache("llm_client_pool", hit=False)
+                log.info("LLM client added to pool", key=list(key), pooled=len(self._clients))
+            else:
+                self.hits += 1
+                record_cache("llm_client_pool", hit=True)
+            return client
+
+    def stats(self) -> Dict[str, int]:
+        return {"clients": len(self._clients), "hits": self.hits, "misses": self.misses}
+
+    async def aclose(self) -> None:
+        """Drop pooled clients and close the shared HTTP connections."""
+        with self._lock, self._http_lock:
+            sync_client, async_client = self._http_client, self._http_async_client
+            self._http_client = self._http_async_client = None
+            self._clients.clear()
+        if sync_client is not None:
+            sync_client.close()
+        if async_client is not None:
+            await async_client.aclose()
+        log.info("LLM client pool closed")
+
+
+_pool: Optional[LLMClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_llm_pool() -> LLMClientPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = LLMClientPool()
+    return _pool
+
+
+async def close_llm_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        await pool.aclose()
@@ -0,0 +1,227 @@
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+from utils.profiling import current_profile
+
+# When PROMETHEUS_MULTIPROC_DIR is set (see Dockerfile) every uvicorn worker writes its
+# samples there and /metrics aggregates all workers; otherwise the per-process registry is used.
+# The directory must be emptied before the server starts (the Dockerfile CMD does), or the
+# files of a previous run's workers are merged in too.
+
+STAGE_SECONDS = Histogram(
+    "docportal_stage_seconds",
+    "Wall-clock time spent in a pipeline stage.",
+    ["component", "stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+BYTES_PROCESSED = Counter("docportal_bytes_processed_total", "Bytes of uploaded documents processed.", ["component"])
+PAGES_PROCESSED = Counter("docportal_pages_processed_total", "Document pages parsed.", ["component"])
+CHUNKS_EMBEDDED = Counter("docportal_chunks_embedded_total", "Chunks sent through the embedding model.", ["component"])
+EMBEDDING_THROUGHPUT = Histogram(
+    "docportal_embedding_chunks_per_second",
+    "Embedding throughput per batch call.",
+    ["component"],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+CHUNKS_DEDUPLICATED = Counter("docportal_chunks_deduplicated_total",
+                              "Near-duplicate chunks dropped before embedding.", ["component"])
+CACHE_REQUESTS = Counter("docportal_cache_requests_total", "Cache lookups by outcome (hit ratio = hit / total).",
+                         ["cache", "result"])
+LLM_TOKENS = Counter("docportal_llm_tokens_total", "LLM tokens consumed.", ["component", "model", "kind"])
+CONTEXT_TOKENS = Counter("docportal_rag_context_tokens_total",
+                         "RAG prompt context tokens: retrieved (naive join) vs sent after assembly.", ["component", "kind"])
+LLM_GATEWAY_EVENTS = Counter("docportal_llm_gateway_events_total",
+                             "LLM gateway retries, throttles, open circuits and failovers.", ["provider", "event"])
+EXTRACTED_PAGES = Counter("docportal_extracted_pages_total", "Pages produced by each text extractor.", ["extractor"])
+EXTRACTED_BYTES = Counter("docportal_extracted_bytes_total", "File bytes read by each text extractor.", ["extractor"])
+EXTRACTION_THROUGHPUT = Histogram(
+    "docportal_extraction_pages_per_second",
+    "Extractor throughput per file (cache misses only).",
+    ["extractor"],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+RETRIEVED_CHUNKS = Histogram(
+    "docportal_retrieved_chunks",
+    "Chunks per query: fetched from the index vs kept after the adaptive cutoff.",
+    ["mode", "kind"],
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50),
+)
+STRUCTURED_OUTPUT = Counter("docportal_structured_output_total",
+                            "LLM JSON replies by parse outcome (clean, repaired, unvalidated, llm_fallback, failed).",
+                            ["component", "outcome"])
+FAIR_QUEUE_DEPTH = Gauge("docportal_fair_queue_depth", "Calls waiting for an embedding/LLM slot.",
+                         ["resource", "priority"], multiprocess_mode="livesum")
+FAIR_WAIT_SECONDS = Histogram(
+    "docportal_fair_wait_seconds",
+    "Time a call waited for an embedding/LLM slot under fair scheduling.",
+    ["resource", "priority"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+STAGE_PEAK_BYTES = Histogram(
+    "docportal_stage_peak_bytes",
+    "Peak Python heap growth during a pipeline stage (tracemalloc; only when admission.trace_stages).",
+    ["component", "stage"],
+    buckets=tuple(2 ** n * 1024 * 1024 for n in range(0, 13)),  # 1 MB .. 4 GB
+)
+ADMISSION_EVENTS = Counter("docportal_admission_total",
+                           "Upload requests by admission outcome (admitted, queued, rejected, timed_out, too_large).",
+                           ["endpoint", "outcome"])
+ADMISSION_RESERVED_BYTES = Gauge("docportal_admission_reserved_bytes",
+                                 "Memory reserved by admitted upload requests.", multiprocess_mode="livesum")
+ADMISSION_QUEUED = Gauge("docportal_admission_queued", "Upload requests waiting for memory.",
+                         multiprocess_mode="livesum")
+
+
+@contextmanager
+def track_stage(component: str, stage: str) -> Iterator[None]:
+    """Time a block and record it in the stage histogram (and the request profile, if any)."""
+    profile = current_profile()
+    if profile:
+        profile.enter_stage()
+    # peak is process-wide: concurrent stages share (and reset) it, so this is an upper bound
+    traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    if traced is not None:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.labels(component, stage).observe(seconds)
+        if traced is not None and tracemalloc.is_tracing():
+            STAGE_PEAK_BYTES.labels(component, stage).observe(max(0, tracemalloc.get_traced_memory()[1] - traced))
+        if profile:
+            profile.exit_stage(component, stage, start, seconds)
+
+
+def record_bytes(component: str, nbytes: int) -> None:
+    BYTES_PROCESSED.labels(component).inc(nbytes)
+
+
+def record_pages(component: str, pages: int) -> None:
+    PAGES_PROCESSED.labels(component).inc(pages)
+
+
+def record_embedding(component: str, chunks: int, seconds: float) -> None:
+    CHUNKS_EMBEDDED.labels(component).inc(chunks)
+    if chunks and seconds > 0:
+        EMBEDDING_THROUGHPUT.labels(component).observe(chunks / seconds)
+
+
+def record_dedup(component: str, dropped: int) -> None:
+    if dropped:
+        CHUNKS_DEDUPLICATED.labels(component).inc(dropped)
+
+
+def record_cache(cache: str, hit: bool, count: int = 1) -> None:
+    if count:
+        CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc(count)
+
+
+def record_context_tokens(component: str, retrieved: int, sent: int) -> None:
+    CONTEXT_TOKENS.labels(component, "retrieved").inc(retrieved)
+    CONTEXT_TOKENS.labels(component, "sent").inc(sent)
+
+
+def record_llm_gateway(provider: str, event: str) -> None:
+    LLM_GATEWAY_EVENTS.labels(provider, event).inc()
+
+
+def record_extraction(extractor: str, pages: int, nbytes: int, seconds: float) -> None:
+    EXTRACTED_PAGES.labels(extractor).inc(pages)
+    EXTRACTED_BYTES.labels(extractor).inc(nbytes)
+    if pages and seconds > 0:
+        EXTRACTION_THROUGHPUT.labels(extractor).observe(pages / seconds)
+
+
+def record_retrieval(mode: str, fetched: int, kept: int) -> None:
+    RETRIEVED_CHUNKS.labels(mode, "fetched").observe(fetched)
+    RETRIEVED_CHUNKS.labels(mode, "kept").observe(kept)
+
+
+def record_structured_output(component: str, outcome: str) -> None:
+    STRUCTURED_OUTPUT.labels(component, outcome).inc()
+
+
+def record_fair_wait(resource: str, priority: str, seconds: float) -> None:
+    FAIR_WAIT_SECONDS.labels(resource, priority).observe(seconds)
+
+
+def set_fair_queue_depth(resource: str, priority: str, depth: int) -> None:
+    FAIR_QUEUE_DEPTH.labels(resource, priority).set(depth)
+
+
+def record_admission(endpoint: str, outcome: str) -> None:
+    ADMISSION_EVENTS.labels(endpoint, outcome).inc()
+
+
+def set_admission_state(reserved_bytes: int, queued: int) -> None:
+    ADMISSION_RESERVED_BYTES.set(reserved_bytes)
+    ADMISSION_QUEUED.set(queued)
+
+
+def record_llm_usage(component: str, model: str, usage: Optional[Dict[str, Any]]) -> None:
+    """Record token counts from a LangChain ``usage_metadata`` dict."""
+    if not usage:
+        return
+    for kind in ("input_tokens", "output_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.labels(component, model or "unknown", kind.replace("_tokens", "")).inc(usage[kind])
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """LangChain callback that records LLM latency and token usage for one component.
+
+    Pass it via ``chain.invoke(..., config={"callbacks": [LLMMetricsCallback("rag")]})`` so
+    LLM calls nested inside LCEL chains are measured separately from retrieval.
+    """
+
+    def __init__(self, component: str):
+        self.component = component
+        self._started: Dict[UUID, Tuple[float, str]] = {}
+
+    def _start(self, serialized: Optional[Dict[str, Any]], run_id: UUID, kwargs: Dict[str, Any]) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or ""
+        self._started[run_id] = (time.perf_counter(), model)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(serialized, run_id, kwargs)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(serialized, run_id, kwargs)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        start, model = self._started.pop(run_id, (None, ""))
+        if start is not None:
+            STAGE_SECONDS.labels(self.component, "llm").observe(time.perf_counter() - start)
+        for generations in response.generations:
+            for gen in generations:
+                message = getattr(gen, "message", None)
+                record_llm_usage(self.component, model, getattr(message, "usage_metadata", None))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started.pop(run_id, None)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Serialize metrics in Prometheus text format, aggregated across workers when configured."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead() -> None:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,9 +1,13 @@
 import os
 import sys
 import json
-from dotenv import load_dotenv
-#load_dotenv()
-from utils.config_loader import load_config
+import threading
+from functools import partial
+from typing import Dict, Optional, Tuple
+from utils.config_loader import LLMProviderSettings, Settings, get_settings
+from utils.llm_pool import PoolKey, get_llm_pool
+from utils.llm_gateway import LLMGateway, provider_route
+from utils.embedding_backend import sentence_transformer_kwargs
 from logger.custom_logger import CustomLogger
 from exception.custom_exception_archive import DocumentPortalException
 
@@ -59,27 +63,38 @@ class ApiKeyManager:
         return val
 
 
+_embeddings_cache: Dict[Tuple, HuggingFaceEmbeddings] = {}
+_embeddings_lock = threading.Lock()
+
+_api_key_mgr: Optional[ApiKeyManager] = None
+_api_key_lock = threading.Lock()
+
+
+def get_api_key_manager() -> ApiKeyManager:
+    """Resolve API keys from the environment once per process."""
+    global _api_key_mgr
+    if _api_key_mgr is None:
+        with _api_key_lock:
+            if _api_key_mgr is None:
+                get_settings()  # ensures .env is loaded before keys are read
+                _api_key_mgr = ApiKeyManager()
+    return _api_key_mgr
 
 
 class ModelLoader:
     """Class to load and manage models and embeddings."""
     
-    def __init__(self):
-        if os.getenv("ENV", "local").lower() != "production":
-            load_dotenv()
-            log.info("Running in LOCAL mode: .env loaded")
-        else:
-            log.info("Running in PRODUCTION mode")
-        
-        self.api_key_mgr = ApiKeyManager()
-        self.config = load_config()
-        log.info("YAML config loaded", config_keys=list(self.config.keys()))
-
-        # load_dotenv()
-        # self._validate_env()
-        # self.config = load_config()
-        # log.info("Configuration loaded successfully.", config_keys=list(self.config.keys()))
-    
+    def __init__(self, settings: Optional[Settings] = None):
+        self.settings = settings or get_settings()
+
+    @property
+    def api_key_mgr(self) -> ApiKeyManager:
+        return get_api_key_manager()
+
+    @property
+    def config(self) -> dict:
+        return self.settings.model_dump()
+
     # def _validate_env(self):
     #     """Validate required environment variables.Ensure API keys are exists."""
     #     required_vars = ["GROQ_API_KEY","GEMINI_API_KEY"]
@@ -91,12 +106,21 @@ class ModelLoader:
     #     log.info("Environment variables validated successfully.", available_keys=[key for key in self.api_keys if self.api_keys[key]])
         
     def load_embeddings(self):
-        """Load and return the embeddings model."""
+        """Load and return the embeddings model.
+
+        The model is loaded once per (model, backend, threads) and shared by the worker;
+        ``embedding_model.backend`` selects PyTorch, ONNX Runtime or int8-quantized ONNX.
+        """
         try:
-            log.info("Loading embeddings model...")
-            model_name =self.config["embedding_model"]["embedding_model_name"]
-            log.info("Loading embeddings model returning...")
-            return HuggingFaceEmbeddings(model_name=model_name)
+            cfg = self.settings.embedding_model
+            key = (cfg.embedding_model_name, cfg.backend, cfg.threads, cfg.onnx_file_name)
+            with _embeddings_lock:
+                if key not in _embeddings_cache:
+                    log.info("Loading embeddings model...", model=cfg.embedding_model_name, backend=cfg.backend,
+                             threads=cfg.threads)
+                    _embeddings_cache[key] = HuggingFaceEmbeddings(model_name=cfg.embedding_model_name,
+                                                                   model_kwargs=sentence_transformer_kwargs(cfg))
+            return _embeddings_cache[key]
              
         
         except Exception as e:
@@ -104,39 +128,83 @@ class ModelLoader:
             raise DocumentPortalException("Failed to Load Embedding model",sys)
         
     
-    def load_llm(self):
-         """Load the LLM Model. Load the LLM model based on the configuration dynamically."""
-         llm_block = self.config["llm"]
-         provider_key = os.getenv("LLM_PROVIDER","groq") # default to groq if not set
+    def load_llm(self, provider_key: Optional[str] = None):
+         """Load the LLM Model. Load the LLM model based on the configuration dynamically.
+
+         With ``llm_gateway.enabled`` the result is an LLMGateway: ``provider_key`` (default
+         LLM_PROVIDER) is the primary route and the providers listed in ``llm_gateway.failover``
+         are tried after it, each behind its own rate limiter and circuit breaker.
+         """
+         provider_key = provider_key or self.settings.llm_provider # default to groq if not set
+         gateway = self.settings.llm_gateway
+         if not gateway.enabled:
+             return self.load_client(provider_key)
          
+         self._provider_config(provider_key)
+         order = [provider_key] + [k for k in gateway.failover if k != provider_key and k in self.settings.llm]
+         routes = [provider_route(k, self.settings.llm[k], gateway, partial(self.load_client, k)) for k in order]
+         return LLMGateway(routes, max_retries=gateway.max_retries, backoff_base=gateway.backoff_base,
+                           backoff_max=gateway.backoff_max)
+
+    def load_client(self, provider_key: Optional[str] = None):
+         """Raw chat model client for one provider.
+
+         Clients come from the worker-wide LLMClientPool, so repeated calls with the same
+         client options (see ``_pool_key``) return the same client and connections.
+         """
+         llm_config = self._provider_config(provider_key or self.settings.llm_provider)
+         return get_llm_pool().get_or_create(self._pool_key(llm_config), lambda: self._build_llm(llm_config))
+
+    def _pool_key(self, llm_config: LLMProviderSettings) -> PoolKey:
+         """Everything ``_build_llm`` builds a client from, so a reloaded config never gets a stale client."""
+         return (llm_config.provider, llm_config.model_name, llm_config.temperature, llm_config.max_tokens,
+                 llm_config.base_url, self.settings.llm_gateway.enabled)
+
+    def _provider_config(self, provider_key: str) -> LLMProviderSettings:
+         llm_block = self.settings.llm
          if provider_key not in llm_block:
              log.error(f"Provider '{provider_key}' not found in configuration.")
              raise ValueError(f"Provider '{provider_key}' not found in configuration.")
+         return llm_block[provider_key]
+
+    def _build_llm(self, llm_config: LLMProviderSettings):
+         provider = llm_config.provider
+         model_name = llm_config.model_name
+         temperature = llm_config.temperature
+         max_tokens = llm_config.max_tokens
          
-         llm_config = llm_block[provider_key]
-         provider = llm_config.get("provider")
-         model_name = llm_config.get("model_name")
-         temperature = llm_config.get("temperature", 0.2)
-         max_tokens = llm_config.get("max_tokens", 2048)
+         # the gateway owns retries; SDK-level retries would multiply attempts and hide 429s
+         gateway_retries = self.settings.llm_gateway.enabled
          
          log.info(f"Loading LLM model from provider: {provider}, model: {model_name}" ,temperature=temperature, max_tokens=max_tokens)
          
          if provider == "groq":
+             http_client, http_async_client = get_llm_pool().http_clients()
+             extra = {"base_url": llm_config.base_url} if llm_config.base_url else {}
+             if gateway_retries:
+                 extra["max_retries"] = 0
              llm = ChatGroq(
                  model=model_name,
                  api_key=self.api_key_mgr.get("GROQ_API_KEY"),
                  temperature=temperature,
-                 max_tokens=max_tokens
+                 max_tokens=max_tokens,
+                 http_client=http_client,
+                 http_async_client=http_async_client,
+                 **extra
              )
              
              return llm
          
-         elif provider == "gemini":
+         elif provider in ("google", "gemini"):
+             extra = {"client_options": {"api_endpoint": llm_config.base_url}, "transport": "rest"} if llm_config.base_url else {}
+             if gateway_retries:
+                 extra["max_retries"] = 1  # attempts, not retries, for this client
              llm = ChatGoogleGenerativeAI(
                  model=model_name,
                  api_key=self.api_key_mgr.get("GEMINI_API_KEY"),
                  temperature=temperature,
-                 max_tokens=max_tokens
+                 max_tokens=max_tokens,
+                 **extra
              )
              return llm
          
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import zstandard
+
+from logger.custom_logger import CustomLogger
+from utils.config_loader import get_settings
+from utils.metrics import record_cache
+
+log = CustomLogger().get_logger(__file__)
+
+# A parsed document: {"metadata": {...document-level...}, "pages": [{"page": 0, "text": "...", ...}]}
+Parsed = Dict[str, Any]
+
+
+def file_digest(path: os.PathLike) -> str:
+    with open(path, "rb") as fh:
+        return hashlib.file_digest(fh, "sha256").hexdigest()
+
+
+def extract_pdf_pymupdf(path: os.PathLike) -> Parsed:
+    """Per-page text and metadata with PyMuPDF; the canonical PDF parse shared by every endpoint."""
+    with fitz.open(str(path)) as doc:
+        meta = {k: v for k, v in (doc.metadata or {}).items() if v}
+        meta.update(page_count=doc.page_count, is_encrypted=bool(doc.is_encrypted))
+        pages = []
+        if not doc.is_encrypted:
+            for page_num in range(doc.page_count):
+                page = doc.load_page(page_num)
+                pages.append({"page": page_num, "text": page.get_text()})  # type: ignore
+    return {"metadata": meta, "pages": pages}
+
+
+class ParsedDocumentCache:
+    """Content-addressed, zstd-compressed cache of extracted page text.
+
+    Entries are keyed by (sha256 of the file bytes, extractor name), so the same upload
+    parsed by /analyze, /compare or /chat/index is only ever parsed once. Writes are atomic
+    (temp file + rename) and therefore safe across uvicorn workers; any worker may prune an
+    entry another is reading, which then counts as a miss or is skipped.
+    """
+
+    def __init__(self, cache_dir: os.PathLike, compression_level: int = 3, max_bytes: Optional[int] = None,
+                 prune_every: int = 100):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.compression_level = compression_level
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._prune_thread: Optional[threading.Thread] = None
+
+    def _entry_path(self, digest: str, extractor: str) -> Path:
+        return self.cache_dir / digest[:2] / f"{digest}.{extractor}.json.zst"
+
+    def get(self, digest: str, extractor: str) -> Optional[Parsed]:
+        path = self._entry_path(digest, extractor)
+        try:
+            raw = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            parsed = json.loads(zstandard.ZstdDecompressor().decompress(raw))
+        except Exception as e:
+            log.warning("Corrupt parse cache entry dropped", path=str(path), error=str(e))
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)  # LRU bookkeeping for prune()
+        except FileNotFoundError:
+            pass  # pruned by another worker since the read; the content is still good
+        return parsed
+
+    def put(self, digest: str, extractor: str, parsed: Parsed) -> None:
+        path = self._entry_path(digest, extractor)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = zstandard.ZstdCompressor(level=self.compression_level).compress(
+            json.dumps(parsed, ensure_ascii=False).encode("utf-8"))
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._puts += 1
+            due = self.max_bytes is not None and self._puts % self.prune_every == 0
+            if due and (self._prune_thread is None or not self._prune_thread.is_alive()):
+                # the listing walks the whole cache; keep it off the request that happened to be the 100th
+                self._prune_thread = threading.Thread(target=self._prune_quietly, name="parse-cache-prune",
+                                                      daemon=True)
+                self._prune_thread.start()
+
+    def _prune_quietly(self) -> None:
+        try:
+            self.prune()
+        except Exception as e:
+            log.error("Parse cache prune failed", error=str(e))
+
+    def get_or_parse(self, path: os.PathLike, extractor: str, parse_fn: Callable[[os.PathLike], Parsed]) -> Tuple[Parsed, bool]:
+        """Return (parsed, hit). A hit costs one hash of the file plus one decompress."""
+        digest = file_digest(path)
+        parsed = self.get(digest, extractor)
+        record_cache("parsed_document", hit=parsed is not None)
+        if parsed is not None:
+            return parsed, True
+        parsed = parse_fn(path)
+        self.put(digest, extractor, parsed)
+        return parsed, False
+
+    def prune(self) -> int:
+        """Delete least-recently-used entries until the cache fits ``max_bytes``."""
+        if self.max_bytes is None:
+            return 0
+        entries = []
+        for p in self.cache_dir.glob("*/*.json.zst"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:  # removed by a concurrent prune in another worker
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, p in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        if removed:
+            log.info("Parse cache pruned", removed=removed, remaining_bytes=total)
+        return removed
+
+
+_cache: Optional[ParsedDocumentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> Optional[ParsedDocumentCache]:
+    """Process-wide cache, or None when ``parse_cache.enabled`` is false."""
+    global _cache
+    cfg = get_settings().parse_cache
+    if not cfg.enabled:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ParsedDocumentCache(
+                    cfg.dir, compression_level=cfg.compression_level,
+                    max_bytes=int(cfg.max_mb * 1024 * 1024) if cfg.max_mb else None)
+    return _cache
+
+
+def set_parse_cache(cache: Optional[ParsedDocumentCache]) -> None:
+    """Swap the process-wide cache (e.g. a private directory for benchmarks and tests)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def parse_pdf(path: os.PathLike) -> Parsed:
+    """Parsed PDF pages, served from the shared cache when possible."""
+    cache = get_parse_cache()
+    if cache is None:
+        return extract_pdf_pymupdf(path)
+    parsed, _ = cache.get_or_parse(path, "pymupdf", extract_pdf_pymupdf)
+    return parsed
@@ -0,0 +1,183 @@
+"""Opt-in per-request profiling.
+
+With ``profiling.enabled`` a request is profiled when it carries the configured header
+(``X-Profile: 1``) or is picked by ``sample_rate``. While it runs, a sampler thread reads the
+stacks of the threads working on it (``sys._current_frames``): the event-loop thread plus
+any worker thread currently inside one of its ``track_stage`` blocks. Every ``track_stage``
+block is also recorded with its wall-clock offset and duration.
+
+Each profile is written to ``profiling.dir`` as ``<id>.folded`` (collapsed stacks for
+flamegraph.pl, speedscope or inferno) and ``<id>.json`` (request, stage breakdown, sample
+counts). The id is returned in the ``X-Profile-Id`` response header.
+
+The event loop is shared, so loop-thread samples can include other concurrent requests.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from logger.custom_logger import CustomLogger
+from utils.config_loader import ProfilingSettings, get_settings
+
+log = CustomLogger().get_logger(__file__)
+
+PROFILE_ID_HEADER = "X-Profile-Id"
+_TRUTHY = {"1", "true", "yes", "on"}
+
+_active: ContextVar[Optional["RequestProfile"]] = ContextVar("docportal_request_profile", default=None)
+
+
+def current_profile() -> Optional["RequestProfile"]:
+    return _active.get()
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def fold_stack(frame) -> str:
+    """Collapsed-stack line (root first, ``;``-separated) for ``frame`` and its callers."""
+    names: List[str] = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class RequestProfile:
+    """Samples and stage timings for one request; shared by every thread working on it."""
+
+    def __init__(self, method: str, path: str, interval: float = 0.005):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.stages: List[Dict[str, Any]] = []
+        self._threads: Dict[int, int] = defaultdict(int)
+        self._pinned = threading.get_ident()  # the event-loop thread handling the request
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def enter_stage(self) -> None:
+        with self._lock:
+            self._threads[threading.get_ident()] += 1
+
+    def exit_stage(self, component: str, stage: str, start: float, seconds: float) -> None:
+        tid = threading.get_ident()
+        with self._lock:
+            self._threads[tid] -= 1
+            if self._threads[tid] <= 0:
+                del self._threads[tid]
+            self.stages.append({"component": component, "stage": stage, "thread": tid,
+                                "start_ms": round(1000 * (start - self.started), 3),
+                                "duration_ms": round(1000 * seconds, 3)})
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                tids = {self._pinned, *self._threads}
+            frames = sys._current_frames()
+            for tid in tids:
+                frame = frames.get(tid)
+                if frame is None or tid == own:
+                    continue
+                self.stacks[f"{names.get(tid, tid)};{fold_stack(frame)}"] += 1
+            self.samples += 1
+
+    def start(self) -> None:
+        self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.id}", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> float:
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        return time.perf_counter() - self.started
+
+    def report(self, status: Optional[int], seconds: float) -> Dict[str, Any]:
+        totals: Dict[str, float] = defaultdict(float)
+        for s in self.stages:
+            totals[f"{s['component']}/{s['stage']}"] += s["duration_ms"]
+        return {"id": self.id, "method": self.method, "path": self.path, "status": status,
+                "duration_ms": round(1000 * seconds, 3), "interval_ms": 1000 * self.interval,
+                "samples": self.samples, "stage_totals_ms": {k: round(v, 3) for k, v in sorted(totals.items())},
+                "stages": sorted(self.stages, key=lambda s: s["start_ms"])}
+
+    def write(self, directory: Path, status: Optional[int], seconds: float, max_profiles: int) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        folded = directory / f"{self.id}.folded"
+        folded.write_text("".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()),
+                          encoding="utf-8")
+        (directory / f"{self.id}.json").write_text(json.dumps(self.report(status, seconds), indent=2),
+                                                   encoding="utf-8")
+        _prune(directory, max_profiles)
+        return folded
+
+
+def _prune(directory: Path, max_profiles: int) -> None:
+    reports = sorted(directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in reports[max_profiles:]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".folded").unlink(missing_ok=True)
+
+
+def wants_profile(cfg: ProfilingSettings, headers: Dict[str, str]) -> bool:
+    if not cfg.enabled:
+        return False
+    if headers.get(cfg.header.lower(), "").strip().lower() in _TRUTHY:
+        return True
+    return cfg.sample_rate > 0 and random.random() < cfg.sample_rate
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles selected requests (see the module docstring)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        cfg = get_settings().profiling
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        if not wants_profile(cfg, headers):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope.get("method", ""), scope.get("path", ""), interval=cfg.interval_ms / 1000)
+        status: List[int] = []
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+                message["headers"] = [*message.get("headers", []),
+                                      (PROFILE_ID_HEADER.lower().encode(), profile.id.encode())]
+            await send(message)
+
+        token = _active.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            seconds = profile.stop()
+            _active.reset(token)
+            try:
+                path = profile.write(Path(cfg.dir), status[0] if status else None, seconds, cfg.max_profiles)
+                log.info("Request profile written", profile_id=profile.id, path=str(path), request=profile.path,
+                         duration_ms=round(1000 * seconds, 1), samples=profile.samples)
+            except OSError as e:
+                log.error("Failed to write request profile", profile_id=profile.id, error=str(e))
@@ -0,0 +1,321 @@
+"""Session lifecycle: last-access tracking, in-use leases and TTL / disk-quota eviction.
+
+Run once from the command line:
+
+    python -m utils.session_janitor --dry-run
+    python -m utils.session_janitor --ttl-hours 24 --max-total-mb 2048
+
+or let the API run it in the background (``session_janitor.enabled`` in config.yaml).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import fcntl
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from logger.custom_logger import CustomLogger
+from utils.config_loader import get_settings
+
+log = CustomLogger().get_logger(__file__)
+
+ACCESS_MARKER = ".last_access"
+LEASE_PREFIX = ".lease-"
+LEASE_LOCK = ".lease.lock"
+TRASH_PREFIX = ".trash-"
+
+
+# ----------------------------- #
+# Access tracking and leases    #
+# ----------------------------- #
+def touch_session(path: os.PathLike) -> None:
+    """Record that a session directory was just used."""
+    path = Path(path)
+    if path.is_dir():
+        (path / ACCESS_MARKER).touch()
+
+
+def last_access(path: Path) -> float:
+    marker = path / ACCESS_MARKER
+    try:
+        return max(marker.stat().st_mtime, path.stat().st_mtime)
+    except FileNotFoundError:
+        return path.stat().st_mtime
+
+
+def _lock_session(path: Path):
+    """Open ``path``'s lease lock shared, recreating the directory if it was evicted meanwhile.
+
+    The janitor holds the lock exclusively while it renames a session away, so once the
+    shared lock is held on the lock file that is still in ``path``, eviction is blocked.
+    """
+    while True:
+        path.mkdir(parents=True, exist_ok=True)
+        fh = open(path / LEASE_LOCK, "a")
+        fcntl.flock(fh, fcntl.LOCK_SH)
+        try:
+            if os.stat(path / LEASE_LOCK).st_ino == os.fstat(fh.fileno()).st_ino:
+                return fh
+        except FileNotFoundError:
+            pass
+        fh.close()  # locked a file the janitor had already moved to the trash; retry
+
+
+@contextmanager
+def session_lease(*paths: os.PathLike) -> Iterator[None]:
+    """Mark session directories as in use (being written or loaded) for the duration of the block.
+
+    Leases are files named after the owning pid, so they are visible to the janitor in
+    every worker process and leases left by a crashed process are ignored. A shared lock
+    on the session's lease lock is held for the whole block as well, so a lease cannot be
+    taken between the janitor's in-use check and its rename.
+    """
+    leases: List[Path] = []
+    locks = []
+    try:
+        for p in paths:
+            p = Path(p)
+            locks.append(_lock_session(p))
+            lease = p / f"{LEASE_PREFIX}{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            lease.touch()
+            leases.append(lease)
+            touch_session(p)
+        yield
+    finally:
+        for lease in leases:
+            lease.unlink(missing_ok=True)
+        for fh in locks:
+            fh.close()  # releases the lock
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def is_in_use(path: Path) -> bool:
+    for lease in path.glob(f"{LEASE_PREFIX}*"):
+        try:
+            pid = int(lease.name[len(LEASE_PREFIX):].split("-", 1)[0])
+        except ValueError:
+            continue
+        if _pid_alive(pid):
+            return True
+        lease.unlink(missing_ok=True)  # stale lease from a dead worker
+    return False
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+# ----------------------------- #
+# Janitor                       #
+# ----------------------------- #
+@dataclass
+class SessionInfo:
+    session_id: str
+    paths: List[Path] = field(default_factory=list)
+    last_access: float = 0.0
+    size_bytes: int = 0
+    in_use: bool = False
+
+
+@dataclass
+class SweepReport:
+    sessions: int = 0
+    total_bytes: int = 0
+    expired: List[str] = field(default_factory=list)
+    over_quota: List[str] = field(default_factory=list)
+    skipped_in_use: List[str] = field(default_factory=list)
+    freed_bytes: int = 0
+    dry_run: bool = False
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+class SessionJanitor:
+    """Evict session directories by TTL, then by total disk quota in least-recently-used order.
+
+    A session is identified by its directory name and may span several roots (for example
+    ``data/<id>`` and ``faiss_index/<id>``); all of its directories are evicted together.
+    Sessions holding a live lease are never deleted. ``on_evict`` is called with the id of
+    every evicted session to drop state kept outside its directories (e.g. chat memory).
+    """
+
+    def __init__(self, roots: Sequence[os.PathLike], ttl_seconds: Optional[float] = None,
+                 max_total_bytes: Optional[int] = None, lock_path: Optional[os.PathLike] = None,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        self.roots = [Path(r) for r in roots]
+        self.ttl_seconds = ttl_seconds
+        self.max_total_bytes = max_total_bytes
+        self.lock_path = Path(lock_path) if lock_path else None
+        self.on_evict = on_evict
+
+    @classmethod
+    def from_settings(cls, on_evict: Optional[Callable[[str], None]] = None) -> "SessionJanitor":
+        cfg = get_settings().session_janitor
+        return cls(
+            roots=cfg.roots,
+            ttl_seconds=cfg.ttl_hours * 3600 if cfg.ttl_hours else None,
+            max_total_bytes=int(cfg.max_total_mb * 1024 * 1024) if cfg.max_total_mb else None,
+            lock_path=cfg.lock_path,
+            on_evict=on_evict,
+        )
+
+    def scan(self) -> List[SessionInfo]:
+        root_set = {r.resolve() for r in self.roots}
+        sessions: Dict[str, SessionInfo] = {}
+        for root in self.roots:
+            if not root.is_dir():
+                continue
+            for child in root.iterdir():
+                if not child.is_dir() or child.name.startswith(".") or child.resolve() in root_set:
+                    continue
+                info = sessions.setdefault(child.name, SessionInfo(session_id=child.name))
+                info.paths.append(child)
+                info.last_access = max(info.last_access, last_access(child))
+                info.size_bytes += _dir_size(child)
+                info.in_use = info.in_use or is_in_use(child)
+        return sorted(sessions.values(), key=lambda s: s.last_access)
+
+    def _evict(self, info: SessionInfo, dry_run: bool) -> bool:
+        if dry_run:
+            return True
+        locks = []
+        try:
+            for p in info.paths:
+                try:
+                    fh = open(p / LEASE_LOCK, "a")
+                except FileNotFoundError:
+                    continue
+                locks.append(fh)
+                try:
+                    fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:  # a lease holds it
+                    return False
+            if any(is_in_use(p) for p in info.paths):  # re-check right before deleting
+                return False
+            trashed = []
+            for p in info.paths:
+                trash = p.with_name(f"{TRASH_PREFIX}{p.name}-{uuid.uuid4().hex[:6]}")
+                try:
+                    os.replace(p, trash)  # atomic: no reader ever sees a half-deleted session
+                except FileNotFoundError:
+                    continue
+                trashed.append(trash)
+        finally:
+            for fh in locks:
+                fh.close()
+        for trash in trashed:
+            shutil.rmtree(trash, ignore_errors=True)
+        if self.on_evict is not None:
+            try:
+                self.on_evict(info.session_id)
+            except Exception as e:  # the files are gone either way; do not abort the sweep
+                log.error("Session eviction hook failed", session_id=info.session_id, error=str(e))
+        log.info("Session evicted", session_id=info.session_id, paths=[str(p) for p in info.paths],
+                 size_bytes=info.size_bytes)
+        return True
+
+    def sweep(self, dry_run: bool = False, now: Optional[float] = None) -> SweepReport:
+        now = now or time.time()
+        sessions = self.scan()
+        report = SweepReport(sessions=len(sessions), total_bytes=sum(s.size_bytes for s in sessions), dry_run=dry_run)
+        remaining = report.total_bytes
+        survivors: List[SessionInfo] = []
+
+        for info in sessions:
+            if self.ttl_seconds is not None and now - info.last_access > self.ttl_seconds:
+                if info.in_use:
+                    report.skipped_in_use.append(info.session_id)
+                elif self._evict(info, dry_run):
+                    report.expired.append(info.session_id)
+                    report.freed_bytes += info.size_bytes
+                    remaining -= info.size_bytes
+                    continue
+            survivors.append(info)
+
+        if self.max_total_bytes is not None:
+            for info in survivors:  # oldest access first
+                if remaining <= self.max_total_bytes:
+                    break
+                if info.in_use:
+                    if info.session_id not in report.skipped_in_use:
+                        report.skipped_in_use.append(info.session_id)
+                elif self._evict(info, dry_run):
+                    report.over_quota.append(info.session_id)
+                    report.freed_bytes += info.size_bytes
+                    remaining -= info.size_bytes
+
+        log.info("Session sweep finished", **report.as_dict())
+        return report
+
+    def sweep_exclusive(self, dry_run: bool = False) -> Optional[SweepReport]:
+        """Sweep unless another worker already holds the janitor lock."""
+        if self.lock_path is None:
+            return self.sweep(dry_run)
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "w") as fh:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            try:
+                return self.sweep(dry_run)
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    async def run_forever(self, interval_seconds: float) -> None:
+        """Background loop for the API process; cancel the task to stop it."""
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep_exclusive)
+            except Exception as e:
+                log.error("Session sweep failed", error=str(e))
+            await asyncio.sleep(interval_seconds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evict expired / over-quota session data.")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be deleted")
+    parser.add_argument("--ttl-hours", type=float, default=None)
+    parser.add_argument("--max-total-mb", type=float, default=None)
+    parser.add_argument("--root", action="append", default=None, help="session root (repeatable)")
+    args = parser.parse_args()
+
+    from src.document_chat.chat_memory import forget_session  # the CLI runs outside the API process
+
+    janitor = SessionJanitor.from_settings(on_evict=forget_session)
+    if args.root:
+        janitor.roots = [Path(r) for r in args.root]
+    if args.ttl_hours is not None:
+        janitor.ttl_seconds = args.ttl_hours * 3600
+    if args.max_total_mb is not None:
+        janitor.max_total_bytes = int(args.max_total_mb * 1024 * 1024)
+    report = janitor.sweep_exclusive(dry_run=args.dry_run)
+    print(report.as_dict() if report else "Another janitor is running; skipped.")
+
+
+if __name__ == "__main__":
+    main()
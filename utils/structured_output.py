@@ -0,0 +1,283 @@
+"""Tolerant local parsing of LLM JSON replies.
+
+Models often wrap JSON in markdown fences, add a sentence before or after it, leave
+trailing commas, use single quotes or Python literals, or get cut off at the token
+limit. :func:`parse_json` repairs these cases locally. :class:`LocalRepairOutputParser`
+runs that repair first and only calls an LLM-based fixer (``OutputFixingParser``) when
+the reply is not recoverable. Every parse is counted in
+``docportal_structured_output_total`` by outcome (``clean``, ``repaired``, ``unvalidated``,
+``llm_fallback``, ``failed``).
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import BaseOutputParser
+from pydantic import BaseModel, RootModel, ValidationError
+
+from logger.custom_logger import CustomLogger
+from utils.metrics import record_structured_output
+
+log = CustomLogger().get_logger(__file__)
+
+_FENCE = re.compile(r"```[ \t]*(?:json|JSON)?[ \t]*\n?(.*?)(?:```|$)", re.DOTALL)
+# an exponent without digits ("1e") is consumed with the number so it cannot turn into a key
+_NUMBER = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d*(?![\w$]))?")
+_NUMBER_PARTS = re.compile(r"(-?)(\d*)(?:\.(\d*))?(?:[eE]([+-]?\d*))?")
+_WORD = re.compile(r"[A-Za-z_$][\w$-]*")
+_LITERALS = {"true": "true", "false": "false", "null": "null", "none": "null", "nan": "null",
+             "undefined": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JsonRepairError(ValueError):
+    """The text does not contain recoverable JSON."""
+
+
+def extract_json(text: str) -> str:
+    """The outermost JSON object/array in ``text``, without fences or surrounding prose.
+
+    An object that never closes (truncated reply) is returned up to the end of the text.
+    """
+    for block in _FENCE.findall(text):
+        if "{" in block or "[" in block:
+            text = block
+            break
+    start = next((i for i, c in enumerate(text) if c in "{["), None)
+    if start is None:
+        raise JsonRepairError("No JSON object or array found")
+    depth, quote, i = 0, None, start
+    while i < len(text):
+        c = text[i]
+        if quote:
+            if c == "\\":
+                i += 1
+            elif c == quote:
+                quote = None
+        elif c in "\"'":
+            quote = c
+        elif c in "{[":
+            depth += 1
+        elif c in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+        i += 1
+    return text[start:]
+
+
+def _read_string(text: str, i: int) -> Tuple[str, int]:
+    """Re-encode the string literal starting at ``text[i]`` as a JSON string."""
+    quote, out, i = text[i], ['"'], i + 1
+    while i < len(text):
+        c = text[i]
+        if c == "\\" and i + 1 < len(text):
+            nxt = text[i + 1]
+            out.append("'" if nxt == "'" else c + nxt)
+            i += 2
+            continue
+        if c == quote:
+            return "".join(out) + '"', i + 1
+        out.append({'"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t"}.get(c, c))
+        i += 1
+    return "".join(out) + '"', i  # unterminated (truncated) string
+
+
+def _json_number(raw: str) -> str:
+    """``raw`` as a JSON number: ``3.`` -> ``3.0``, ``.5`` -> ``0.5``, ``007`` -> ``7``, ``1e`` -> ``1``."""
+    sign, whole, frac, exp = _NUMBER_PARTS.fullmatch(raw).groups()
+    number = sign + (whole.lstrip("0") or "0")
+    if frac is not None:
+        number += "." + (frac or "0")
+    if exp and exp.lstrip("+-"):
+        number += "e" + exp
+    return number
+
+
+def repair_json(text: str) -> str:
+    """Rewrite almost-JSON into JSON.
+
+    Fixes single-quoted strings, raw newlines in strings, comments, Python/JS literals,
+    unquoted keys, missing and trailing commas, and unclosed strings/brackets.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    prev: Optional[str] = None  # kind of the last emitted token: open, value, comma, colon
+
+    def value(token: str) -> None:
+        nonlocal prev
+        if prev == "value":
+            out.append(",")
+        out.append(token)
+        prev = "value"
+
+    def drop_comma() -> None:
+        if prev == "comma":
+            out.pop()
+
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c.isspace():
+            i += 1
+        elif c in "\"'":
+            token, i = _read_string(text, i)
+            value(token)
+        elif text.startswith("//", i) or c == "#":
+            end = text.find("\n", i)
+            i = len(text) if end < 0 else end + 1
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = len(text) if end < 0 else end + 2
+        elif c in "{[":
+            value(c)
+            stack.append(c)
+            prev = "open"
+            i += 1
+        elif c in "}]":
+            opener = "{" if c == "}" else "["
+            if opener in stack:
+                drop_comma()
+                if prev == "colon":
+                    out.append("null")
+                while stack:
+                    top = stack.pop()
+                    out.append(_CLOSERS[top])
+                    if top == opener:
+                        break
+                prev = "value"
+            i += 1
+        elif c == ",":
+            if prev == "value":
+                out.append(",")
+                prev = "comma"
+            i += 1
+        elif c == ":":
+            out.append(":")
+            prev = "colon"
+            i += 1
+        elif _NUMBER.match(text, i):
+            m = _NUMBER.match(text, i)
+            value(_json_number(m.group()))
+            i = m.end()
+        elif _WORD.match(text, i):
+            m = _WORD.match(text, i)
+            word = m.group()
+            i = m.end()
+            is_key = text[i:].lstrip().startswith(":")
+            value(json.dumps(word) if is_key else _LITERALS.get(word.lower(), json.dumps(word)))
+        else:
+            i += 1  # stray character
+    drop_comma()
+    if prev == "colon":
+        out.append("null")
+    out.extend(_CLOSERS[b] for b in reversed(stack))
+    return "".join(out)
+
+
+def parse_json(text: str) -> Tuple[Any, bool]:
+    """Parse an LLM reply as JSON; returns ``(value, repaired)``.
+
+    Raises :class:`JsonRepairError` when no repair produces valid JSON.
+    """
+    try:
+        return json.loads(text), False
+    except (json.JSONDecodeError, TypeError):
+        pass
+    candidate = extract_json(text)
+    for attempt in (candidate, repair_json(candidate)):
+        try:
+            return json.loads(attempt), True
+        except json.JSONDecodeError:
+            continue
+    raise JsonRepairError("Could not repair JSON")
+
+
+def _norm(key: Any) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(key).lower())
+
+
+def _coerce(value: Any, annotation: Any) -> Any:
+    origin, args = get_origin(annotation), get_args(annotation)
+    if origin is Union:
+        return value if any(isinstance(value, a) for a in args if isinstance(a, type)) else _coerce(value, args[0])
+    if origin in (list, List):
+        items = value if isinstance(value, list) else [] if value is None else [value]
+        return [_coerce(v, args[0]) for v in items] if args else items
+    if origin in (dict, Dict) and isinstance(value, dict) and len(args) == 2:
+        return {k: _coerce(v, args[1]) for k, v in value.items()}
+    if annotation is str:
+        if isinstance(value, (int, float, bool)):
+            return str(value)
+        if isinstance(value, list):
+            return "; ".join(str(v) for v in value)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel) and isinstance(value, dict):
+        return _coerce_fields(value, annotation)
+    return value
+
+
+def _coerce_fields(obj: Dict[str, Any], model: Type[BaseModel]) -> Dict[str, Any]:
+    fields = {_norm(name): (name, f) for name, f in model.model_fields.items()}
+    data = {}
+    for key, value in obj.items():
+        name, field = fields.get(_norm(key), (key, None))
+        data[name] = _coerce(value, field.annotation) if field else value
+    return data
+
+
+def coerce_to_model(obj: Any, model: Type[BaseModel]) -> BaseModel:
+    """Validate ``obj`` against ``model`` after fixing key case/spelling and scalar-vs-list shapes."""
+    if issubclass(model, RootModel):
+        return model.model_validate(_coerce(obj, model.model_fields["root"].annotation))
+    if isinstance(obj, list) and len(obj) == 1 and isinstance(obj[0], dict):
+        obj = obj[0]
+    if not isinstance(obj, dict):
+        raise JsonRepairError(f"Expected a JSON object for {model.__name__}")
+    return model.model_validate(_coerce_fields(obj, model))
+
+
+class LocalRepairOutputParser(BaseOutputParser[Any]):
+    """Output parser that repairs JSON locally and only falls back to ``fallback`` (usually an
+    ``OutputFixingParser``, i.e. another LLM call) when that fails.
+
+    Returns the validated model (``as_dict=False``) or its dict. In dict mode, JSON that parses
+    but does not validate is returned as is, matching ``JsonOutputParser``.
+    """
+
+    pydantic_object: Type[BaseModel]
+    component: str = "unknown"
+    fallback: Optional[BaseOutputParser] = None
+    as_dict: bool = True
+
+    @property
+    def _type(self) -> str:
+        return "local_repair"
+
+    def parse(self, text: str) -> Any:
+        try:
+            obj, repaired = parse_json(text)
+        except JsonRepairError:
+            if self.fallback is None:
+                record_structured_output(self.component, "failed")
+                raise OutputParserException("Reply is not recoverable JSON", llm_output=text)
+            record_structured_output(self.component, "llm_fallback")
+            log.warning("Local JSON repair failed, using LLM fallback", component=self.component)
+            result = self.fallback.parse(text)
+            if self.as_dict:
+                return result.model_dump() if isinstance(result, BaseModel) else result
+            return result if isinstance(result, self.pydantic_object) else coerce_to_model(result, self.pydantic_object)
+        try:
+            result = coerce_to_model(obj, self.pydantic_object)
+        except (JsonRepairError, ValidationError) as e:
+            if not self.as_dict:
+                record_structured_output(self.component, "failed")
+                raise OutputParserException(f"Failed to parse {self.pydantic_object.__name__}: {e}",
+                                            llm_output=text) from e
+            record_structured_output(self.component, "unvalidated")
+            return obj
+        record_structured_output(self.component, "repaired" if repaired else "clean")
+        return result.model_dump() if self.as_dict else result
+
+    def get_format_instructions(self) -> str:
+        return self.fallback.get_format_instructions() if self.fallback else ""
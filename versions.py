@@ -23,7 +23,14 @@ packages = [
     "langchain-huggingface",
     "transformers",
     "pyyaml",
-    "pandas"
+    "pandas",
+    "httpx",
+    "prometheus-client",
+    "numpy",
+    "zstandard",
+    "onnxruntime",
+    "optimum",
+    "optimum-onnx"
 ]
 for pkg in packages:
     try: